@@ -1,5 +1,7 @@
 import os
+import sys
 import dj_database_url  # データベース接続用
+from django.core.exceptions import ImproperlyConfigured
 from pathlib import Path
 
 # --- 1. 基本設定 ---
@@ -9,6 +11,9 @@ SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-vvyo@62z3nv3jc@jtf7r1
 # Render上ではDEBUGをFalseにし、手元のMacではTrueにする設定
 DEBUG = 'RENDER' not in os.environ
 
+# manage.py test で動いているか（テストでは裏のスレッドを使わない・クエリ予算を厳しくする など）
+TESTING = sys.argv[1:2] == ['test']
+
 # 🆕 Renderのドメインとローカル環境を許可
 ALLOWED_HOSTS = ['steppia-project.onrender.com', '127.0.0.1', 'localhost', '*']
 
@@ -29,6 +34,9 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # 🆕 2番目に追加（画像表示用）
+    'steppia_app.metrics.MetricsMiddleware', # 🆕 ビューごとの応答時間・SQL の時間を /metrics/ に出す
+    'steppia_app.profiling.ProfilingMiddleware', # 🆕 PROFILING_ENABLED=1 のときだけ働く
+    'steppia_app.sql_budget.SQLBudgetMiddleware', # 🆕 SQL の本数・時間を Server-Timing とログに出す（静的ファイルは対象外）
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -41,7 +49,8 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # 🆕 描画時間を Server-Timing に出すため、DjangoTemplates を少し拡張したもの
+        'BACKEND': 'steppia_app.sql_budget.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -61,7 +70,8 @@ WSGI_APPLICATION = 'config.wsgi.application'
 DATABASES = {
     'default': dj_database_url.config(
         default=os.environ.get('DATABASE_URL', f'sqlite:///{BASE_DIR / "db.sqlite3"}'),
-        conn_max_age=600
+        # ASGI では1リクエストごとに別のスレッドで SQL を流すので、接続を使い回すと閉じられずに溜まっていく
+        conn_max_age=0 if os.environ.get('ASYNC_VIEWS') == '1' else 600
     )
 }
 
@@ -84,8 +94,15 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
-if not DEBUG:
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# 🆕 本番は大きな画像の縮小版（steppia_app/responsive_images.py）も作ってからハッシュ・圧縮する
+#    （Django 5.1 で STATICFILES_STORAGE はなくなったので STORAGES で指定）
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'steppia_app.storage.ResponsiveStaticFilesStorage',
+    },
+}
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -95,4 +112,87 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # --- 7. 認証・リダイレクト設定 ---
 LOGIN_REDIRECT_URL = 'menu'
 LOGOUT_REDIRECT_URL = 'menu'
-LOGIN_URL = 'login'
\ No newline at end of file
+LOGIN_URL = 'login'
+
+# --- 8. AI相談ログの書き込み設定 ---
+# 🆕 CONSULT_LOG_BUFFERED=1 のとき、相談ログをまとめて書き込む（steppia_app/consult_log.py）
+CONSULT_LOG_BUFFER = {
+    'ENABLED': os.environ.get('CONSULT_LOG_BUFFERED') == '1',
+    'BATCH_SIZE': int(os.environ.get('CONSULT_LOG_BATCH_SIZE', 100)),
+    'FLUSH_INTERVAL': float(os.environ.get('CONSULT_LOG_FLUSH_INTERVAL', 2.0)),
+    'MAX_QUEUE': 10000,
+    # DBに書けなかったときの退避先
+    'SPILL_PATH': BASE_DIR / 'var' / 'consult_log_spill.jsonl',
+}
+
+# --- 9. キャッシュ設定 ---
+# 🆕 CACHE_BACKEND=locmem / file / redis で選ぶ（steppia_app/cache_backends.py）
+#    画面ごとの秒数は steppia_app/cache_policy.py
+#    locmem は gunicorn のワーカー間で共有されず、マイページのキャッシュを消しても他のワーカーに古い内容が残るので、
+#    開発（DEBUG）のときだけ使う。本番の既定は file（同じサーバーのワーカーで共有）
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem' if DEBUG else 'file')
+if CACHE_BACKEND == 'locmem' and not DEBUG:
+    raise ImproperlyConfigured("CACHE_BACKEND=locmem はワーカー間で共有されないため、本番では file か redis を使ってください")
+_CACHE_BACKENDS = {
+    'locmem': ('steppia_app.cache_backends.LocMemCache', 'steppia'),
+    'file': ('steppia_app.cache_backends.FileBasedCache', str(BASE_DIR / 'var' / 'cache')),
+    'redis': ('steppia_app.cache_backends.RedisCache', os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0')),
+}
+CACHES = {
+    'default': {
+        'BACKEND': _CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': _CACHE_BACKENDS[CACHE_BACKEND][1],
+        'TIMEOUT': 300,
+        # デプロイごとに版を変えて、前の版のキャッシュ（テンプレートの変更前の部分など）を使わない
+        'KEY_PREFIX': 'steppia:' + (os.environ.get('CACHE_VERSION') or os.environ.get('RENDER_GIT_COMMIT', 'dev')[:12]),
+    }
+}
+if CACHE_BACKEND == 'file':
+    # 件数が上限（Django の既定は300件）を超えると一部を消す。ユーザーごとの部分キャッシュが入るので多めにする
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000))}
+
+# --- 10. リクエストの計測（SQL の本数・時間、ビューごとのクエリ予算） ---
+# 🆕 steppia_app/sql_budget.py。テストの実行中と SQL_BUDGET_STRICT=1 のときは予算超えを例外にする
+SQL_BUDGET = {
+    'ENABLED': os.environ.get('SQL_BUDGET_ENABLED', '1') == '1',
+    'SERVER_TIMING': True,
+    'STRICT': TESTING or os.environ.get('SQL_BUDGET_STRICT') == '1',
+}
+
+# 🆕 サンプリングプロファイラー（steppia_app/profiling.py）。一覧はスタッフ用の /staff/profiles/
+PROFILING = {
+    'ENABLED': os.environ.get('PROFILING_ENABLED') == '1',
+    # N リクエストに1回計測する（0 なら X-Steppia-Profile ヘッダーの付いたリクエストだけ）
+    'SAMPLE_EVERY': int(os.environ.get('PROFILING_SAMPLE_EVERY', 0)),
+    'DIR': BASE_DIR / 'var' / 'profiles',
+    'MAX_PROFILES': 50,
+}
+
+# 🆕 読み出しの多い画面（マイページ・進捗・求人一覧/詳細・スケジュール）を非同期版（steppia_app/async_views.py）にする
+# ASGI（gunicorn config.asgi -c gunicorn_asgi.conf.py）で動かすときに使う。WSGI では同期版のままがよい
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
+
+# 🆕 おすすめ求人の行列（steppia_app/recommend.py）は、ワーカーの起動時（gunicorn.conf.py）や
+# 最初に使われたときに裏のスレッドで作る。テストでは作らず、必要なテストが engine.rebuild() を呼ぶ
+RECOMMEND_WARM_IN_BACKGROUND = not TESTING
+
+# 🆕 Prometheus 形式のメトリクス（steppia_app/metrics.py）。/metrics/ は
+# 「Authorization: Bearer <METRICS_TOKEN>」を付けた取得か、スタッフのログインでだけ見られる
+# gunicorn の全ワーカーの合計にするには PROMETHEUS_MULTIPROC_DIR が要る（gunicorn.conf.py が設定する）
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # 1リクエスト1行の JSON。開発中は予算超えの警告だけ出す。テストの出力には出さない（assertLogs では拾える）
+        'steppia_app.requests': {
+            'handlers': [] if TESTING else ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING' if DEBUG else 'INFO'),
+            'propagate': False,
+        },
+    },
+}
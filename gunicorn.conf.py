@@ -0,0 +1,30 @@
+"""gunicorn の設定（gunicorn config.wsgi を実行したディレクトリにあれば自動で読まれる）
+
+/metrics/ を全ワーカーの合計にするため、prometheus_client の multiprocess モードを使います。
+ワーカーは PROMETHEUS_MULTIPROC_DIR に値を書くので、起動時に前回の分を消しておきます。
+ワーカーが起動したら、おすすめ求人の行列を裏のスレッドで作り始めます。
+"""
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+# ワーカーが prometheus_client を読み込む前（フォークの前）に決めておく
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/steppia-metrics')
+
+
+def on_starting(server):
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # 終わったワーカーの「生きている間だけの値」（ゲージ）を片付ける。カウンターは合計に残る
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # 最初のマイページ・求人一覧のリクエストで行列を作らないよう、先に作り始めておく
+    from steppia_app.recommend import engine
+    engine.warm()
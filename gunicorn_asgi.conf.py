@@ -0,0 +1,16 @@
+"""ASGI（uvicorn のワーカー）で動かすときの gunicorn の設定
+
+    gunicorn config.asgi -c gunicorn_asgi.conf.py
+
+gunicorn.conf.py（メトリクスの設定）をそのまま読み込み、ワーカーを uvicorn に替えます。
+ASYNC_VIEWS=1 になるので、読み出しの多い画面は非同期版（steppia_app/async_views.py）で動きます。
+同期ワーカーとのスループットの比較は manage.py bench_throughput で測れます。
+"""
+import os
+import runpy
+
+_base = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py'))
+globals().update({name: value for name, value in _base.items() if not name.startswith('_')})
+
+worker_class = 'uvicorn_worker.UvicornWorker'
+os.environ.setdefault('ASYNC_VIEWS', '1')
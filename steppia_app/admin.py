@@ -1,19 +1,115 @@
-from django.contrib import admin
+import csv
+import io
+
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from . import job_import, member_directory
 # Applications を Application (単数形) に修正
-from .models import Member, Job, Schedule, AIConsultTemplate, AIConsultLog, Application, WorkLog, Coupon
+from .models import (
+    Member, Job, Schedule, AIConsultTemplate, AIConsultLog, Application, WorkLog, Coupon,
+    Consultant, ConsultantWorkingHours, ConsultSlot, ComplianceFlag, ComplianceScanRun,
+)
 
 @admin.register(Member)
 class MemberAdmin(admin.ModelAdmin):
-    list_display = ('last_name', 'first_name', 'email', 'daily_wage', 'last_roulette_date')
-    search_fields = ('last_name', 'first_name', 'email')
+    list_display = ('last_name', 'first_name', 'last_name_kana', 'first_name_kana', 'email', 'assigned_consultant', 'daily_wage', 'last_roulette_date')
+    list_filter = ('assigned_consultant',)
+    ordering = member_directory.ORDERING
+    # 件数が多いので、絞り込み前の全件 COUNT は出さない
+    show_full_result_count = False
+    search_help_text = 'ふりがなの前方一致（「やまだ はなこ」で せい・めい）、または メールアドレスの完全一致'
+
+    # 検索欄を出すために指定。検索の中身は get_search_results で会員名簿と同じ処理に差し替える
+    search_fields = ('last_kana_key',)
+
+    def get_search_results(self, request, queryset, search_term):
+        condition = member_directory.search_filter(search_term)
+        if condition is None:
+            return queryset, False
+        return queryset.filter(condition), False
 
 @admin.register(Application)
 class ApplicationAdmin(admin.ModelAdmin):
     list_display = ('user', 'job', 'current_step', 'status', 'applied_at')
 
-admin.site.register(Job)
-admin.site.register(Schedule)
 admin.site.register(AIConsultTemplate)
 admin.site.register(AIConsultLog)
 admin.site.register(WorkLog)
-admin.site.register(Coupon)
\ No newline at end of file
+admin.site.register(Coupon)
+
+class ConsultantWorkingHoursInline(admin.TabularInline):
+    model = ConsultantWorkingHours
+    extra = 0
+
+@admin.register(Consultant)
+class ConsultantAdmin(admin.ModelAdmin):
+    list_display = ('name', 'career', 'is_active')
+    inlines = [ConsultantWorkingHoursInline]
+
+@admin.register(ConsultSlot)
+class ConsultSlotAdmin(admin.ModelAdmin):
+    list_display = ('consultant', 'date', 'start_time', 'end_time', 'schedule')
+    list_filter = ('consultant', 'date')
+    list_select_related = ('consultant', 'schedule')
+
+@admin.register(Schedule)
+class ScheduleAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'time', 'kind', 'consultant', 'detail')
+    list_filter = ('kind', 'consultant')
+    list_select_related = ('user', 'consultant')
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('title', 'company', 'location', 'salary', 'external_id')
+    change_list_template = 'admin/steppia_app/job/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='steppia_app_job_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """🆕 求人フィードのアップロード取込（1行ずつ読むので大きなファイルでも大丈夫）"""
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            return redirect('admin:steppia_app_job_changelist')
+        if request.method == 'POST' and request.FILES.get('feed'):
+            upload = request.FILES['feed']
+            lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            try:
+                result = job_import.import_jobs(job_import.read_feed(lines, job_import.detect_format(upload.name)))
+            except (ValueError, UnicodeDecodeError, csv.Error) as e:
+                self.message_user(request, f"取込に失敗しました：{e}", messages.ERROR)
+            else:
+                self.message_user(request, f"取込が完了しました：{result}", messages.SUCCESS)
+            return redirect('admin:steppia_app_job_changelist')
+        return TemplateResponse(request, 'admin/steppia_app/job/import.html', {
+            **self.admin_site.each_context(request), 'opts': self.model._meta, 'title': '求人の一括取込',
+        })
+
+@admin.register(ComplianceFlag)
+class ComplianceFlagAdmin(admin.ModelAdmin):
+    """🆕 受給チェックで見つかった日・週（コンサルタントが確認する一覧）"""
+    list_display = ('user', 'kind', 'start_date', 'end_date', 'hours', 'earnings', 'work_days', 'is_reviewed')
+    list_filter = ('kind', 'is_reviewed')
+    date_hierarchy = 'start_date'
+    search_fields = ('user__username', 'user__profile__last_name', 'user__profile__first_name')
+    list_select_related = ('user',)
+    readonly_fields = ('user', 'kind', 'start_date', 'end_date', 'hours', 'earnings', 'work_days', 'scanned_at')
+    actions = ['mark_reviewed']
+
+    @admin.action(description='選択した行を確認済みにする')
+    def mark_reviewed(self, request, queryset):
+        queryset.update(is_reviewed=True)
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(ComplianceScanRun)
+class ComplianceScanRunAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'finished_at', 'is_full', 'users', 'log_rows', 'flags')
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,124 @@
+"""読み出しの多い画面の非同期（ASGI）版
+
+settings.ASYNC_VIEWS が True のとき（gunicorn_asgi.conf.py で uvicorn のワーカーを使うとき）、
+urls.py は mypage / progress / job_list / job_detail / schedule をこちらに差し替えます。
+遅い SQL を待つ間もワーカーのイベントループは他のリクエストを処理できるので、
+同期ワーカー（1リクエストでワーカー1つが埋まる）より多くの同時アクセスを受けられます。
+
+・互いに関係のない SQL（マイページの5種類、求人一覧の検索とおすすめ）は asyncio.gather でまとめて待つ。
+  Django の非同期 ORM は1リクエストの SQL を同じスレッド・同じ接続で順に流すので、
+  DB の中で並列になるわけではないが、待ち時間の間イベントループをふさがない
+・request.user は最初に await request.auser() で読み込んでおく（イベントループの中で同期の SQL を出さない）
+・テンプレートの描画は sync_to_async で別スレッドに出す（テンプレートから関連オブジェクトを読んでもよいように）
+
+表示内容・クエリ予算・キャッシュ・条件付き GET は views.py の同期版と同じです。
+WSGI（gunicorn config.wsgi）では同期版のまま動きます。
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import aget_object_or_404, render
+
+from . import cache_policy, recommend
+from .conditional import conditional_page, job_detail_state, job_list_state, schedule_state
+from .dashboard import aget_snapshot
+from .models import Job, Member, Schedule
+from .search import search_jobs
+from .sql_budget import query_budget
+from .views import job_list_filters
+
+# urls.py で差し替える画面（URL の名前）
+VIEWS = ('job_list', 'job_detail', 'mypage', 'progress', 'schedule')
+
+
+def resolves_user(view):
+    """request.user を先に読み込んでおく（以降のデコレーターやテンプレートが同期で読めるように）"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await request.auser()
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def arender(request, template_name, context=None, status=None):
+    return await sync_to_async(render)(request, template_name, context, status=status)
+
+
+async def _nothing():
+    return []
+
+
+def swap(urlpatterns):
+    """urlpatterns のうち VIEWS の画面を、この非同期版に差し替えた新しいリスト"""
+    return [
+        type(pattern)(pattern.pattern, globals()[pattern.name], pattern.default_args, pattern.name)
+        if getattr(pattern, 'name', None) in VIEWS else pattern
+        for pattern in urlpatterns
+    ]
+
+
+# --- 3. 求人・応募機能 ---
+@query_budget(8)
+@resolves_user
+@cache_policy.anonymous_page('job_list')
+@conditional_page(job_list_state)
+async def job_list(request):
+    search, context, show_recommended = job_list_filters(request)
+    (jobs, next_cursor), recommended = await asyncio.gather(
+        sync_to_async(search_jobs)(**search),
+        sync_to_async(recommend.for_user)(request.user) if show_recommended else _nothing(),
+    )
+    return await arender(request, 'steppia_app/job_list.html', dict(
+        context, jobs=jobs, next_cursor=next_cursor, recommended_jobs=recommended,
+    ))
+
+
+@query_budget(4)
+@resolves_user
+@cache_policy.anonymous_page('job_detail')
+@conditional_page(job_detail_state)
+async def job_detail(request, pk):
+    job = await aget_object_or_404(Job, pk=pk)
+    return await arender(request, 'steppia_app/job_detail.html', {'job': job})
+
+
+# --- 6. マイページ ---
+@query_budget(8)
+@resolves_user
+@login_required
+async def mypage(request):
+    snapshot = await aget_snapshot(request.user)
+    recommended = await sync_to_async(recommend.for_user)(
+        request.user, applications=snapshot['applications'], logs=snapshot['logs'],
+    )
+    return await arender(request, 'steppia_app/mypage.html', dict(snapshot, recommended_jobs=recommended))
+
+
+# --- 7. 進捗管理（冒険マップ） ---
+@query_budget(3)
+@resolves_user
+@login_required
+async def progress(request):
+    member = await Member.objects.aget(user=request.user)
+    return await arender(request, 'steppia_app/progress.html', {
+        'current_pos': member.map_step,
+        'has_applied': member.application_count > 0,
+        'work_log_count': member.work_log_count,
+    })
+
+
+# --- 9. 予約・スケジュール・設定 ---
+@query_budget(4)
+@resolves_user
+@login_required
+@conditional_page(schedule_state)
+async def schedule(request):
+    if request.method == 'POST':
+        await Schedule.objects.acreate(
+            user=request.user, date=request.POST.get('date'), time=request.POST.get('time'),
+            detail=request.POST.get('detail'),
+        )
+    schedules = [schedule async for schedule in Schedule.objects.filter(user=request.user).order_by('-date', '-time')]
+    return await arender(request, 'steppia_app/schedule.html', {'schedules': schedules})
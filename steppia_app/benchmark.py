@@ -0,0 +1,221 @@
+"""URL ごとの負荷計測（bench_endpoints コマンド）
+
+seed_scale で作った本番規模のデータの上で、steppia_app/urls.py の URL を
+Django のテストクライアントでプロセス内から GET し、URL ごとに
+・応答時間の p50 / p95 / p99（温まった状態）と、最初の1回（キャッシュを消した冷えた状態）
+・SQL の本数
+・1リクエストの Python のメモリ確保のピーク（tracemalloc は遅くなるので別の1回で測る）
+を集めます。結果は JSON に保存し、compare() で2回分（コミットの前後など）の差を出せます。
+
+計測のたびにキャッシュを消すので、プロセス内のキャッシュ（CACHE_BACKEND=locmem）でないときは
+動きません（require_local_cache。共有のキャッシュを消して本番の画面を冷やさないように）。
+"""
+import datetime
+import re
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import urls
+from .models import AIConsultLog, Application, Job, WorkLog
+
+# GET すると書き換わる・ログアウトするなど、計測しない URL（名前かルート）と理由
+SKIP = {
+    'make-user-emergency/': "管理者ユーザーを作り直す",
+    'apply_to_job': "GET で応募を作る",
+    'delete_work_log': "GET でお仕事ログを消す",
+    'logout': "ログアウトしてしまう（POST 専用）",
+    'roulette_spin': "POST 専用",
+}
+# スタッフでログインして叩く URL
+STAFF = {'member_list', 'export_admin_data', 'cache_stats', 'profile_list', 'profile_detail', 'prometheus_metrics'}
+# 全件を出力すると計測にならないので、期間を絞る
+QUERY_STRINGS = {
+    'export_my_data': 'start={week_ago}',
+    'export_admin_data': 'start={week_ago}',
+}
+
+_PARAM = re.compile(r'<(?:\w+:)?(\w+)>')
+
+
+def _key(pattern):
+    return pattern.name or str(pattern.pattern)
+
+
+def _sample_args(member):
+    """URL の <pk> などに入れる値（計測する会員のデータから選ぶ）"""
+    job_pk = Job.objects.order_by('pk').values_list('pk', flat=True).first()
+    log_pk = None
+    if member is not None:
+        log_pk = WorkLog.objects.filter(user=member).order_by('-pk').values_list('pk', flat=True).first()
+    return {
+        'job_detail': {'pk': job_pk},
+        'edit_work_log': {'pk': log_pk},
+        'export_my_data': {'dataset': 'worklogs', 'fmt': 'csv'},
+        'export_admin_data': {'dataset': 'worklogs', 'fmt': 'csv'},
+        'roulette/result/<str:item>/': {'item': 'ハズレ'},
+    }
+
+
+def endpoints(member, staff, anonymous=False):
+    """[(キー, パス, ログインするユーザー, 計測しない理由)]"""
+    args = _sample_args(member)
+    week_ago = (timezone.localdate() - datetime.timedelta(days=7)).isoformat()
+    found = []
+    for pattern in urls.urlpatterns:
+        key = _key(pattern)
+        user = None if anonymous else (staff if key in STAFF else member)
+        reason = SKIP.get(key)
+        if reason is None and key in STAFF and staff is None and not anonymous:
+            reason = "スタッフのユーザーがいない"
+        path = None
+        if reason is None:
+            values = args.get(key, {})
+            names = _PARAM.findall(str(pattern.pattern))
+            if any(values.get(name) is None for name in names):
+                reason = "URL に入れるデータがない"
+            else:
+                path = '/' + _PARAM.sub(lambda m: str(values[m.group(1)]), str(pattern.pattern))
+                if key in QUERY_STRINGS:
+                    path += '?' + QUERY_STRINGS[key].format(week_ago=week_ago)
+        found.append((key, path, user, reason))
+    return found
+
+
+def _request(client, path):
+    """1回 GET して（ストリーミングなら最後まで読んで）、(ミリ秒, SQL の本数, ステータス) を返す"""
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = client.get(path)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = (time.perf_counter() - start) * 1000
+    return elapsed, len(queries), response.status_code
+
+
+def require_local_cache():
+    """キャッシュを消してよいか（このプロセスだけのキャッシュか）確かめる"""
+    if not isinstance(caches['default'], (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            "計測ではキャッシュを消すので、ワーカー間で共有するキャッシュ"
+            f"（{type(caches['default']).__name__}）では動かせません。CACHE_BACKEND=locmem で動かしてください"
+        )
+
+
+def measure(client, path, iterations=20, warmup=2):
+    require_local_cache()
+    cache.clear()
+    cold_ms, cold_queries, status = _request(client, path)
+    for _ in range(warmup):
+        _request(client, path)
+    timings, query_counts = [], []
+    for _ in range(iterations):
+        elapsed, query_count, status = _request(client, path)
+        timings.append(elapsed)
+        query_counts.append(query_count)
+
+    tracemalloc.start()
+    try:
+        _request(client, path)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    cuts = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+    return {
+        'path': path,
+        'status': status,
+        'cold_ms': round(cold_ms, 2),
+        'cold_queries': cold_queries,
+        'p50_ms': round(cuts[49], 2),
+        'p95_ms': round(cuts[94], 2),
+        'p99_ms': round(cuts[98], 2),
+        'queries': max(query_counts),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def current_commit():
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        )
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def default_member():
+    """いちばんお仕事ログの多い会員（重い画面の代表）"""
+    return (
+        User.objects.filter(profile__isnull=False, is_staff=False)
+        .order_by('-profile__work_log_count', 'pk').first()
+    )
+
+
+def run(member=None, staff=None, anonymous=False, only=None, iterations=20, warmup=2, progress=None):
+    """全 URL を計測して、JSON にそのまま書ける辞書を返す"""
+    if member is None and not anonymous:
+        member = default_member()
+    if staff is None and not anonymous:
+        staff = User.objects.filter(is_staff=True).order_by('pk').first()
+
+    results, skipped = {}, {}
+    clients = {}
+    for key, path, user, reason in endpoints(member, staff, anonymous):
+        if only and key not in only:
+            continue
+        if reason is not None:
+            skipped[key] = reason
+            continue
+        client = clients.get(user)
+        if client is None:
+            client = clients[user] = Client(raise_request_exception=False)
+            if user is not None:
+                client.force_login(user)
+        results[key] = measure(client, path, iterations, warmup)
+        if progress is not None:
+            progress(key, results[key])
+
+    return {
+        'meta': {
+            'commit': current_commit(),
+            'started_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'iterations': iterations,
+            'member': member.username if member else None,
+            'rows': {
+                'users': User.objects.count(),
+                'jobs': Job.objects.count(),
+                'work_logs': WorkLog.objects.count(),
+                'consult_logs': AIConsultLog.objects.count(),
+                'applications': Application.objects.count(),
+            },
+        },
+        'endpoints': results,
+        'skipped': skipped,
+    }
+
+
+def compare(before, after):
+    """2回分の結果から [(キー, 前の p50, 後の p50, 変化率%, 前の SQL 本数, 後の SQL 本数)]"""
+    rows = []
+    for key, new in after['endpoints'].items():
+        old = before['endpoints'].get(key)
+        if old is None:
+            continue
+        change = (new['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0.0
+        rows.append((key, old['p50_ms'], new['p50_ms'], round(change, 1), old['queries'], new['queries']))
+    return rows
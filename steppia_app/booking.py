@@ -0,0 +1,106 @@
+"""コンサル予約エンジン
+
+・勤務時間（ConsultantWorkingHours）から SLOT_MINUTES 刻みの予約枠（ConsultSlot）を作ります。
+・空き枠の検索は「空き枠だけの部分インデックス」を使った範囲スキャン1本です。
+・枠は manage.py generate_consult_slots（毎日の定期実行）で作ります。予約画面の表示では書き込みません。
+・予約は「Schedule を作る → 空いている枠にだけ条件付き UPDATE で紐づける」を
+  1トランザクションで行います。同じ枠に同時に申し込んでも成功するのは1件だけで、
+  負けた側のトランザクションは Schedule ごと巻き戻ります。クーポンの消費も同じトランザクションです。
+"""
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Consultant, ConsultSlot, Coupon, Schedule
+
+SLOT_MINUTES = 30
+
+# generate_consult_slots が何日先までの枠を作るか
+HORIZON_DAYS = 28
+
+
+class SlotUnavailable(Exception):
+    """指定の枠がない、またはすでに埋まっている"""
+
+
+class SlotInPast(Exception):
+    """指定の枠はもう始まっている（過ぎている）"""
+
+
+def week_start(day):
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def slot_times(start_time, end_time, minutes=SLOT_MINUTES):
+    """勤務時間を予約枠の (開始, 終了) に区切る"""
+    step = datetime.timedelta(minutes=minutes)
+    base = datetime.date.min
+    current = datetime.datetime.combine(base, start_time)
+    end = datetime.datetime.combine(base, end_time)
+    while current + step <= end:
+        yield current.time(), (current + step).time()
+        current += step
+
+
+def generate_slots(consultant, start_date, days):
+    """勤務時間から予約枠を作る（作成済みの枠はそのまま）。作成を試みた枠数を返す"""
+    hours_by_weekday = {}
+    for hours in consultant.working_hours.all():
+        hours_by_weekday.setdefault(hours.weekday, []).append(hours)
+
+    slots = []
+    for offset in range(days):
+        day = start_date + datetime.timedelta(days=offset)
+        for hours in hours_by_weekday.get(day.weekday(), []):
+            for start, end in slot_times(hours.start_time, hours.end_time):
+                slots.append(ConsultSlot(consultant=consultant, date=day, start_time=start, end_time=end))
+    ConsultSlot.objects.bulk_create(slots, batch_size=500, ignore_conflicts=True)
+    return len(slots)
+
+
+def free_slots(consultant, start_date, end_date, now=None):
+    """start_date〜end_date（end_date は含まない）の空き枠を時刻順に返す"""
+    slots = ConsultSlot.objects.filter(
+        consultant=consultant, schedule__isnull=True,
+        date__gte=start_date, date__lt=end_date,
+    ).order_by('date', 'start_time')
+    if now is not None:
+        # 今日のうち、もう始まっている枠は出さない
+        slots = slots.exclude(date=now.date(), start_time__lte=now.time())
+        slots = slots.filter(date__gte=now.date())
+    return list(slots)
+
+
+def find_slot_id(consultant_name, date, time):
+    """旧フォーム（日付・時刻の直接入力）から枠を探す"""
+    return ConsultSlot.objects.filter(
+        consultant__name=consultant_name, date=date, start_time=time
+    ).values_list('pk', flat=True).first()
+
+
+def book(user, slot_id, coupon_id=None, now=None):
+    """予約枠を確保して Schedule を返す。取れなければ SlotUnavailable、もう始まっている枠なら SlotInPast"""
+    now = now or timezone.localtime()
+    with transaction.atomic():
+        slot = ConsultSlot.objects.select_related('consultant').filter(pk=slot_id).first()
+        if slot is None or slot.is_booked:
+            raise SlotUnavailable
+        if (slot.date, slot.start_time) <= (now.date(), now.time()):
+            raise SlotInPast
+        schedule = Schedule.objects.create(
+            user=user, date=slot.date, time=slot.start_time,
+            detail=f"{slot.consultant.name} コンサル予約",
+            kind=Schedule.KIND_CONSULT, consultant=slot.consultant,
+        )
+        claimed = ConsultSlot.objects.filter(pk=slot.pk, schedule__isnull=True).update(schedule=schedule)
+        if not claimed:
+            # 先に他の人が予約した → Schedule の作成も取り消す
+            raise SlotUnavailable
+        if coupon_id:
+            Coupon.objects.filter(id=coupon_id, user=user, is_used=False).update(is_used=True)
+    return schedule
+
+
+def active_consultants():
+    return list(Consultant.objects.filter(is_active=True).order_by('pk'))
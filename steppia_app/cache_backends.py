@@ -0,0 +1,83 @@
+"""キャッシュのバックエンド（settings.CACHE_BACKEND で選ぶ）
+
+・LocMemCache   … プロセスごとのメモリ。開発・テスト用（gunicorn のワーカー間では共有されないので、DEBUG でないときは使えない）
+・FileBasedCache … 同じサーバーのワーカー間で共有できるファイル
+・RedisCache    … Redis / Valkey などのサーバー（Django の RedisCache。redis-py が要ります）
+
+どれも get の当たり・外れを数えるので、cache_policy.stats() で確認できます（プロセスごとの値）。
+/metrics/ の steppia_cache_requests_total{kind="backend"} には全ワーカーの合計が出ます。
+"""
+from collections import Counter
+
+from django.core.cache.backends.filebased import FileBasedCache as DjangoFileBasedCache
+from django.core.cache.backends.locmem import LocMemCache as DjangoLocMemCache
+from django.core.cache.backends.redis import RedisCache as DjangoRedisCache
+from django.core.cache.backends.redis import RedisCacheClient as DjangoRedisCacheClient
+
+from . import metrics
+
+_MISSING = object()
+
+
+class StatsMixin:
+    """get / get_many の当たり・外れを数える"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.counters = Counter()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        self.counters['hits' if value is not _MISSING else 'misses'] += 1
+        metrics.count_cache('backend', type(self).__name__, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        self.counters['hits'] += len(found)
+        self.counters['misses'] += len(keys) - len(found)
+        metrics.count_cache('backend', type(self).__name__, True, len(found))
+        metrics.count_cache('backend', type(self).__name__, False, len(keys) - len(found))
+        return found
+
+    def stats(self):
+        hits, misses = self.counters['hits'], self.counters['misses']
+        return {
+            'backend': type(self).__name__,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+
+
+class LocMemCache(StatsMixin, DjangoLocMemCache):
+    pass
+
+
+class FileBasedCache(StatsMixin, DjangoFileBasedCache):
+    pass
+
+
+class RedisCacheClient(DjangoRedisCacheClient):
+    # 「あれば足す」を1回のコマンドで行う。EXISTS と INCRBY に分けると、
+    # 間でキーの期限が切れたときに INCRBY が期限なしのキーを作ってしまう
+    _INCR_IF_EXISTS = "if redis.call('EXISTS', KEYS[1]) == 1 then return redis.call('INCRBY', KEYS[1], ARGV[1]) end"
+
+    def incr(self, key, delta):
+        value = self.get_client(key, write=True).eval(self._INCR_IF_EXISTS, 1, key, delta)
+        if value is None:
+            raise ValueError("Key '%s' not found." % key)
+        return value
+
+
+class RedisCache(StatsMixin, DjangoRedisCache):
+    """Django の RedisCache（redis-py）。incr だけ上の RedisCacheClient で原子的にする
+
+    redis-py は接続プールを使い、送ったあとのタイムアウトではコマンドを送り直さない
+    （OPTIONS で retry を指定しない限り）ので、INCR などが2回効くことはありません。
+    """
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self._class = RedisCacheClient
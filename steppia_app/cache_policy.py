@@ -0,0 +1,158 @@
+"""画面ごとのキャッシュ方針
+
+・PAGE_POLICY     … 未ログインのときだけ、ページ全体をキャッシュする画面と秒数
+                    （ログイン中はおすすめ求人など人によって中身が変わるのでキャッシュしない）
+・FRAGMENT_POLICY … ログイン中の画面の一部を、ユーザーごとにキャッシュする部分と秒数
+                    （テンプレートでは {% user_fragment "名前" %} 〜 {% enduser_fragment %}）
+
+ユーザーごとの部分キャッシュは「世代番号」をキーに含めていて、dashboard.invalidate() で
+そのユーザーのデータが変わったときに世代を進めるので、古い部分が表示されることはありません。
+キーには settings の KEY_PREFIX（デプロイごとの版）も付くので、デプロイ後は自然に入れ替わります。
+"""
+import time
+from collections import Counter
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.utils.cache import add_never_cache_headers, get_conditional_response
+from django.utils.http import parse_http_date_safe
+from django.views.decorators.cache import cache_page
+
+from . import metrics
+
+CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE')
+
+PAGE_POLICY = {
+    'top': 600,
+    'job_list': 60,
+    'job_detail': 300,
+    'consult_top': 600,
+}
+
+FRAGMENT_POLICY = {
+    'mypage.applications': 600,
+    'mypage.logs': 600,
+}
+
+# {('page' or 'fragment', 名前): Counter(hits=, misses=)}（プロセスごと）
+_counters = {}
+
+
+def _count(kind, name, hit):
+    _counters.setdefault((kind, name), Counter())['hits' if hit else 'misses'] += 1
+    metrics.count_cache(kind, name, hit)
+
+
+def anonymous_page(name):
+    """PAGE_POLICY[name] 秒だけ、未ログインのときのページ全体をキャッシュするデコレーター"""
+    timeout = PAGE_POLICY[name]
+
+    def decorator(view):
+        def finish_render(request, response):
+            if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+                # CSRF トークン入りのページは人ごとに違うので保存しない
+                add_never_cache_headers(response)
+            return response
+
+        def finish(request, response, conditional):
+            request.META.update(conditional)
+            _count('page', name, hit=not getattr(request, 'page_cache_miss', False))
+            return get_conditional_response(
+                request, etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(response.get('Last-Modified')), response=response,
+            )
+
+        def bypass(request):
+            return request.user.is_authenticated or request.method not in ('GET', 'HEAD')
+
+        def pop_conditional(request):
+            # 304 をキャッシュに入れないよう、条件付き GET の判定はキャッシュから出した後で行う
+            return {header: request.META.pop(header) for header in CONDITIONAL_HEADERS if header in request.META}
+
+        if iscoroutinefunction(view):
+            # 非同期版の画面（async_views.py）。request.user は先に読み込んであること
+            @wraps(view)
+            async def rendered(request, *args, **kwargs):
+                request.page_cache_miss = True
+                return finish_render(request, await view(request, *args, **kwargs))
+
+            cached = cache_page(timeout, key_prefix=f'page.{name}')(rendered)
+
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if bypass(request):
+                    return await view(request, *args, **kwargs)
+                conditional = pop_conditional(request)
+                return finish(request, await cached(request, *args, **kwargs), conditional)
+
+            return wrapper
+
+        @wraps(view)
+        def rendered(request, *args, **kwargs):
+            # ここまで来た＝キャッシュになかった
+            request.page_cache_miss = True
+            return finish_render(request, view(request, *args, **kwargs))
+
+        cached = cache_page(timeout, key_prefix=f'page.{name}')(rendered)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if bypass(request):
+                return view(request, *args, **kwargs)
+            conditional = pop_conditional(request)
+            return finish(request, cached(request, *args, **kwargs), conditional)
+
+        return wrapper
+
+    return decorator
+
+
+# --- ユーザーごとの部分キャッシュ ---
+def _generation_key(user_id):
+    return f'fragment:generation:{user_id}'
+
+
+def fragment_key(name, user_id):
+    # 世代がキャッシュから追い出されても前の番号に戻らないよう、初めの値は時刻にする
+    # （1から始めると、まだ残っている古い世代の部分が当たってしまう）
+    generation = cache.get_or_set(_generation_key(user_id), time.time_ns(), None)
+    return f'fragment:{name}:{user_id}:{generation}'
+
+
+def get_fragment(name, user_id):
+    value = cache.get(fragment_key(name, user_id))
+    _count('fragment', name, hit=value is not None)
+    return value
+
+
+def set_fragment(name, user_id, content):
+    cache.set(fragment_key(name, user_id), content, FRAGMENT_POLICY[name])
+
+
+def invalidate_fragments(*user_ids):
+    """ユーザーの部分キャッシュをまとめて古くする（世代を進める）"""
+    for user_id in user_ids:
+        if user_id is None:
+            continue
+        try:
+            cache.incr(_generation_key(user_id))
+        except ValueError:
+            # 世代がない（まだ作っていないか、追い出された）。次に読んだときに新しい時刻で始まる
+            pass
+
+
+def stats():
+    """当たり・外れの件数（このプロセスの分）"""
+    backend = cache.stats() if hasattr(cache, 'stats') else {'backend': type(cache).__name__}
+    return {
+        'backend': backend,
+        'pages': {name: dict(c) for (kind, name), c in sorted(_counters.items()) if kind == 'page'},
+        'fragments': {name: dict(c) for (kind, name), c in sorted(_counters.items()) if kind == 'fragment'},
+    }
+
+
+def reset_stats():
+    _counters.clear()
+    if hasattr(cache, 'counters'):
+        cache.counters.clear()
@@ -0,0 +1,204 @@
+"""失業手当の受給チェック（夜間の一括処理）
+
+全会員のお仕事ログ（WorkLog）を user_id・日付順に少しずつ読み、NumPy で
+日別・週別に集計して、受給に影響しそうな日・週を ComplianceFlag に書き込みます。
+
+・1日：総支給額 LIMIT_EARNINGS 円以上、または LIMIT_HOURS 時間超え（work_tracker と同じ目安）
+・1日：賃金日額（Member.daily_wage）から見て基本手当が減額されそうな収入
+・1週（月曜始まり）：就労時間 WEEK_HOURS 時間以上、または就労日数 WEEK_DAYS 日以上
+
+読み込みは CHUNK_SIZE 行ごと（ユーザーの途中では切らない）なので、ログが何百万件でも
+メモリ使用量はほぼ一定です。差分実行では、前回の実行開始以降にお仕事ログの変更がコミットされた
+ユーザー（Member.worklog_changed_at。コミット後に付けるので、実行中に書き込まれた分も次回拾える）だけを読み直します。
+賃金日額の変更は差分実行では拾わないので、夜間は差分、週1回は全件（--full）を想定しています。
+
+要確認の行は (ユーザー, 種類, 開始日) ごとに上書きするので、コンサルタントが付けた
+「確認済み」は同じ日・週である限り残ります。
+"""
+import datetime
+from dataclasses import dataclass
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ComplianceFlag, ComplianceScanRun, Member, WorkLog, WorkLogDailyTotal
+
+LIMIT_EARNINGS = WorkLogDailyTotal.LIMIT_EARNINGS
+LIMIT_HOURS = WorkLogDailyTotal.LIMIT_HOURS
+
+# 週20時間以上働くと「就職」とみなされる目安
+WEEK_HOURS = 20
+WEEK_DAYS = 4
+
+# 減額の目安：(1日の収入 − 控除額) ＋ 基本手当日額 が 賃金日額の80% を超える日
+# 基本手当日額は賃金日額の 50〜80% なので、ここでは BENEFIT_RATE で近似する
+DEDUCTION = 1331
+BENEFIT_RATE = 0.6
+REDUCTION_RATE = 0.8
+
+CHUNK_SIZE = 50000
+USER_BATCH = 1000
+
+
+@dataclass
+class Flag:
+    user_id: int
+    kind: str
+    start_date: datetime.date
+    end_date: datetime.date
+    hours: float
+    earnings: int
+    work_days: int
+
+
+def _groups(*keys):
+    """並んだキー列が変わる位置（各グループの先頭の添字）"""
+    first = np.zeros(len(keys[0]), dtype=bool)
+    first[0] = True
+    for key in keys:
+        first[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(first)
+
+
+def _flags(kind, mask, users, starts, ends, hours, earnings, days):
+    fromordinal = datetime.date.fromordinal
+    return [
+        Flag(int(u), kind, fromordinal(int(s)), fromordinal(int(e)), round(float(h), 2), int(m), int(d))
+        for u, s, e, h, m, d in zip(
+            users[mask], starts[mask], ends[mask], hours[mask], earnings[mask], days[mask]
+        )
+    ]
+
+
+def scan_rows(rows, wages):
+    """(user_id, 日付, 時間, 支給額) の行と {user_id: 賃金日額} から Flag のリストを作る"""
+    n = len(rows)
+    if not n:
+        return []
+    users = np.fromiter((row[0] for row in rows), dtype=np.int64, count=n)
+    days = np.fromiter((row[1].toordinal() for row in rows), dtype=np.int64, count=n)
+    # 1件ずつ小数第2位に丸めてから足す（日別集計の worklog_rollups.as_hours と同じ決まり）
+    hours = np.round(np.fromiter((row[2] or 0 for row in rows), dtype=np.float64, count=n), 2)
+    earnings = np.fromiter((row[3] or 0 for row in rows), dtype=np.int64, count=n)
+    order = np.lexsort((days, users))
+    users, days, hours, earnings = users[order], days[order], hours[order], earnings[order]
+
+    # 日別
+    first = _groups(users, days)
+    d_users, d_days = users[first], days[first]
+    # float の足し算の誤差で「2時間超え」を誤判定しないよう、合計も小数第2位に丸める
+    d_hours = np.round(np.add.reduceat(hours, first), 2)
+    d_earnings = np.add.reduceat(earnings, first)
+    ones = np.ones(len(first), dtype=np.int64)
+
+    wage_users = np.fromiter(wages.keys(), dtype=np.int64, count=len(wages))
+    wage_values = np.fromiter(wages.values(), dtype=np.float64, count=len(wages))
+    wage_order = np.argsort(wage_users)
+    wage_users, wage_values = wage_users[wage_order], wage_values[wage_order]
+    position = np.clip(np.searchsorted(wage_users, d_users), 0, max(len(wage_users) - 1, 0))
+    d_wage = np.zeros(len(first))
+    if len(wage_users):
+        d_wage = np.where(wage_users[position] == d_users, wage_values[position], 0)
+
+    over_limit = (d_earnings >= LIMIT_EARNINGS) | (d_hours > LIMIT_HOURS)
+    reduction = (d_wage > 0) & (
+        d_earnings - DEDUCTION + d_wage * BENEFIT_RATE > d_wage * REDUCTION_RATE
+    )
+
+    # 週別（0001-01-01 は月曜なので、序数から月曜の日付が出せる）
+    week = d_days - (d_days - 1) % 7
+    w_first = _groups(d_users, week)
+    w_users, w_starts = d_users[w_first], week[w_first]
+    w_hours = np.round(np.add.reduceat(d_hours, w_first), 2)
+    w_earnings = np.add.reduceat(d_earnings, w_first)
+    w_days = np.add.reduceat(ones, w_first)
+    week_hours = w_hours >= WEEK_HOURS
+    week_days = w_days >= WEEK_DAYS
+
+    day_args = (d_users, d_days, d_days, d_hours, d_earnings, ones)
+    week_args = (w_users, w_starts, w_starts + 6, w_hours, w_earnings, w_days)
+    return (
+        _flags(ComplianceFlag.KIND_DAY_LIMIT, over_limit, *day_args)
+        + _flags(ComplianceFlag.KIND_DAY_REDUCTION, reduction, *day_args)
+        + _flags(ComplianceFlag.KIND_WEEK_HOURS, week_hours, *week_args)
+        + _flags(ComplianceFlag.KIND_WEEK_DAYS, week_days, *week_args)
+    )
+
+
+def stream_batches(logs, chunk_size=CHUNK_SIZE):
+    """ログを user_id 順に読み、ユーザーの途中で切らずに chunk_size 行前後ずつ返す"""
+    batch = []
+    rows = logs.order_by('user_id', 'date').values_list('user_id', 'date', 'hours', 'earnings')
+    for row in rows.iterator(chunk_size=chunk_size):
+        if len(batch) >= chunk_size and row[0] != batch[-1][0]:
+            yield batch
+            batch = []
+        batch.append(row)
+    if batch:
+        yield batch
+
+
+def save_flags(user_ids, flags, scanned_at):
+    """user_ids の要確認を flags で置き換える（同じ日・週の行は上書きして確認済みを残す）"""
+    with transaction.atomic():
+        if flags:
+            ComplianceFlag.objects.bulk_create(
+                [
+                    ComplianceFlag(
+                        user_id=flag.user_id, kind=flag.kind, start_date=flag.start_date, end_date=flag.end_date,
+                        hours=flag.hours, earnings=flag.earnings, work_days=flag.work_days, scanned_at=scanned_at,
+                    )
+                    for flag in flags
+                ],
+                batch_size=1000, update_conflicts=True,
+                unique_fields=['user', 'kind', 'start_date'],
+                update_fields=['end_date', 'hours', 'earnings', 'work_days', 'scanned_at'],
+            )
+        # 今回見つからなかった日・週（ログの修正・削除で解消したもの）を消す
+        ComplianceFlag.objects.filter(user_id__in=user_ids, scanned_at__lt=scanned_at).delete()
+
+
+def _scan(logs, user_ids, run, chunk_size):
+    """logs を読んで要確認を書き込む。user_ids（なければ読んだユーザー）の古い行は消す"""
+    for rows in stream_batches(logs, chunk_size):
+        batch_users = sorted({row[0] for row in rows})
+        wages = dict(Member.objects.filter(user_id__in=batch_users).values_list('user_id', 'daily_wage'))
+        flags = scan_rows(rows, wages)
+        save_flags(batch_users, flags, run.started_at)
+        run.log_rows += len(rows)
+        run.flags += len(flags)
+        if user_ids is None:
+            run.users += len(batch_users)
+    if user_ids is not None:
+        # ログが1件もなくなったユーザーもここで片付く
+        ComplianceFlag.objects.filter(user_id__in=user_ids, scanned_at__lt=run.started_at).delete()
+        run.users += len(user_ids)
+
+
+def changed_user_ids(since):
+    return list(
+        Member.objects.filter(worklog_changed_at__gte=since, user__isnull=False)
+        .order_by('user_id').values_list('user_id', flat=True)
+    )
+
+
+def run_scan(full=False, chunk_size=CHUNK_SIZE, user_batch=USER_BATCH):
+    """受給チェックを実行して ComplianceScanRun を返す。前回の実行がなければ全件"""
+    last = ComplianceScanRun.objects.filter(finished_at__isnull=False).order_by('-started_at').first()
+    full = full or last is None
+    run = ComplianceScanRun.objects.create(started_at=timezone.now(), is_full=full)
+
+    if full:
+        _scan(WorkLog.objects.all(), None, run, chunk_size)
+        # ログのないユーザーに残っている行を消す
+        ComplianceFlag.objects.filter(scanned_at__lt=run.started_at).delete()
+    else:
+        user_ids = changed_user_ids(last.started_at)
+        for i in range(0, len(user_ids), user_batch):
+            chunk = user_ids[i:i + user_batch]
+            _scan(WorkLog.objects.filter(user_id__in=chunk), chunk, run, chunk_size)
+
+    run.finished_at = timezone.now()
+    run.save()
+    return run
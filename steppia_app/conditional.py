@@ -0,0 +1,93 @@
+"""求人・スケジュール画面の条件付き GET（ETag / Last-Modified → 304 Not Modified）
+
+各画面の「状態」を集計クエリ1本（最終更新日時＋件数）で求め、そこから ETag と Last-Modified を作ります。
+ブラウザの持っている版と同じなら、テンプレートを描かずに 304 を返します。
+
+・ログイン中 … Cache-Control: private, no-cache（ブラウザには残してよいが、毎回確かめる）
+・未ログイン … Cache-Control: public（秒数は cache_policy.PAGE_POLICY のページキャッシュが付ける）
+
+削除は件数、追加・変更は updated_at の最大値に出るので、どちらでも ETag が変わります。
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import recommend
+from .models import Job, Schedule
+
+
+def conditional_page(state):
+    """state(request, *args, **kwargs) → (最終更新日時, ETag の材料...) を使う条件付き GET のデコレーター
+
+    state が None を返したときは条件付き GET をしない（普通に描く）。
+    非同期のビューにも付けられる（state は普通の関数のまま、別スレッドで先に求める）。
+    """
+    def decorator(view):
+        def current_state(request, *args, **kwargs):
+            # ETag と Last-Modified で集計を2回しないように、リクエストごとに1回だけ求める
+            if not hasattr(request, '_conditional_state'):
+                request._conditional_state = state(request, *args, **kwargs)
+            return request._conditional_state
+
+        def etag(request, *args, **kwargs):
+            current = current_state(request, *args, **kwargs)
+            if current is None:
+                return None
+            return hashlib.md5(repr(current).encode(), usedforsecurity=False).hexdigest()
+
+        def last_modified(request, *args, **kwargs):
+            current = current_state(request, *args, **kwargs)
+            return current and current[0]
+
+        def cache_control(request, response):
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(response, public=True)
+            return response
+
+        conditioned = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # condition() は etag / last_modified を同期で呼ぶので、SQL はその前に済ませておく
+                await sync_to_async(current_state)(request, *args, **kwargs)
+                return cache_control(request, await conditioned(request, *args, **kwargs))
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return cache_control(request, conditioned(request, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+def job_list_state(request):
+    jobs = Job.objects.aggregate(latest=Max('updated_at'), count=Count('pk'))
+    user_id = request.user.pk if request.user.is_authenticated else None
+    # おすすめ求人が出るとき（ログイン中に条件なしで開いたとき）は、おすすめの元になるものの版を含める。
+    # 求人の変化は上の集計に出るので、あとは会員の応募・相談の世代と、行列ができているか。
+    # おすすめそのものはここでは計算しない（304 のために SQL や行列の作成をしない）
+    recommended = ()
+    if user_id is not None and not request.GET.keys() - {'cursor'}:
+        recommended = (recommend.generation(request.user), recommend.engine.ready)
+    return jobs['latest'], jobs['count'], user_id, recommended
+
+
+def job_detail_state(request, pk):
+    latest = Job.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    # 求人がなければ条件付き GET をせず、ビューに 404 を返させる
+    return None if latest is None else (latest, pk)
+
+
+def schedule_state(request):
+    schedules = Schedule.objects.filter(user=request.user).aggregate(latest=Max('updated_at'), count=Count('pk'))
+    return schedules['latest'], schedules['count'], request.user.pk
@@ -0,0 +1,323 @@
+"""AI相談ログのまとめ書き
+
+settings.CONSULT_LOG_BUFFER['ENABLED'] が True のときだけ使われます。
+リクエスト中はキューに積むだけで、バックグラウンドのスレッドが
+件数（BATCH_SIZE）か時間（FLUSH_INTERVAL）のどちらかに達した時点で
+bulk_create でまとめて書き込みます。プロセス終了時にも残りを書き込みます。
+
+DBに書けなかったログは SPILL_PATH に JSON Lines で退避し、
+次に書き込みが成功したときに読み戻します。
+退会したユーザーのログのように、何度書いても制約違反になる行は退避せずに捨てます。
+退避ファイルの壊れた行（書きかけなど）は読み戻さず、SPILL_PATH に .bad を付けたファイルへ移します。
+
+キューの長さ・書き込みの時間・件数は /metrics/ に出ます（steppia_consult_log_*。steppia_app/metrics.py）。
+
+相談日時は log_consultation を呼んだ時刻をキューに一緒に積んで書き込むので、
+まとめ書き・読み戻しのどちらでも書き込みの時刻にはずれません。
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection
+from django.utils import timezone
+
+from . import metrics
+from .dashboard import invalidate as invalidate_dashboard
+from .recommend import invalidate as invalidate_recommendations
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL': 2.0,
+    'MAX_QUEUE': 10000,
+    'SPILL_PATH': None,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CONSULT_LOG_BUFFER', {}))
+    return config
+
+
+class BufferedLogWriter:
+    def __init__(self, batch_size=100, flush_interval=2.0, max_queue=10000, spill_path=None, autostart=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = Path(spill_path) if spill_path else None
+        self.autostart = autostart
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._flush_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.counters = {
+            'enqueued': 0,
+            'written': 0,
+            'flushes': 0,
+            'flush_seconds_total': 0.0,
+            'last_flush_seconds': 0.0,
+            'spilled': 0,
+            'replayed': 0,
+            'dropped': 0,
+            'rejected': 0,
+            'quarantined': 0,
+        }
+
+    # --- 受付 ---
+    def enqueue(self, user_id, user_question, ai_response, created_at=None):
+        entry = {
+            'user_id': user_id, 'user_question': user_question, 'ai_response': ai_response,
+            # 退避ファイル（JSON）にもそのまま書けるよう文字列で持つ
+            'created_at': (created_at or timezone.now()).isoformat(),
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            # キューがあふれたらDBを待たずにファイルへ退避
+            self._spill([entry])
+            return
+        self._count('enqueued')
+        metrics.CONSULT_LOG_QUEUE.set(self._queue.qsize())
+        if self.autostart:
+            self._ensure_thread()
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def stats(self):
+        return dict(self.counters, queue_depth=self._queue.qsize())
+
+    def _count(self, result, amount=1):
+        self.counters[result] += amount
+        metrics.CONSULT_LOG_ENTRIES.labels(result).inc(amount)
+
+    # --- 書き込み ---
+    def flush(self):
+        """キューにあるログをすべて書き込み、書き込んだ件数を返す"""
+        with self._flush_lock:
+            written = 0
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                done, unwritten = self._write(batch)
+                written += len(done)
+                if unwritten:
+                    self._spill(unwritten)
+                    break
+            if written and self.spill_path and self.spill_path.exists():
+                self._replay_spill()
+            return written
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        metrics.CONSULT_LOG_QUEUE.set(self._queue.qsize())
+        return batch
+
+    def _write(self, batch):
+        """batch を書き込み、(書けたログ, DB の不調で書けなかった＝退避すべきログ) を返す"""
+        from .models import AIConsultLog
+
+        start = time.perf_counter()
+        try:
+            AIConsultLog.objects.bulk_create([_log(entry) for entry in batch])
+            written, unwritten = batch, []
+        except IntegrityError:
+            # 制約違反の行が混じっていたら、1件ずつ書いてその行だけを捨てる
+            written, unwritten = self._write_each(batch)
+        except DatabaseError:
+            logger.exception("AI相談ログ %d 件の書き込みに失敗しました", len(batch))
+            return [], batch
+        # bulk_create はシグナルを出さないので、マイページ・おすすめ求人のキャッシュはここで消す
+        user_ids = {entry['user_id'] for entry in written}
+        invalidate_dashboard(*user_ids)
+        invalidate_recommendations(*user_ids)
+        elapsed = time.perf_counter() - start
+        self._count('written', len(written))
+        metrics.CONSULT_LOG_FLUSH.observe(elapsed)
+        self.counters['flushes'] += 1
+        self.counters['flush_seconds_total'] += elapsed
+        self.counters['last_flush_seconds'] = elapsed
+        return written, unwritten
+
+    def _write_each(self, batch):
+        """1件ずつ書く。戻り値は _write と同じ"""
+        from .models import AIConsultLog
+
+        written = []
+        for i, entry in enumerate(batch):
+            try:
+                AIConsultLog.objects.bulk_create([_log(entry)])
+            except IntegrityError:
+                self._count('rejected')
+                logger.error("制約に違反する AI相談ログを破棄しました（user_id=%s）", entry['user_id'])
+                continue
+            except DatabaseError:
+                logger.exception("AI相談ログ %d 件の書き込みに失敗しました", len(batch) - i)
+                return written, batch[i:]
+            written.append(entry)
+        return written, []
+
+    # --- 退避ファイル ---
+    def _spill(self, entries):
+        if self.spill_path is None:
+            self._count('dropped', len(entries))
+            logger.error("退避先がないため AI相談ログ %d 件を破棄しました", len(entries))
+            return
+        if self._append_spill(entries):
+            self._count('spilled', len(entries))
+
+    def _append_spill(self, entries):
+        try:
+            with self._spill_lock:
+                self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+                with self.spill_path.open('a', encoding='utf-8') as f:
+                    for entry in entries:
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        except OSError:
+            self._count('dropped', len(entries))
+            logger.exception("AI相談ログ %d 件を退避できませんでした", len(entries))
+            return False
+        return True
+
+    def _replay_spill(self):
+        # 読み戻し中に別スレッドが追記しないよう、ファイルごと付け替えてから読む
+        replaying = self.spill_path.with_name(f"{self.spill_path.name}.{os.getpid()}.replay")
+        with self._spill_lock:
+            try:
+                self.spill_path.replace(replaying)
+            except FileNotFoundError:
+                return
+        entries, bad = [], []
+        with replaying.open(encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = _parse_spilled(line)
+                if entry is None:
+                    bad.append(line if line.endswith('\n') else line + '\n')
+                else:
+                    entries.append(entry)
+        if bad:
+            self._quarantine(bad)
+        for i in range(0, len(entries), self.batch_size):
+            batch = entries[i:i + self.batch_size]
+            done, unwritten = self._write(batch)
+            self._count('replayed', len(done))
+            if unwritten:
+                # まだDBが不調なら残りを退避ファイルへ戻す
+                self._append_spill(unwritten + entries[i + self.batch_size:])
+                break
+        replaying.unlink()
+
+    def _quarantine(self, lines):
+        """読めない行を .bad のファイルへ移す（あとで人が確かめられるように捨てずに残す）"""
+        bad_path = self.spill_path.with_name(f"{self.spill_path.name}.bad")
+        logger.error("退避ファイルの読めない行 %d 件を %s へ移しました", len(lines), bad_path)
+        try:
+            with self._spill_lock, bad_path.open('a', encoding='utf-8') as f:
+                f.writelines(lines)
+        except OSError:
+            logger.exception("退避ファイルの読めない行 %d 件を移せませんでした", len(lines))
+        self._count('quarantined', len(lines))
+
+    # --- バックグラウンドスレッド ---
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='consult-log-writer', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                try:
+                    self.flush()
+                except Exception:
+                    # 思わぬ失敗でも書き込みのスレッドは止めない（次の回にまた書く）
+                    logger.exception("AI相談ログのまとめ書きに失敗しました")
+        finally:
+            connection.close()
+
+    def close(self):
+        """終了時の後片付け：スレッドを止め、残りを書き込む"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+
+def _log(entry):
+    from .models import AIConsultLog
+
+    entry = dict(entry)
+    # 相談日時のない古い退避ファイルは読み戻した時刻にする
+    created_at = entry.pop('created_at', None)
+    return AIConsultLog(**entry, created_at=datetime.fromisoformat(created_at) if created_at else timezone.now())
+
+
+def _parse_spilled(line):
+    """退避ファイルの1行をキューと同じ形に戻す。壊れた行なら None"""
+    try:
+        entry = json.loads(line)
+        if not isinstance(entry, dict):
+            return None
+        _log(entry)
+    except (ValueError, TypeError):
+        return None
+    return entry
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                config = get_config()
+                _writer = BufferedLogWriter(
+                    batch_size=config['BATCH_SIZE'],
+                    flush_interval=config['FLUSH_INTERVAL'],
+                    max_queue=config['MAX_QUEUE'],
+                    spill_path=config['SPILL_PATH'],
+                )
+                atexit.register(_writer.close)
+    return _writer
+
+
+def log_consultation(user, user_question, ai_response):
+    """AI相談ログを保存する（設定に応じて即時 or まとめ書き）"""
+    from .models import AIConsultLog
+
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    created_at = timezone.now()
+    if get_config()['ENABLED']:
+        get_writer().enqueue(user_id, user_question, ai_response, created_at=created_at)
+    else:
+        AIConsultLog.objects.create(
+            user_id=user_id, user_question=user_question, ai_response=ai_response, created_at=created_at,
+        )
@@ -0,0 +1,88 @@
+"""マイページのスナップショットキャッシュ
+
+マイページに出す5種類のデータを1つの辞書にまとめてキャッシュします。
+元になるモデル（AIConsultLog / Schedule / Application / Coupon / Member）が
+保存・削除されると models.py のシグナルでそのユーザーの分だけ（トランザクションのコミット後に）消します。
+QuerySet.update() や bulk_create() はシグナルを出さないので、
+呼び出し側で invalidate() を呼んでください。
+
+aget_snapshot() は非同期版の画面（async_views.py）用で、5本の SQL を asyncio.gather でまとめて待ちます。
+"""
+import asyncio
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache_policy import invalidate_fragments
+
+DEFAULT_TIMEOUT = 300
+
+
+def cache_key(user_id):
+    return f'mypage:dashboard:{user_id}'
+
+
+def _querysets(user):
+    """スナップショットの一覧部分（名前 → QuerySet）"""
+    from .models import AIConsultLog, Application, Coupon, Schedule
+
+    return {
+        'logs': AIConsultLog.objects.filter(user=user).order_by('-created_at'),
+        'mypage_schedules': Schedule.objects.filter(user=user, kind=Schedule.KIND_CONSULT).order_by('-date', '-time'),
+        # テンプレートで app.job を読むので JOIN して1クエリにまとめる
+        'applications': Application.objects.filter(user=user).select_related('job').order_by('-applied_at'),
+        'coupons': Coupon.objects.filter(user=user, is_used=False).order_by('-won_at'),
+    }
+
+
+def _consultant_name(user):
+    from .models import Member
+
+    return Member.objects.filter(user=user).values_list('assigned_consultant', flat=True)
+
+
+def build_snapshot(user):
+    snapshot = {name: list(queryset) for name, queryset in _querysets(user).items()}
+    snapshot['consultant_name'] = _consultant_name(user).first()
+    return snapshot
+
+
+async def abuild_snapshot(user):
+    async def rows(queryset):
+        return [row async for row in queryset]
+
+    querysets = _querysets(user)
+    *lists, consultant_name = await asyncio.gather(
+        *(rows(queryset) for queryset in querysets.values()), _consultant_name(user).afirst(),
+    )
+    return dict(zip(querysets, lists), consultant_name=consultant_name)
+
+
+def _timeout():
+    return getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def get_snapshot(user):
+    key = cache_key(user.pk)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_snapshot(user)
+        cache.set(key, snapshot, _timeout())
+    return snapshot
+
+
+async def aget_snapshot(user):
+    key = cache_key(user.pk)
+    snapshot = await cache.aget(key)
+    if snapshot is None:
+        snapshot = await abuild_snapshot(user)
+        await cache.aset(key, snapshot, _timeout())
+    return snapshot
+
+
+def invalidate(*user_ids):
+    keys = [cache_key(user_id) for user_id in user_ids if user_id is not None]
+    if keys:
+        cache.delete_many(keys)
+    # マイページの部分キャッシュ（cache_policy.FRAGMENT_POLICY）も古くする
+    invalidate_fragments(*user_ids)
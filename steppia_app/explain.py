@@ -0,0 +1,101 @@
+"""画面ごとの SQL の実行計画（explain_queries コマンド）
+
+seed_scale で作ったデータの上で benchmark.endpoints() の URL を1回ずつ GET し、
+発行された SELECT を形（sql_budget.fingerprint）ごとに1本ずつ EXPLAIN して、
+・インデックスを使ったか
+・表を頭から全部読んだか（SQLite の SCAN / PostgreSQL の Seq Scan）
+・並べ替えを別にしたか（SQLite の TEMP B-TREE / PostgreSQL の Sort）
+を調べます。「ユーザーで絞って新しい順」の一覧が全件読み・並べ替えになっていたら、インデックスが足りません。
+
+行数が少ないと PostgreSQL はインデックスを使わないことがあるので、本番規模のデータで動かしてください。
+"""
+import re
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+
+from . import benchmark
+from .sql_budget import fingerprint
+
+_SQLITE_SCAN = re.compile(r'^SCAN (\w+)$')
+_PG_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+_PG_SORT = re.compile(r'^\s*(?:->\s+)?(?:Incremental )?Sort\s+\(')
+
+
+def collect(client, path):
+    """1回 GET して、発行された SELECT の [(sql, params)]（同じ形は最初の1本だけ）"""
+    statements, seen = [], set()
+
+    def record(execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            shape = fingerprint(sql)
+            if shape not in seen:
+                seen.add(shape)
+                statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+    benchmark.require_local_cache()
+    cache.clear()
+    with connection.execute_wrapper(record):
+        response = client.get(path)
+        if response.streaming:
+            b''.join(response.streaming_content)
+    return statements
+
+
+def explain(sql, params):
+    """実行計画の各行（文字列）"""
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        rows = cursor.fetchall()
+    # SQLite は (id, parent, notused, detail)、PostgreSQL は1列
+    return [str(row[-1]) for row in rows]
+
+
+def analyse(plan):
+    """{'index': 使った, 'full_scans': [全部読んだ表], 'sort': 別に並べ替えた}"""
+    if connection.vendor == 'sqlite':
+        full_scans = [m.group(1) for m in map(_SQLITE_SCAN.match, plan) if m]
+        return {
+            'index': any(' USING ' in line for line in plan),
+            'full_scans': full_scans,
+            'sort': any('TEMP B-TREE' in line for line in plan),
+        }
+    return {
+        'index': any('Index Scan' in line or 'Index Only Scan' in line for line in plan),
+        'full_scans': [m.group(1) for m in map(_PG_SEQ_SCAN.search, plan) if m],
+        'sort': any(_PG_SORT.match(line) for line in plan),
+    }
+
+
+def run(member=None, staff=None, only=None, tables=None):
+    """{URL のキー: [{'sql', 'plan', 'index', 'full_scans', 'sort'}]}
+
+    tables を渡すと、その表を読む SELECT だけを調べる（既定はこのアプリの表）
+    """
+    if member is None:
+        member = benchmark.default_member()
+    if staff is None:
+        staff = User.objects.filter(is_staff=True).order_by('pk').first()
+    if tables is None:
+        tables = ('steppia_app_',)
+    results, clients = {}, {}
+    for key, path, user, reason in benchmark.endpoints(member, staff):
+        if reason is not None or (only and key not in only):
+            continue
+        client = clients.get(user)
+        if client is None:
+            client = clients[user] = Client(raise_request_exception=False)
+            if user is not None:
+                client.force_login(user)
+        reports = []
+        for sql, params in collect(client, path):
+            if not any(table in sql for table in tables):
+                continue
+            plan = explain(sql, params)
+            reports.append({'sql': fingerprint(sql), 'plan': plan, **analyse(plan)})
+        results[key] = reports
+    return results
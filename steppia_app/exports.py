@@ -0,0 +1,107 @@
+"""お仕事ログ・AI相談履歴のダウンロード（CSV / JSON Lines）
+
+行は .iterator(chunk_size=...) で少しずつ読み出し（PostgreSQL ではサーバーサイドカーソル）、
+1行ずつ書き出すので、件数が増えてもメモリ使用量は変わりません。
+StreamingHttpResponse と管理コマンド（export_logs）の両方から使います。
+"""
+import csv
+import datetime
+import json
+
+from django.utils import timezone
+
+from .models import AIConsultLog, WorkLog
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# 名前: (モデル, 日付で絞るフィールド, [(列名, 見出し)])
+DATASETS = {
+    'worklogs': (WorkLog, 'date', [
+        ('date', '就労日'),
+        ('company_name', '会社名'),
+        ('hours', '就労時間'),
+        ('earnings', '総支給額'),
+    ]),
+    'consult-logs': (AIConsultLog, 'created_at__date', [
+        ('created_at', '相談日時'),
+        ('user_question', '相談内容'),
+        ('ai_response', 'AIの回答'),
+    ]),
+}
+
+# 管理者向けの出力では誰のデータか分かる列を先頭に足す
+STAFF_COLUMNS = [('user_id', 'ユーザーID'), ('user__username', 'ユーザー名')]
+
+
+class Echo:
+    """csv.writer の書き込み先。受け取った文字列をそのまま返す"""
+
+    def write(self, value):
+        return value
+
+
+def columns_for(dataset, staff=False):
+    columns = DATASETS[dataset][2]
+    return STAFF_COLUMNS + columns if staff else columns
+
+
+def get_rows(dataset, user=None, start=None, end=None, staff=False):
+    """出力する行を values_list のイテレータで返す（start〜end は両端を含む）"""
+    model, date_field, _ = DATASETS[dataset]
+    rows = model.objects.all()
+    if user is not None:
+        rows = rows.filter(user=user)
+    if start:
+        rows = rows.filter(**{f'{date_field}__gte': start})
+    if end:
+        rows = rows.filter(**{f'{date_field}__lte': end})
+    fields = [name for name, _ in columns_for(dataset, staff)]
+    return rows.order_by(date_field.split('__')[0], 'pk').values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _plain(value):
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+# Excel が数式として読んでしまう先頭の文字（CSV インジェクション対策）
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _cell(value):
+    """CSV の1マス。会員が入力した文字列が数式として実行されないよう、先頭に ' を付ける"""
+    value = _plain(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(rows, columns):
+    writer = csv.writer(Echo())
+    # Excel で文字化けしないよう BOM を付ける
+    yield '\ufeff' + writer.writerow([label for _, label in columns])
+    for row in rows:
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def iter_jsonl(rows, columns):
+    names = [name for name, _ in columns]
+    for row in rows:
+        yield json.dumps(dict(zip(names, map(_plain, row))), ensure_ascii=False) + '\n'
+
+
+def iter_export(dataset, fmt, **filters):
+    columns = columns_for(dataset, filters.get('staff', False))
+    rows = get_rows(dataset, **filters)
+    return iter_csv(rows, columns) if fmt == 'csv' else iter_jsonl(rows, columns)
+
+
+def filename(dataset, fmt):
+    return f"steppia-{dataset}-{timezone.localdate():%Y%m%d}.{fmt}"
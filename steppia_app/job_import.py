@@ -0,0 +1,117 @@
+"""求人の一括取込（CSV / JSON Lines）
+
+・フィードは1行ずつ読み、BATCH_SIZE 件ごとに処理するのでメモリは一定です。
+・external_id で同じ求人を見分け、バッチ内の重複は後の行を優先します。
+・バッチごとに1トランザクションで「既存行の読み出し → 変更分だけ
+  bulk_create(update_conflicts=True) → 検索インデックスの作り直し」を行います。
+  bulk_create は save() もシグナルも通らないので、給与の数値化・検索インデックス・
+  おすすめ求人の行列の更新はここでまとめて行います。
+"""
+import csv
+import json
+from dataclasses import dataclass
+
+from django.db import transaction
+
+from . import salary
+from .models import Job
+from .recommend import engine as recommender
+from .search import index_jobs
+
+BATCH_SIZE = 1000
+KEY_FIELD = 'external_id'
+IMPORT_FIELDS = ('title', 'company', 'location', 'salary', 'description')
+SALARY_FIELDS = ('salary_min', 'salary_max', 'salary_unit')
+FORMATS = ('csv', 'jsonl')
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    batches: int = 0
+
+    def __str__(self):
+        return (
+            f"新規 {self.inserted} 件 / 更新 {self.updated} 件 / 変更なし {self.unchanged} 件"
+            f" / スキップ {self.skipped} 件（{self.batches} バッチ）"
+        )
+
+
+def detect_format(name):
+    return 'jsonl' if str(name).endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_feed(lines, fmt):
+    """テキストの行イテレータから1件ずつ dict を返す"""
+    if fmt == 'csv':
+        yield from csv.DictReader(lines)
+    else:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _clean(record):
+    """取込用に値を整える。必須項目が欠けていれば None"""
+    key = str(record.get(KEY_FIELD) or '').strip()
+    if not key or not str(record.get('title') or '').strip():
+        return None
+    values = {}
+    for field in IMPORT_FIELDS:
+        value = str(record.get(field) or '').strip()
+        max_length = Job._meta.get_field(field).max_length
+        values[field] = value[:max_length] if max_length else value
+    return key[:Job._meta.get_field(KEY_FIELD).max_length], values
+
+
+def _import_batch(batch, result):
+    with transaction.atomic():
+        existing = {
+            job.external_id: job
+            for job in Job.objects.filter(external_id__in=batch.keys()).only(KEY_FIELD, *IMPORT_FIELDS)
+        }
+        changed = []
+        for key, values in batch.items():
+            job = existing.get(key)
+            if job is None:
+                result.inserted += 1
+            elif all(getattr(job, field) == value for field, value in values.items()):
+                result.unchanged += 1
+                continue
+            else:
+                result.updated += 1
+            # bulk_create は save() を通らないので給与の数値化もここで行う
+            changed.append(salary.apply(Job(external_id=key, **values)))
+
+        if changed:
+            Job.objects.bulk_create(
+                changed, update_conflicts=True,
+                unique_fields=[KEY_FIELD], update_fields=list(IMPORT_FIELDS) + list(SALARY_FIELDS) + ['updated_at'],
+            )
+            # 主キーが返らないDBもあるので、取り直してから索引を作る
+            saved = list(Job.objects.filter(external_id__in=[job.external_id for job in changed]))
+            index_jobs(saved)
+            recommender.upsert_jobs(saved)
+    result.batches += 1
+
+
+def import_jobs(records, batch_size=BATCH_SIZE):
+    """dict のイテレータを取り込んで ImportResult を返す"""
+    result = ImportResult()
+    batch = {}
+    for record in records:
+        cleaned = _clean(record)
+        if cleaned is None:
+            result.skipped += 1
+            continue
+        key, values = cleaned
+        batch[key] = values
+        if len(batch) >= batch_size:
+            _import_batch(batch, result)
+            batch = {}
+    if batch:
+        _import_batch(batch, result)
+    return result
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from steppia_app import salary
+from steppia_app.models import Job
+
+
+class Command(BaseCommand):
+    help = "求人の給与テキストを解析し直して、給与の数値列（下限・上限・単位）を埋めます"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = salary.backfill(Job, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{count} 件の求人の給与を解析しました"))
@@ -0,0 +1,72 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from steppia_app.consult import FALLBACK_ANSWER, FAQ_DATA, ConsultMatcher
+from steppia_app.models import AIConsultTemplate
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_answer(user_q):
+    """変更前の ai_consult と同じ処理（比較用）"""
+    faq = dict(FAQ_DATA)
+    template_match = AIConsultTemplate.objects.filter(question__icontains=user_q).first()
+    if template_match:
+        return template_match.answer
+    return next((val for key, val in faq.items() if key in user_q), FALLBACK_ANSWER)
+
+
+class Command(BaseCommand):
+    help = "AI相談の回答処理を、変更前の処理とテンプレート件数別に比較します（データは最後にロールバック）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='50,5000,50000')
+        parser.add_argument('--queries', type=int, default=200)
+
+    def handle(self, *args, **options):
+        sizes = [int(n) for n in options['sizes'].split(',')]
+        rng = random.Random(0)
+        keywords = list(FAQ_DATA)
+        queries = [
+            rng.choice([
+                f"{rng.choice(keywords)}について教えてください",
+                f"よくある質問{rng.randrange(max(sizes))}",
+                "今日はとても疲れました",
+            ])
+            for _ in range(options['queries'])
+        ]
+
+        self.stdout.write(f"{'templates':>10} {'legacy ms/q':>12} {'matcher ms/q':>13} {'build ms':>9}")
+        for size in sizes:
+            try:
+                with transaction.atomic():
+                    AIConsultTemplate.objects.bulk_create(
+                        [AIConsultTemplate(question=f"よくある質問{i} 応募のコツ", answer=f"回答{i}") for i in range(size)],
+                        batch_size=1000,
+                    )
+                    start = time.perf_counter()
+                    matcher = ConsultMatcher()
+                    matcher.load()
+                    matcher.answer("ウォームアップ")
+                    build = time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    expected = [legacy_answer(q) for q in queries]
+                    legacy = time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    actual = [matcher.answer(q) for q in queries]
+                    fast = time.perf_counter() - start
+
+                    if actual != expected:
+                        self.stderr.write(self.style.ERROR(f"{size}: 回答が変更前と一致しません"))
+                    raise Rollback
+            except Rollback:
+                pass
+            n = len(queries)
+            self.stdout.write(f"{size:>10} {legacy / n * 1000:>12.3f} {fast / n * 1000:>13.3f} {build * 1000:>9.1f}")
@@ -0,0 +1,71 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from steppia_app import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "steppia_app/urls.py の URL をプロセス内で叩き、p50/p95/p99・SQL の本数・メモリのピークを JSON に保存します"
+        "（先に seed_scale でデータを作ってください。キャッシュを消すので本番では動かさないこと）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--user', help="会員としてログインするユーザー名（既定：お仕事ログのいちばん多い会員）")
+        parser.add_argument('--staff-user', help="スタッフ用の URL でログインするユーザー名（既定：最初のスタッフ）")
+        parser.add_argument('--anonymous', action='store_true', help="ログインせずに叩く")
+        parser.add_argument('--only', action='append', help="計測する URL の名前（複数指定可）")
+        parser.add_argument('--output', help="結果の JSON（既定：var/bench/<日時>-<コミット>.json）")
+        parser.add_argument('--compare', help="比べる前回の結果 JSON")
+
+    def handle(self, *args, **options):
+        before = None
+        if options['compare']:
+            before = json.loads(Path(options['compare']).read_text(encoding='utf-8'))
+
+        def user(username):
+            if username is None:
+                return None
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"ユーザー '{username}' がいません")
+
+        def progress(key, result):
+            self.stdout.write(
+                f"{key:<28} {result['status']} p50={result['p50_ms']:>8.2f}ms p95={result['p95_ms']:>8.2f}ms "
+                f"p99={result['p99_ms']:>8.2f}ms sql={result['queries']:>3} cold={result['cold_ms']:>8.2f}ms "
+                f"({result['cold_queries']}) peak={result['peak_kib']:>8.1f}KiB"
+            )
+
+        try:
+            results = benchmark.run(
+                member=user(options['user']), staff=user(options['staff_user']), anonymous=options['anonymous'],
+                only=options['only'], iterations=options['iterations'], warmup=options['warmup'], progress=progress,
+            )
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        for key, reason in results['skipped'].items():
+            self.stdout.write(f"{key:<28} 計測しない：{reason}")
+
+        output = options['output']
+        if output is None:
+            stamp = timezone.localtime().strftime('%Y%m%d-%H%M%S')
+            output = settings.BASE_DIR / 'var' / 'bench' / f"{stamp}-{results['meta']['commit'] or 'unknown'}.json"
+        output = Path(output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f"結果を {output} に保存しました"))
+
+        if before is not None:
+            self.stdout.write(f"\n前回（{before['meta']['commit']}）との比較：")
+            for key, old, new, change, old_sql, new_sql in benchmark.compare(before, results):
+                self.stdout.write(f"{key:<28} p50 {old:>8.2f} → {new:>8.2f}ms ({change:+.1f}%) sql {old_sql} → {new_sql}")
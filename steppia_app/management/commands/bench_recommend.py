@@ -0,0 +1,66 @@
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from steppia_app.recommend import Recommender
+
+WORDS = [
+    '一般事務', '経理', '倉庫', '軽作業', '受付', '介護', '清掃', 'データ入力', 'コールセンター', '販売',
+    '品出し', 'ピッキング', '検品', '調理補助', '保育補助', '在宅', '短時間', '未経験歓迎', '週3日', '土日休み',
+]
+PLACES = ['東京都', '神奈川県', '埼玉県', '千葉県', '大阪府', '愛知県', '福岡県']
+# 会社名・説明文の語彙を実データ並みに散らすための文字（常用漢字の一部）
+KANJI = [chr(code) for code in range(0x4E00, 0x4E00 + 3000)]
+
+
+def fake_word(rng):
+    return ''.join(rng.choices(KANJI, k=rng.randint(2, 4)))
+
+
+def fake_job(pk, rng):
+    words = rng.sample(WORDS, 6)
+    return SimpleNamespace(
+        pk=pk,
+        title=f"{words[0]}スタッフ",
+        company=f"{fake_word(rng)}株式会社",
+        location=rng.choice(PLACES),
+        description='・'.join(words[1:] + [fake_word(rng) for _ in range(8)]) + "のお仕事です。",
+    )
+
+
+class Command(BaseCommand):
+    help = "おすすめ求人の行列作成と上位k件の取得時間を、架空の求人で計測します（DBは使いません）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        jobs = [fake_job(pk, rng) for pk in range(1, options['jobs'] + 1)]
+
+        engine = Recommender()
+        start = time.perf_counter()
+        matrix = engine.rebuild(jobs)
+        build = time.perf_counter() - start
+        self.stdout.write(
+            f"jobs={len(matrix)} vocab={len(matrix.vocab)} nnz={len(matrix.data)} "
+            f"matrix={matrix.nbytes / 2**20:.1f}MiB build={build:.2f}s"
+        )
+
+        timings = []
+        for _ in range(options['queries']):
+            applied = rng.sample(jobs, rng.randint(1, 5))
+            questions = [f"{rng.choice(WORDS)}の面接が不安です"]
+            start = time.perf_counter()
+            engine.top_k(applied, questions, k=options['k'], exclude=[job.pk for job in applied])
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        self.stdout.write(
+            f"top-{options['k']}: mean={statistics.mean(timings):.2f}ms "
+            f"p95={timings[int(len(timings) * 0.95) - 1]:.2f}ms max={timings[-1]:.2f}ms"
+        )
@@ -0,0 +1,62 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from steppia_app import benchmark, throughput
+
+
+class Command(BaseCommand):
+    help = (
+        "gunicorn を同期ワーカー（WSGI）と uvicorn のワーカー（ASGI・非同期版の画面）で順に起動し、"
+        "マイページなどを同時接続で叩いて 1秒あたりの応答数を比べます（先に seed_scale でデータを作ってください）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="gunicorn のワーカー数（両方同じ）")
+        parser.add_argument('--concurrency', type=int, default=16, help="同時接続数")
+        parser.add_argument('--requests', type=int, default=400, help="画面ごとのリクエスト数")
+        parser.add_argument('--user', help="ログインするユーザー名（既定：お仕事ログのいちばん多い会員）")
+        parser.add_argument('--only', action='append', help="計測する URL の名前（複数指定可）")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--output', help="結果の JSON（既定：var/bench/<日時>-<コミット>-throughput.json）")
+
+    def handle(self, *args, **options):
+        member = None
+        if options['user']:
+            try:
+                member = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"ユーザー '{options['user']}' がいません")
+        elif benchmark.default_member() is None:
+            raise CommandError("会員がいません（先に seed_scale を実行してください）")
+
+        def progress(mode, key, result):
+            self.stdout.write(
+                f"{mode} {key:<12} {result['rps']:>8.1f} req/s p50={result['p50_ms']:>8.2f}ms "
+                f"p95={result['p95_ms']:>8.2f}ms errors={result['errors']} {' '.join(result['error_statuses'])}"
+            )
+
+        try:
+            results = throughput.run(
+                member=member, workers=options['workers'], concurrency=options['concurrency'],
+                requests=options['requests'], only=options['only'], port=options['port'], progress=progress,
+            )
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+
+        output = options['output']
+        if output is None:
+            stamp = timezone.localtime().strftime('%Y%m%d-%H%M%S')
+            output = settings.BASE_DIR / 'var' / 'bench' / f"{stamp}-{results['meta']['commit'] or 'unknown'}-throughput.json"
+        output = Path(output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f"結果を {output} に保存しました"))
+
+        self.stdout.write("\nWSGI → ASGI：")
+        for key, wsgi, asgi, change, wsgi_p95, asgi_p95 in throughput.compare(results['results']):
+            self.stdout.write(f"{key:<12} {wsgi:>8.1f} → {asgi:>8.1f} req/s ({change:+.1f}%) p95 {wsgi_p95:.2f} → {asgi_p95:.2f}ms")
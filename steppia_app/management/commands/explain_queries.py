@@ -0,0 +1,54 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from steppia_app import explain
+
+
+class Command(BaseCommand):
+    help = (
+        "steppia_app/urls.py の URL を1回ずつ叩き、発行された SELECT を EXPLAIN して、"
+        "インデックスを使ったか・表を全部読んだか・並べ替えを別にしたかを表示します（先に seed_scale でデータを作ってください）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="会員としてログインするユーザー名（既定：お仕事ログのいちばん多い会員）")
+        parser.add_argument('--staff-user', help="スタッフ用の URL でログインするユーザー名（既定：最初のスタッフ）")
+        parser.add_argument('--only', action='append', help="調べる URL の名前（複数指定可）")
+        parser.add_argument('--plans', action='store_true', help="実行計画をすべて表示する")
+
+    def handle(self, *args, **options):
+        def user(username):
+            if username is None:
+                return None
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"ユーザー '{username}' がいません")
+
+        try:
+            results = explain.run(member=user(options['user']), staff=user(options['staff_user']), only=options['only'])
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        problems = 0
+        for key, reports in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{key}（SELECT {len(reports)} 種類）"))
+            for report in reports:
+                notes = []
+                if report['full_scans']:
+                    notes.append("全件読み：" + ', '.join(report['full_scans']))
+                if report['sort']:
+                    notes.append("並べ替えあり")
+                if notes:
+                    problems += 1
+                    self.stdout.write(self.style.WARNING(f"  ✗ {' / '.join(notes)}"))
+                else:
+                    self.stdout.write("  ✓")
+                self.stdout.write(f"    {report['sql'][:200]}")
+                if options['plans'] or notes:
+                    for line in report['plan']:
+                        self.stdout.write(f"      {line}")
+        if problems:
+            self.stdout.write(self.style.WARNING(f"\nインデックスを使っていない・並べ替えている SELECT が {problems} 本あります"))
+        else:
+            self.stdout.write(self.style.SUCCESS("\nすべての SELECT がインデックスで読めています"))
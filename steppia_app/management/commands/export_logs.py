@@ -0,0 +1,37 @@
+import datetime
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from steppia_app import exports
+
+
+class Command(BaseCommand):
+    help = "お仕事ログ・AI相談履歴を CSV / JSON Lines で書き出します（少しずつ読み出すのでメモリは一定）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(exports.DATASETS))
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--start', type=datetime.date.fromisoformat, help="開始日（YYYY-MM-DD）")
+        parser.add_argument('--end', type=datetime.date.fromisoformat, help="終了日（YYYY-MM-DD）")
+        parser.add_argument('--user', type=int, help="ユーザーID")
+        parser.add_argument('--output', '-o', help="出力先ファイル（省略時は標準出力）")
+
+    def handle(self, *args, **options):
+        from django.contrib.auth.models import User
+
+        user = None
+        if options['user'] is not None:
+            user = User.objects.filter(pk=options['user']).first()
+            if user is None:
+                raise CommandError(f"ユーザーID {options['user']} が見つかりません")
+
+        chunks = exports.iter_export(
+            options['dataset'], options['format'], staff=True,
+            user=user, start=options['start'], end=options['end'],
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                f.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from steppia_app import booking
+from steppia_app.models import Consultant
+
+
+class Command(BaseCommand):
+    help = "コンサルタントの勤務時間から予約枠を作ります（作成済みの枠はそのまま）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=booking.HORIZON_DAYS)
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        for consultant in Consultant.objects.filter(is_active=True).prefetch_related('working_hours'):
+            count = booking.generate_slots(consultant, today, options['days'])
+            self.stdout.write(f"{consultant.name}: {count} 枠")
+        self.stdout.write(self.style.SUCCESS("予約枠を作成しました"))
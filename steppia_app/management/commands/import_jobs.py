@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from steppia_app import job_import
+
+
+class Command(BaseCommand):
+    help = "求人フィード（CSV / JSON Lines）を external_id で突き合わせて一括取込します"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=job_import.FORMATS, help="省略時は拡張子から判定")
+        parser.add_argument('--batch-size', type=int, default=job_import.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or job_import.detect_format(options['path'])
+        with open(options['path'], encoding='utf-8-sig', newline='') as f:
+            result = job_import.import_jobs(job_import.read_feed(f, fmt), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(str(result)))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from steppia_app.models import Job
+from steppia_app.search import index_jobs
+
+
+class Command(BaseCommand):
+    help = "求人検索インデックス（バイグラム）を全件作り直します"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch, jobs, tokens = [], 0, 0
+        for job in Job.objects.order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(job)
+            if len(batch) >= batch_size:
+                tokens += index_jobs(batch)
+                jobs += len(batch)
+                batch = []
+        tokens += index_jobs(batch)
+        jobs += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"{jobs} 件の求人から {tokens} 件のトークンを作成しました"))
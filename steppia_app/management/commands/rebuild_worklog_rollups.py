@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from steppia_app import worklog_rollups
+from steppia_app.models import WorkLog, WorkLogDailyTotal
+
+
+class Command(BaseCommand):
+    help = "お仕事ログの日別集計を WorkLog から作り直します（--verify で食い違いの確認だけ）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="書き換えずに食い違いを表示する")
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help="対象ユーザーID（複数指定可）")
+        parser.add_argument('--chunk-size', type=int, default=500, help="一度に処理するユーザー数")
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if user_ids is None:
+            user_ids = sorted(
+                set(WorkLog.objects.values_list('user_id', flat=True).distinct())
+                | set(WorkLogDailyTotal.objects.values_list('user_id', flat=True).distinct())
+            )
+        chunk_size = options['chunk_size']
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+
+        if options['verify']:
+            drift = 0
+            for chunk in chunks:
+                for user_id, day, have, want in worklog_rollups.find_drift(chunk):
+                    drift += 1
+                    self.stdout.write(f"user={user_id} date={day} 集計={have} 実データ={want}")
+            if drift:
+                self.stdout.write(self.style.ERROR(f"{drift} 件の食い違いがあります"))
+            else:
+                self.stdout.write(self.style.SUCCESS("日別集計は実データと一致しています"))
+            return
+
+        rows = sum(worklog_rollups.rebuild(chunk) for chunk in chunks)
+        self.stdout.write(self.style.SUCCESS(f"{len(user_ids)} 人分、{rows} 日分の集計を作り直しました"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from steppia_app import progress_counters
+from steppia_app.models import Member
+
+
+class Command(BaseCommand):
+    help = "冒険マップ用の件数（お仕事ログ・応募・現在地）のずれを検出して直します（--verify で確認だけ）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="書き換えずにずれを表示する")
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help="対象ユーザーID（複数指定可）")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="一度に処理するユーザー数")
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if user_ids is None:
+            user_ids = list(
+                Member.objects.filter(user__isnull=False).order_by('user_id').values_list('user_id', flat=True)
+            )
+        chunk_size = options['chunk_size']
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+
+        if options['verify']:
+            drift = 0
+            for chunk in chunks:
+                for user_id, have, want in progress_counters.find_drift(chunk):
+                    drift += 1
+                    self.stdout.write(f"user={user_id} 保存値={have} 実データ={want}")
+            if drift:
+                self.stdout.write(self.style.ERROR(f"{drift} 人分のずれがあります"))
+            else:
+                self.stdout.write(self.style.SUCCESS("冒険マップ用の件数は実データと一致しています"))
+            return
+
+        fixed = sum(progress_counters.reconcile(chunk) for chunk in chunks)
+        self.stdout.write(self.style.SUCCESS(f"{len(user_ids)} 人を確認し、{fixed} 人分の件数を直しました"))
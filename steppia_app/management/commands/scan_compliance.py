@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from steppia_app import compliance
+
+
+class Command(BaseCommand):
+    help = "お仕事ログから失業手当の受給に影響しそうな日・週を探します（夜間バッチ用。既定は差分実行）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="全ユーザーを読み直す")
+        parser.add_argument('--chunk-size', type=int, default=compliance.CHUNK_SIZE, help="一度に読むログの行数")
+
+    def handle(self, *args, **options):
+        run = compliance.run_scan(full=options['full'], chunk_size=options['chunk_size'])
+        seconds = (run.finished_at - run.started_at).total_seconds()
+        self.stdout.write(self.style.SUCCESS(
+            f"{'全件' if run.is_full else '差分'}チェック：{run.users} 人、ログ {run.log_rows} 件、"
+            f"要確認 {run.flags} 件（{seconds:.1f} 秒）"
+        ))
@@ -0,0 +1,181 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from steppia_app import progress_counters, salary, worklog_rollups
+from steppia_app.models import AIConsultLog, Application, Job, Member, WorkLog, kana_key
+from steppia_app.search import index_jobs
+from steppia_app.management.commands.bench_recommend import WORDS, fake_job
+
+# (漢字, ふりがな)
+LAST_NAMES = [
+    ('佐藤', 'さとう'), ('鈴木', 'すずき'), ('高橋', 'たかはし'), ('田中', 'たなか'), ('伊藤', 'いとう'),
+    ('渡辺', 'わたなべ'), ('山本', 'やまもと'), ('中村', 'なかむら'), ('小林', 'こばやし'), ('加藤', 'かとう'),
+    ('吉田', 'よしだ'), ('山田', 'やまだ'), ('佐々木', 'ささき'), ('山口', 'やまぐち'), ('松本', 'まつもと'),
+]
+FIRST_NAMES = [
+    ('花子', 'はなこ'), ('太郎', 'たろう'), ('美咲', 'みさき'), ('大輔', 'だいすけ'), ('陽菜', 'ひな'),
+    ('翔太', 'しょうた'), ('さくら', 'さくら'), ('健一', 'けんいち'), ('由美', 'ゆみ'), ('拓也', 'たくや'),
+]
+CONSULTANTS = ['小林 香織', '山村 雄一', '和田 雄一', None]
+SALARIES = ['時給{:,}円'.format(n) for n in range(1100, 1800, 50)] + [
+    '日給{:,}円'.format(n) for n in range(8000, 13000, 500)
+] + ['月給{}万円〜{}万円'.format(n, n + 5) for n in range(18, 30)]
+QUESTIONS = ['面接が不安です', '履歴書の書き方', '失業手当はいつまで', '短時間で働きたい', '職務経歴書の空白期間']
+
+
+class Command(BaseCommand):
+    help = "負荷計測用に、本番規模の架空データ（会員・お仕事ログ・AI相談ログ・求人）を bulk_create で作ります"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=100000)
+        parser.add_argument('--work-logs', type=int, default=1000000)
+        parser.add_argument('--consult-logs', type=int, default=500000)
+        parser.add_argument('--jobs', type=int, default=100000)
+        parser.add_argument('--applications', type=int, default=100000)
+        parser.add_argument('--scale', type=float, default=1.0, help="すべての件数に掛ける倍率（0.01 で1%%の規模）")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed', help="作るユーザー名の頭（同じ頭のユーザーがいればやめる）")
+        parser.add_argument('--seed', type=int, default=0, help="乱数の種（同じ値なら同じデータ）")
+
+    def handle(self, *args, **options):
+        counts = {
+            name: int(options[name] * options['scale'])
+            for name in ('members', 'work_logs', 'consult_logs', 'jobs', 'applications')
+        }
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{self.prefix}-').exists():
+            raise CommandError(f"ユーザー名が '{self.prefix}-' で始まるユーザーがすでにいます（--prefix を変えてください）")
+        if counts['members'] < 1 and any(counts[name] for name in ('work_logs', 'consult_logs', 'applications')):
+            raise CommandError("ログや応募を作るには会員が1人以上必要です")
+
+        user_ids = self.step('members', counts['members'], self.seed_members)
+        job_ids = self.step('jobs', counts['jobs'], self.seed_jobs)
+        self.step('work_logs', counts['work_logs'], lambda n: self.seed_work_logs(n, user_ids))
+        self.step('consult_logs', counts['consult_logs'], lambda n: self.seed_consult_logs(n, user_ids))
+        self.step('applications', counts['applications'], lambda n: self.seed_applications(n, user_ids, job_ids))
+        self.step('counters', len(user_ids), lambda n: self.refresh_derived(user_ids))
+
+    def step(self, name, count, seed):
+        start = time.perf_counter()
+        result = seed(count)
+        self.stdout.write(f"{name}: {count:,} 件 {time.perf_counter() - start:.1f}s")
+        return result
+
+    def batches(self, rows):
+        """行のイテレータを batch_size 件ずつのリストに区切る"""
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def seed_members(self, count):
+        # ハッシュ計算は重いので全員同じパスワード（"seed"）を1回だけ計算して使う
+        password = make_password('seed')
+        users = (User(username=f'{self.prefix}-{i}', password=password) for i in range(count))
+        for batch in self.batches(users):
+            # bulk_create は post_save を出さないので、Member も自分で作る
+            with transaction.atomic():
+                User.objects.bulk_create(batch)
+                created = dict(
+                    User.objects.filter(username__in=[user.username for user in batch]).values_list('username', 'pk')
+                )
+                Member.objects.bulk_create([self.fake_member(created[user.username]) for user in batch])
+        return list(
+            User.objects.filter(username__startswith=f'{self.prefix}-').order_by('pk').values_list('pk', flat=True)
+        )
+
+    def fake_member(self, user_id):
+        last_name, last_kana = self.rng.choice(LAST_NAMES)
+        first_name, first_kana = self.rng.choice(FIRST_NAMES)
+        return Member(
+            user_id=user_id, last_name=last_name, first_name=first_name,
+            last_name_kana=last_kana, first_name_kana=first_kana,
+            # bulk_create は save() を通らないので検索用のキーもここで作る
+            last_kana_key=kana_key(last_kana), first_kana_key=kana_key(first_kana),
+            email=f'{self.prefix}-{user_id}@example.com',
+            daily_wage=self.rng.randrange(4000, 8001, 100),
+            assigned_consultant=self.rng.choice(CONSULTANTS),
+        )
+
+    def seed_jobs(self, count):
+        job_ids = []
+        for batch in self.batches(range(count)):
+            jobs = []
+            for i in batch:
+                fake = fake_job(i, self.rng)
+                job = Job(
+                    external_id=f'{self.prefix}-{i}', title=fake.title, company=fake.company,
+                    location=fake.location, salary=self.rng.choice(SALARIES), description=fake.description,
+                )
+                jobs.append(salary.apply(job))
+            with transaction.atomic():
+                Job.objects.bulk_create(jobs)
+                # 主キーが返らないDBもあるので、取り直してから索引を作る
+                saved = list(Job.objects.filter(external_id__in=[job.external_id for job in jobs]))
+                index_jobs(saved)
+            job_ids.extend(job.pk for job in saved)
+        return job_ids
+
+    def seed_work_logs(self, count, user_ids):
+        today = timezone.localdate()
+        companies = [fake_job(i, self.rng).company for i in range(200)]
+
+        def rows():
+            for _ in range(count):
+                hours = self.rng.choice([2, 3, 4, 4, 5, 6, 8])
+                yield WorkLog(
+                    user_id=self.rng.choice(user_ids), company_name=self.rng.choice(companies),
+                    date=today - timedelta(days=self.rng.randrange(365)),
+                    hours=hours, earnings=hours * self.rng.randrange(1100, 1600, 50),
+                )
+
+        for batch in self.batches(rows()):
+            with transaction.atomic():
+                WorkLog.objects.bulk_create(batch)
+
+    def seed_consult_logs(self, count, user_ids):
+        rows = (
+            AIConsultLog(
+                user_id=self.rng.choice(user_ids),
+                user_question=f"{self.rng.choice(WORDS)}の仕事で、{self.rng.choice(QUESTIONS)}",
+                ai_response="焦らず、できることから一歩ずつ進めていきましょう。",
+            )
+            for _ in range(count)
+        )
+        for batch in self.batches(rows):
+            with transaction.atomic():
+                AIConsultLog.objects.bulk_create(batch)
+
+    def seed_applications(self, count, user_ids, job_ids):
+        if count and not job_ids:
+            raise CommandError("応募を作るには求人が1件以上必要です")
+        # (会員, 求人) が重ならないよう、会員ごとに求人を順にずらして割り当てる
+        pairs = (
+            (user_ids[i % len(user_ids)], job_ids[(i % len(user_ids) * 7 + i // len(user_ids)) % len(job_ids)])
+            for i in range(min(count, len(user_ids) * len(job_ids)))
+        )
+        rows = (Application(user_id=user_id, job_id=job_id) for user_id, job_id in pairs)
+        for batch in self.batches(rows):
+            with transaction.atomic():
+                Application.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def refresh_derived(self, user_ids):
+        """bulk_create で飛ばしたシグナルの代わりに、日別集計・進捗の件数・コンプライアンスの印を作る"""
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            worklog_rollups.rebuild(chunk)
+            progress_counters.reconcile(chunk)
+            Member.objects.filter(user_id__in=chunk).update(worklog_changed_at=timezone.now())
@@ -0,0 +1,75 @@
+"""会員名簿（コンサルタント向け）
+
+・並び順は ふりがな（せい → めい）の五十音順。キーセット方式のページ送りなので、
+  何ページ目でも「インデックスを途中から読む」だけで済みます。
+・検索はふりがなの前方一致。カタカナ・半角・空白の揺れは Member.last_kana_key /
+  first_kana_key と同じ kana_key() でそろえてから比べます。
+  「やまだ はなこ」のように空白で区切ると、せい・めいそれぞれの前方一致になります。
+・「@」を含む検索語はメールアドレスの完全一致（unique インデックス）で探します。
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+from .models import Member, kana_key
+
+PAGE_SIZE = 50
+ORDERING = ('last_kana_key', 'first_kana_key', 'pk')
+
+
+def search_filter(query):
+    """検索語を Q にする（空なら None）"""
+    query = (query or '').strip()
+    if not query:
+        return None
+    if '@' in query:
+        return Q(email=query)
+    parts = query.split()
+    if len(parts) >= 2:
+        return Q(last_kana_key__startswith=kana_key(parts[0]), first_kana_key__startswith=kana_key(''.join(parts[1:])))
+    key = kana_key(query)
+    return Q(last_kana_key__startswith=key) | Q(first_kana_key__startswith=key)
+
+
+def encode_cursor(member):
+    raw = json.dumps([member.last_kana_key, member.first_kana_key, member.pk], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        last, first, pk = json.loads(raw)
+        return str(last), str(first), int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def search_members(query='', consultant=None, cursor=None, page_size=PAGE_SIZE):
+    """会員を検索して (会員リスト, 次ページのカーソル) を返す"""
+    members = Member.objects.all()
+    condition = search_filter(query)
+    if condition is not None:
+        members = members.filter(condition)
+    if consultant:
+        members = members.filter(assigned_consultant=consultant)
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        last, first, pk = position
+        members = members.filter(
+            Q(last_kana_key__gt=last)
+            | Q(last_kana_key=last, first_kana_key__gt=first)
+            | Q(last_kana_key=last, first_kana_key=first, pk__gt=pk)
+        )
+    page = list(members.order_by(*ORDERING)[:page_size + 1])
+    next_cursor = encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+    return page[:page_size], next_cursor
+
+
+def consultant_names():
+    """絞り込み用の担当コンサルタント名（member_consultant_kana_idx の先頭列だけを読む）"""
+    return list(
+        Member.objects.exclude(assigned_consultant__isnull=True).exclude(assigned_consultant='')
+        .order_by('assigned_consultant').values_list('assigned_consultant', flat=True).distinct()
+    )
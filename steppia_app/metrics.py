@@ -0,0 +1,95 @@
+"""Prometheus 形式のメトリクス（/metrics/ で公開）
+
+・ビューごとの応答時間と、1リクエストで SQL にかかった時間（ヒストグラム）
+・キャッシュの当たり・外れ（ページ・部分・バックエンド）
+・AI相談の回答元（テンプレート / FAQ / 定型文）、ルーレット、応募、お仕事ログ
+・AI相談ログのまとめ書き（キューの長さ、書き込みの時間、書き込み・退避・破棄の件数）
+
+gunicorn の複数ワーカーでは、環境変数 PROMETHEUS_MULTIPROC_DIR のディレクトリに
+各ワーカーが mmap のファイルで値を書き、/metrics/ を受けたワーカーが全員分を合算して返します
+（prometheus_client の multiprocess モード。環境変数は gunicorn.conf.py が設定します）。
+環境変数がなければ（開発・テスト）このプロセスの値だけを返します。
+"""
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client import CONTENT_TYPE_LATEST  # noqa: F401（views から使う）
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    'steppia_request_duration_seconds', "ビューごとの応答時間", ['view', 'method'], buckets=LATENCY_BUCKETS,
+)
+DB_LATENCY = Histogram(
+    'steppia_db_duration_seconds', "1リクエストで SQL にかかった時間", ['view'], buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Counter('steppia_db_queries', "発行した SQL の本数", ['view'])
+CACHE_REQUESTS = Counter(
+    'steppia_cache_requests', "キャッシュの読み出し（kind: page / fragment / backend）", ['kind', 'name', 'result'],
+)
+CONSULTATIONS = Counter('steppia_consultations', "AI相談の回答（source: template / faq / fallback）", ['source'])
+ROULETTE_SPINS = Counter('steppia_roulette_spins', "ルーレットを回した回数（result: win / lose）", ['result'])
+APPLICATIONS = Counter('steppia_applications_created', "応募の件数")
+WORK_LOGS = Counter('steppia_work_logs_written', "お仕事ログの書き込み（action: create / update / delete）", ['action'])
+# 🆕 AI相談ログのまとめ書き（steppia_app/consult_log.py）。キューの長さは生きているワーカーの合計
+CONSULT_LOG_QUEUE = Gauge(
+    'steppia_consult_log_queue_depth', "書き込み待ちの AI相談ログの件数", multiprocess_mode='livesum',
+)
+CONSULT_LOG_FLUSH = Histogram(
+    'steppia_consult_log_flush_duration_seconds', "AI相談ログのまとめ書き1回にかかった時間", buckets=LATENCY_BUCKETS,
+)
+CONSULT_LOG_ENTRIES = Counter(
+    'steppia_consult_log_entries',
+    "AI相談ログの件数（result: enqueued / written / spilled / replayed / dropped / rejected / quarantined）",
+    ['result'],
+)
+
+
+def count_cache(kind, name, hit, amount=1):
+    CACHE_REQUESTS.labels(kind, name, 'hit' if hit else 'miss').inc(amount)
+
+
+def exposition():
+    """/metrics/ に返す本文（multiprocess モードなら全ワーカーの合計）"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+class MetricsMiddleware:
+    """応答時間と SQL の時間をビュー名ごとに記録する（SQLBudgetMiddleware より外側に置く）"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self._observe(request, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, time.perf_counter() - start)
+        return response
+
+    def _observe(self, request, elapsed):
+        match = request.resolver_match
+        # URL に当たらなかったもの（404）はまとめて数える（ラベルの種類を増やさない）
+        view = match.view_name if match else 'unmatched'
+        REQUEST_LATENCY.labels(view, request.method).observe(elapsed)
+        stats = getattr(request, 'sql_stats', None)
+        if stats is not None:
+            DB_LATENCY.labels(view).observe(stats.db_time)
+            DB_QUERIES.labels(view).inc(stats.queries)
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:15
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# 索引の作り方はこのマイグレーションを書いた時点の steppia_app/search.py の写し。
+# あとで search.py を変えても、このマイグレーションの結果は変わらないようにしておく
+FIELD_WEIGHTS = {
+    'title': 4,
+    'company': 3,
+    'location': 2,
+    'description': 1,
+}
+
+_SPLIT_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    return ''.join(
+        chr(ord(ch) - 0x60) if 'ァ' <= ch <= 'ヶ' else ch
+        for ch in text
+    )
+
+
+def tokenize(text):
+    tokens = []
+    for run in _SPLIT_RE.split(normalize(text)):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def job_tokens(job):
+    weights = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in set(tokenize(getattr(job, field))):
+            weights[token] = weights.get(token, 0) + weight
+    return weights
+
+
+def index_jobs(jobs, token_model):
+    rows = [
+        token_model(job_id=job.pk, token=token, weight=weight)
+        for job in jobs
+        for token, weight in job_tokens(job).items()
+    ]
+    token_model.objects.filter(job_id__in=[job.pk for job in jobs]).delete()
+    token_model.objects.bulk_create(rows, batch_size=1000)
+
+
+def build_index(apps, schema_editor):
+    Job = apps.get_model('steppia_app', 'Job')
+    JobSearchToken = apps.get_model('steppia_app', 'JobSearchToken')
+    batch = []
+    for job in Job.objects.order_by('pk').iterator(chunk_size=500):
+        batch.append(job)
+        if len(batch) >= 500:
+            index_jobs(batch, token_model=JobSearchToken)
+            batch = []
+    if batch:
+        index_jobs(batch, token_model=JobSearchToken)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('steppia_app', '0014_member_assigned_consultant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=2, verbose_name='トークン')),
+                ('weight', models.PositiveSmallIntegerField(default=1, verbose_name='重み')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='steppia_app.job')),
+            ],
+            options={
+                'verbose_name': '求人検索インデックス',
+                'verbose_name_plural': '求人検索インデックス',
+                'constraints': [models.UniqueConstraint(fields=('token', 'job'), name='jobsearchtoken_token_job_uniq')],
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill(apps, schema_editor):
+    WorkLog = apps.get_model('steppia_app', 'WorkLog')
+    WorkLogDailyTotal = apps.get_model('steppia_app', 'WorkLogDailyTotal')
+    rows = (
+        WorkLog.objects.values('user_id', 'date')
+        .annotate(total_hours=Sum('hours'), total_earnings=Sum('earnings'), total_count=Count('id'))
+        .order_by()
+    )
+    WorkLogDailyTotal.objects.bulk_create(
+        (
+            WorkLogDailyTotal(
+                user_id=row['user_id'], date=row['date'], hours=row['total_hours'] or 0,
+                earnings=row['total_earnings'] or 0, log_count=row['total_count'],
+            )
+            for row in rows.iterator(chunk_size=2000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('steppia_app', '0015_jobsearchtoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkLogDailyTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='就労日')),
+                ('hours', models.FloatField(default=0, verbose_name='就労時間の合計')),
+                ('earnings', models.IntegerField(default=0, verbose_name='総支給額の合計')),
+                ('log_count', models.IntegerField(default=0, verbose_name='記録件数')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='work_daily_totals', to=settings.AUTH_USER_MODEL, verbose_name='ユーザー')),
+            ],
+            options={
+                'verbose_name': 'お仕事ログ（日別集計）',
+                'verbose_name_plural': 'お仕事ログ（日別集計）',
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='worklogdailytotal_user_date_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('steppia_app', '0016_worklogdailytotal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouletteDailyStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日付')),
+                ('prize_name', models.CharField(max_length=100, verbose_name='景品名')),
+                ('awarded', models.IntegerField(default=0, verbose_name='払い出し数')),
+            ],
+            options={
+                'verbose_name': 'ルーレット景品の払い出し数',
+                'verbose_name_plural': 'ルーレット景品の払い出し数',
+                'constraints': [models.UniqueConstraint(fields=('date', 'prize_name'), name='roulettedailystock_date_prize_uniq')],
+            },
+        ),
+    ]
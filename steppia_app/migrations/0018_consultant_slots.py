@@ -0,0 +1,84 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:22
+
+import django.db.models.deletion
+import datetime
+
+from django.db import migrations, models
+
+# consult_setting.html に載っている3名（平日 10:00〜17:00）
+CONSULTANTS = [
+    ('小林 香織', 'カウンセラー歴5年'),
+    ('山村 雄一', 'カウンセラー歴8年'),
+    ('和田 雄一', 'カウンセラー歴20年'),
+]
+
+
+def seed_consultants(apps, schema_editor):
+    Consultant = apps.get_model('steppia_app', 'Consultant')
+    ConsultantWorkingHours = apps.get_model('steppia_app', 'ConsultantWorkingHours')
+    for name, career in CONSULTANTS:
+        consultant, created = Consultant.objects.get_or_create(name=name, defaults={'career': career})
+        if created:
+            ConsultantWorkingHours.objects.bulk_create([
+                ConsultantWorkingHours(
+                    consultant=consultant, weekday=weekday,
+                    start_time=datetime.time(10, 0), end_time=datetime.time(17, 0),
+                )
+                for weekday in range(5)
+            ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('steppia_app', '0017_roulettedailystock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Consultant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='名前')),
+                ('career', models.CharField(blank=True, max_length=100, verbose_name='経歴')),
+                ('is_active', models.BooleanField(default=True, verbose_name='受付中')),
+            ],
+            options={
+                'verbose_name': 'コンサルタント',
+                'verbose_name_plural': 'コンサルタント',
+            },
+        ),
+        migrations.CreateModel(
+            name='ConsultantWorkingHours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.IntegerField(choices=[(0, '月'), (1, '火'), (2, '水'), (3, '木'), (4, '金'), (5, '土'), (6, '日')], verbose_name='曜日')),
+                ('start_time', models.TimeField(verbose_name='開始時刻')),
+                ('end_time', models.TimeField(verbose_name='終了時刻')),
+                ('consultant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='working_hours', to='steppia_app.consultant', verbose_name='コンサルタント')),
+            ],
+            options={
+                'verbose_name': 'コンサルタント勤務時間',
+                'verbose_name_plural': 'コンサルタント勤務時間',
+                'ordering': ['consultant', 'weekday', 'start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ConsultSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日付')),
+                ('start_time', models.TimeField(verbose_name='開始時刻')),
+                ('end_time', models.TimeField(verbose_name='終了時刻')),
+                ('consultant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='steppia_app.consultant', verbose_name='コンサルタント')),
+                ('schedule', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='consult_slot', to='steppia_app.schedule', verbose_name='予約')),
+            ],
+            options={
+                'verbose_name': 'コンサル予約枠',
+                'verbose_name_plural': 'コンサル予約枠',
+                'indexes': [models.Index(condition=models.Q(('schedule__isnull', True)), fields=['consultant', 'date', 'start_time'], name='consultslot_free_idx')],
+                'constraints': [models.UniqueConstraint(fields=('consultant', 'date', 'start_time'), name='consultslot_consultant_start_uniq')],
+            },
+        ),
+        migrations.RunPython(seed_consultants, migrations.RunPython.noop),
+    ]
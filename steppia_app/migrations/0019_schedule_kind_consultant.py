@@ -0,0 +1,22 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('steppia_app', '0018_consultant_slots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='consultant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='schedules', to='steppia_app.consultant', verbose_name='コンサルタント'),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='kind',
+            field=models.CharField(choices=[('personal', '予定'), ('consult', 'コンサル予約')], default='personal', max_length=20, verbose_name='種類'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+"""既存の Schedule を detail から種類・コンサルタントに振り分ける
+
+大きなテーブルでも長時間ロックしないよう、ID の範囲で BATCH_SIZE 件ずつ
+別々のトランザクションで更新します（atomic = False）。
+"""
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+CONSULT_MARK = 'コンサル予約'
+
+
+def parse_consultant(detail):
+    """「小林 香織 コンサル予約」→「小林 香織」"""
+    return detail.split(CONSULT_MARK, 1)[0].strip()
+
+
+def backfill(apps, schema_editor):
+    Schedule = apps.get_model('steppia_app', 'Schedule')
+    Consultant = apps.get_model('steppia_app', 'Consultant')
+    consultant_ids = dict(Consultant.objects.values_list('name', 'pk'))
+
+    last_pk = 0
+    while True:
+        rows = list(
+            Schedule.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'detail')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+
+        by_consultant = {}
+        for pk, detail in rows:
+            if CONSULT_MARK in (detail or ''):
+                consultant_id = consultant_ids.get(parse_consultant(detail))
+                by_consultant.setdefault(consultant_id, []).append(pk)
+        with transaction.atomic():
+            for consultant_id, pks in by_consultant.items():
+                Schedule.objects.filter(pk__in=pks).update(kind='consult', consultant_id=consultant_id)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('steppia_app', '0019_schedule_kind_consultant'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('steppia_app', '0020_backfill_schedule_kind'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['user', 'kind', '-date', '-time'], name='schedule_user_kind_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['user', '-date', '-time'], name='schedule_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('steppia_app', '0022_job_external_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='salary_max',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='給与の上限（円）'),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='salary_min',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='給与の下限（円）'),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='salary_unit',
+            field=models.CharField(blank=True, choices=[('hourly', '時給'), ('daily', '日給'), ('monthly', '月給'), ('yearly', '年収')], editable=False, max_length=10, verbose_name='給与の単位'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['salary_unit', '-salary_min'], name='job_salary_unit_min_idx'),
+        ),
+    ]
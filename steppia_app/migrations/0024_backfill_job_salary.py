@@ -0,0 +1,88 @@
+"""既存の求人の給与テキストを数値化する（1,000件ずつ別トランザクション）"""
+import re
+import unicodedata
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+
+# 給与の読み方はこのマイグレーションを書いた時点の steppia_app/salary.py の写し。
+# あとで salary.py を変えても、このマイグレーションの結果は変わらないようにしておく
+UNIT_KEYWORDS = [
+    ('hourly', ('時給',)),
+    ('daily', ('日給', '日当')),
+    ('monthly', ('月給', '月収', '月額')),
+    ('yearly', ('年収', '年俸')),
+]
+
+_AMOUNT = r'(\d+(?:\.\d+)?)\s*(万)?\s*円?'
+_RANGE_RE = re.compile(_AMOUNT + r'(?:\s*([~〜\-－ー]|から)\s*(?:' + _AMOUNT + r')?)?')
+
+
+def _yen(number, man):
+    value = float(number)
+    return int(round(value * 10000)) if man else int(round(value))
+
+
+def _guess_unit(amount):
+    if amount < 5000:
+        return 'hourly'
+    if amount < 50000:
+        return 'daily'
+    if amount < 1000000:
+        return 'monthly'
+    return 'yearly'
+
+
+def parse_salary(text):
+    text = unicodedata.normalize('NFKC', text or '').replace(',', '')
+    unit = ''
+    position = 0
+    for candidate, keywords in UNIT_KEYWORDS:
+        found = [text.find(k) for k in keywords if k in text]
+        if found:
+            unit, position = candidate, min(found)
+            break
+
+    match = _RANGE_RE.search(text, position)
+    if match is None:
+        return None, None, ''
+    low_number, low_man, separator, high_number, high_man = match.groups()
+    if high_number and high_man and not low_man and float(low_number) < float(high_number):
+        low_man = high_man
+    low = _yen(low_number, low_man)
+    if high_number:
+        high = _yen(high_number, high_man)
+    elif separator or text[match.end():].lstrip().startswith('以上'):
+        high = None
+    else:
+        high = low
+    if high is not None and high < low:
+        low, high = high, low
+    return low, high, unit or _guess_unit(low)
+
+
+def backfill(apps, schema_editor):
+    Job = apps.get_model('steppia_app', 'Job')
+    last_pk = 0
+    while True:
+        jobs = list(Job.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'salary')[:BATCH_SIZE])
+        if not jobs:
+            break
+        last_pk = jobs[-1].pk
+        for job in jobs:
+            job.salary_min, job.salary_max, job.salary_unit = parse_salary(job.salary)
+        with transaction.atomic():
+            Job.objects.bulk_update(jobs, ['salary_min', 'salary_max', 'salary_unit'])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('steppia_app', '0023_job_salary_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
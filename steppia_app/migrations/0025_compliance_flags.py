@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('steppia_app', '0024_backfill_job_salary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplianceScanRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(verbose_name='開始日時')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='終了日時')),
+                ('is_full', models.BooleanField(default=False, verbose_name='全件チェック')),
+                ('users', models.IntegerField(default=0, verbose_name='対象ユーザー数')),
+                ('log_rows', models.IntegerField(default=0, verbose_name='読んだログ件数')),
+                ('flags', models.IntegerField(default=0, verbose_name='要確認の件数')),
+            ],
+            options={
+                'verbose_name': '受給チェックの実行履歴',
+                'verbose_name_plural': '受給チェックの実行履歴',
+            },
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='worklog_changed_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='お仕事ログの最終更新'),
+        ),
+        migrations.CreateModel(
+            name='ComplianceFlag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('day_limit', '1日の申告ライン超え'), ('day_reduction', '基本手当の減額の目安超え'), ('week_hours', '週の就労時間が就職扱いの目安'), ('week_days', '週の就労日数が多い')], max_length=20, verbose_name='種類')),
+                ('start_date', models.DateField(verbose_name='開始日')),
+                ('end_date', models.DateField(verbose_name='終了日')),
+                ('hours', models.FloatField(verbose_name='就労時間の合計')),
+                ('earnings', models.IntegerField(verbose_name='総支給額の合計')),
+                ('work_days', models.IntegerField(verbose_name='就労日数')),
+                ('scanned_at', models.DateTimeField(verbose_name='チェック日時')),
+                ('is_reviewed', models.BooleanField(default=False, verbose_name='確認済み')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compliance_flags', to=settings.AUTH_USER_MODEL, verbose_name='ユーザー')),
+            ],
+            options={
+                'verbose_name': '受給チェックの要確認',
+                'verbose_name_plural': '受給チェックの要確認',
+                'indexes': [models.Index(fields=['kind', '-start_date'], name='complianceflag_kind_start_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'kind', 'start_date'), name='complianceflag_user_kind_start_uniq')],
+            },
+        ),
+    ]
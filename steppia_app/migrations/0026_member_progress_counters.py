@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:37
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Least
+
+BATCH_SIZE = 1000
+MAP_STEPS = 30
+
+
+def backfill(apps, schema_editor):
+    Member = apps.get_model('steppia_app', 'Member')
+    WorkLog = apps.get_model('steppia_app', 'WorkLog')
+    Application = apps.get_model('steppia_app', 'Application')
+
+    def count(model):
+        return Coalesce(
+            Subquery(
+                model.objects.filter(user_id=OuterRef('user_id')).order_by()
+                .values('user_id').annotate(n=Count('pk')).values('n')
+            ),
+            0,
+        )
+
+    last_pk = 0
+    while True:
+        pks = list(Member.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE])
+        if not pks:
+            break
+        last_pk = pks[-1]
+        Member.objects.filter(pk__in=pks).update(work_log_count=count(WorkLog), application_count=count(Application))
+        Member.objects.filter(pk__in=pks).update(map_step=Least(models.F('work_log_count') + 1, Value(MAP_STEPS)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('steppia_app', '0025_compliance_flags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='application_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='応募件数'),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='map_step',
+            field=models.IntegerField(default=1, editable=False, verbose_name='冒険マップの現在地'),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='work_log_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='お仕事ログの件数'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('steppia_app', '0026_member_progress_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='first_kana_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='めい（検索用）'),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='last_kana_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='せい（検索用）'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['last_kana_key', 'first_kana_key', 'id'], name='member_kana_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['assigned_consultant', 'last_kana_key', 'first_kana_key', 'id'], name='member_consultant_kana_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['last_kana_key'], name='member_last_kana_like_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['first_kana_key'], name='member_first_kana_like_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
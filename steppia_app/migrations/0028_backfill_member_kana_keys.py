@@ -0,0 +1,43 @@
+"""既存会員のふりがなから検索用のキーを作る（1,000件ずつ別トランザクション）"""
+import unicodedata
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+
+
+# このマイグレーションを書いた時点の models.kana_key（search.normalize）の写し
+def kana_key(text):
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    text = ''.join(chr(ord(ch) - 0x60) if 'ァ' <= ch <= 'ヶ' else ch for ch in text)
+    return ''.join(text.split())
+
+
+def backfill(apps, schema_editor):
+    Member = apps.get_model('steppia_app', 'Member')
+    last_pk = 0
+    while True:
+        members = list(
+            Member.objects.filter(pk__gt=last_pk).order_by('pk')
+            .only('pk', 'last_name_kana', 'first_name_kana')[:BATCH_SIZE]
+        )
+        if not members:
+            break
+        last_pk = members[-1].pk
+        for member in members:
+            member.last_kana_key = kana_key(member.last_name_kana)
+            member.first_kana_key = kana_key(member.first_name_kana)
+        with transaction.atomic():
+            Member.objects.bulk_update(members, ['last_kana_key', 'first_kana_key'])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('steppia_app', '0027_member_kana_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
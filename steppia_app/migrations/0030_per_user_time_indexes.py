@@ -0,0 +1,54 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """PostgreSQL では CREATE INDEX CONCURRENTLY（表への書き込みを止めない）、それ以外は普通の AddIndex
+
+    django.contrib.postgres は psycopg がないと読み込めないので、PostgreSQL のときだけ使う。
+    """
+
+    def _concurrently(self):
+        from django.contrib.postgres import operations
+        return operations.AddIndexConcurrently(self.model_name, self.index)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return self._concurrently().database_forwards(app_label, schema_editor, from_state, to_state)
+        return super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return self._concurrently().database_backwards(app_label, schema_editor, from_state, to_state)
+        return super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    # CONCURRENTLY はトランザクションの中では使えない
+    atomic = False
+
+    dependencies = [
+        ('steppia_app', '0029_job_schedule_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='aiconsultlog',
+            index=models.Index(fields=['user', '-created_at'], name='aiconsultlog_user_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='application',
+            index=models.Index(fields=['user', '-applied_at'], name='application_user_applied_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='coupon',
+            index=models.Index(condition=models.Q(('is_used', False)), fields=['user', '-won_at'], name='coupon_unused_user_won_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='worklog',
+            index=models.Index(fields=['user', '-date'], name='worklog_user_date_idx'),
+        ),
+    ]
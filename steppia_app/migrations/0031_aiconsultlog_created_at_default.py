@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('steppia_app', '0030_per_user_time_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='aiconsultlog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='相談日時'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('steppia_app', '0031_aiconsultlog_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='worklogdailytotal',
+            name='hours',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=8, verbose_name='就労時間の合計'),
+        ),
+    ]
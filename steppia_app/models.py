@@ -1,9 +1,16 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 
+from . import salary as salary_parser
+from .search import normalize
+
+def kana_key(text):
+    """ふりがなを検索・並び替え用にそろえる（カタカナ・半角・空白の揺れをなくす）"""
+    return ''.join(normalize(text).split())
+
 # 1. 会員情報（ユーザープロフィール）
 class Member(models.Model):
     user = models.OneToOneField(
@@ -25,14 +32,86 @@ class Member(models.Model):
 
     # 🆕 担当コンサルタント名（マイページ表示用に追加）
     assigned_consultant = models.CharField('担当コンサルタント', max_length=100, blank=True, null=True)
+    # 冒険マップ用の件数（progress_counters.py が F() で足し引きする）
+    work_log_count = models.IntegerField('お仕事ログの件数', default=0, editable=False)
+    application_count = models.IntegerField('応募件数', default=0, editable=False)
+    map_step = models.IntegerField('冒険マップの現在地', default=1, editable=False)
+
+    # お仕事ログを最後に追加・修正・削除した日時（受給チェックの差分実行用。シグナルで更新）
+    worklog_changed_at = models.DateTimeField('お仕事ログの最終更新', null=True, blank=True, editable=False, db_index=True)
+
+    # 会員名簿の検索・並び順用：ふりがなを search.normalize でひらがなにそろえたもの（保存時に埋める）
+    last_kana_key = models.CharField('せい（検索用）', max_length=100, blank=True, default='', editable=False)
+    first_kana_key = models.CharField('めい（検索用）', max_length=100, blank=True, default='', editable=False)
 
     class Meta:
         verbose_name = "会員情報"
         verbose_name_plural = "会員情報"
+        indexes = [
+            # 五十音順の並び・キーセットのページ送り・「せい」の前方一致
+            models.Index(fields=['last_kana_key', 'first_kana_key', 'id'], name='member_kana_idx'),
+            models.Index(fields=['assigned_consultant', 'last_kana_key', 'first_kana_key', 'id'], name='member_consultant_kana_idx'),
+            # PostgreSQL の LIKE 'xx%' はロケールによって通常のインデックスを使えないので、パターン用も作る
+            models.Index(fields=['last_kana_key'], name='member_last_kana_like_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['first_kana_key'], name='member_first_kana_like_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
         return f"{self.last_name} {self.first_name}"
 
+    # --- 変更のあった列だけを保存する ---
+    # DBから読んだときの値を覚えておき、save() では変わった列だけを UPDATE する。
+    # 何も変わっていなければ DB には行かない。F() で足し引きしている件数の列を、
+    # 古い値で上書きしてしまうこともなくなる。
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def _remember(self, names):
+        loaded = getattr(self, '_loaded_values', {})
+        loaded.update({name: getattr(self, name) for name in names})
+        self._loaded_values = loaded
+
+    def get_dirty_fields(self):
+        """読み込み後に変わった列名のリスト（DBから読んでいないインスタンスは None）"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [name for name, value in loaded.items() if getattr(self, name) != value]
+
+    def save(self, *args, **kwargs):
+        self.last_kana_key = kana_key(self.last_name_kana)
+        self.first_kana_key = kana_key(self.first_name_kana)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'last_name_kana' in update_fields:
+                update_fields.add('last_kana_key')
+            if 'first_name_kana' in update_fields:
+                update_fields.add('first_kana_key')
+            kwargs['update_fields'] = update_fields
+        if self.pk is not None and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            dirty = self.get_dirty_fields()
+            if dirty is not None:
+                if not dirty:
+                    return
+                kwargs['update_fields'] = dirty
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            deferred = self.get_deferred_fields()
+            update_fields = [f.attname for f in self._meta.concrete_fields if f.attname not in deferred]
+        else:
+            update_fields = [self._meta.get_field(name).attname for name in update_fields]
+        self._remember(update_fields)
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        deferred = self.get_deferred_fields()
+        self._remember(f.attname for f in self._meta.concrete_fields if f.attname not in deferred)
+
     def can_spin_roulette(self):
         """今日ルーレットを回せるか判定する（日本時間基準）"""
         if not self.last_roulette_date:
@@ -47,14 +126,51 @@ class Job(models.Model):
     location = models.CharField('勤務地', max_length=100)
     salary = models.CharField('給与', max_length=100)
     description = models.TextField('仕事の内容')
+    # 一括取込（import_jobs）で同じ求人を見分けるための、取込元のID
+    external_id = models.CharField('外部ID', max_length=100, unique=True, null=True, blank=True)
+    # 給与テキストを数値にしたもの（保存時に salary.py が埋める）
+    salary_min = models.PositiveIntegerField('給与の下限（円）', null=True, blank=True, editable=False)
+    salary_max = models.PositiveIntegerField('給与の上限（円）', null=True, blank=True, editable=False)
+    salary_unit = models.CharField('給与の単位', max_length=10, choices=salary_parser.UNIT_CHOICES, blank=True, editable=False)
+    # 一覧・詳細の ETag / Last-Modified に使う（conditional.py）
+    updated_at = models.DateTimeField('更新日時', auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = "求人情報"
         verbose_name_plural = "求人情報"
+        indexes = [
+            models.Index(fields=['salary_unit', '-salary_min'], name='job_salary_unit_min_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        salary_parser.apply(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'updated_at'}
+            if 'salary' in update_fields:
+                update_fields |= {'salary_min', 'salary_max', 'salary_unit'}
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+# 求人検索用のバイグラム索引（保存時に search.py が更新、削除時は CASCADE で消える）
+class JobSearchToken(models.Model):
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="search_tokens")
+    token = models.CharField('トークン', max_length=2)
+    weight = models.PositiveSmallIntegerField('重み', default=1)
+
+    class Meta:
+        verbose_name = "求人検索インデックス"
+        verbose_name_plural = "求人検索インデックス"
+        constraints = [
+            models.UniqueConstraint(fields=['token', 'job'], name='jobsearchtoken_token_job_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} → {self.job_id}"
+
 # 3. 応募履歴・進捗管理
 class Application(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="ユーザー", related_name="applications")
@@ -67,25 +183,109 @@ class Application(models.Model):
         verbose_name = "応募履歴・進捗"
         verbose_name_plural = "応募履歴・進捗"
         unique_together = ('user', 'job')
+        indexes = [
+            # マイページの応募一覧（新しい順）
+            models.Index(fields=['user', '-applied_at'], name='application_user_applied_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.job.company} (Step: {self.current_step})"
 
 # 4. スケジュール
 class Schedule(models.Model):
+    KIND_PERSONAL = 'personal'
+    KIND_CONSULT = 'consult'
+    KIND_CHOICES = [
+        (KIND_PERSONAL, '予定'),
+        (KIND_CONSULT, 'コンサル予約'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="ユーザー", null=True, blank=True)
     date = models.DateField('日付')
     time = models.TimeField('時間')
     detail = models.CharField('内容', max_length=200)
+    kind = models.CharField('種類', max_length=20, choices=KIND_CHOICES, default=KIND_PERSONAL)
+    consultant = models.ForeignKey(
+        'Consultant', on_delete=models.SET_NULL, verbose_name="コンサルタント",
+        related_name="schedules", null=True, blank=True
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    # スケジュール画面の ETag / Last-Modified に使う（conditional.py）
+    updated_at = models.DateTimeField('更新日時', auto_now=True)
 
     class Meta:
         verbose_name = "スケジュール"
         verbose_name_plural = "スケジュール"
+        indexes = [
+            # マイページ（種類で絞って新しい順）とスケジュール画面（全件を新しい順）用
+            models.Index(fields=['user', 'kind', '-date', '-time'], name='schedule_user_kind_date_idx'),
+            models.Index(fields=['user', '-date', '-time'], name='schedule_user_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.date} {self.time} - {self.detail}"
 
+# 4-2. コンサルタントと予約枠
+class Consultant(models.Model):
+    name = models.CharField('名前', max_length=100, unique=True)
+    career = models.CharField('経歴', max_length=100, blank=True)
+    is_active = models.BooleanField('受付中', default=True)
+
+    class Meta:
+        verbose_name = "コンサルタント"
+        verbose_name_plural = "コンサルタント"
+
+    def __str__(self):
+        return self.name
+
+class ConsultantWorkingHours(models.Model):
+    WEEKDAYS = [(0, '月'), (1, '火'), (2, '水'), (3, '木'), (4, '金'), (5, '土'), (6, '日')]
+
+    consultant = models.ForeignKey(Consultant, on_delete=models.CASCADE, verbose_name="コンサルタント", related_name="working_hours")
+    weekday = models.IntegerField('曜日', choices=WEEKDAYS)
+    start_time = models.TimeField('開始時刻')
+    end_time = models.TimeField('終了時刻')
+
+    class Meta:
+        verbose_name = "コンサルタント勤務時間"
+        verbose_name_plural = "コンサルタント勤務時間"
+        ordering = ['consultant', 'weekday', 'start_time']
+
+    def __str__(self):
+        return f"{self.consultant} {self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+class ConsultSlot(models.Model):
+    """勤務時間から作る予約枠。schedule が入っていれば予約済み"""
+    consultant = models.ForeignKey(Consultant, on_delete=models.CASCADE, verbose_name="コンサルタント", related_name="slots")
+    date = models.DateField('日付')
+    start_time = models.TimeField('開始時刻')
+    end_time = models.TimeField('終了時刻')
+    schedule = models.OneToOneField(
+        Schedule, on_delete=models.SET_NULL, verbose_name="予約",
+        related_name="consult_slot", null=True, blank=True
+    )
+
+    class Meta:
+        verbose_name = "コンサル予約枠"
+        verbose_name_plural = "コンサル予約枠"
+        constraints = [
+            models.UniqueConstraint(fields=['consultant', 'date', 'start_time'], name='consultslot_consultant_start_uniq'),
+        ]
+        indexes = [
+            # 空き枠だけの部分インデックス（「今週の空き」を範囲スキャンで返す）
+            models.Index(
+                fields=['consultant', 'date', 'start_time'], name='consultslot_free_idx',
+                condition=models.Q(schedule__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.consultant} {self.date} {self.start_time:%H:%M}"
+
+    @property
+    def is_booked(self):
+        return self.schedule_id is not None
+
 # 5. AI相談
 class AIConsultTemplate(models.Model):
     question = models.CharField('よくある質問', max_length=200)
@@ -102,11 +302,16 @@ class AIConsultLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="ユーザー", null=True, blank=True)
     user_question = models.TextField('相談内容')
     ai_response = models.TextField('AIの回答')
-    created_at = models.DateTimeField('相談日時', auto_now_add=True)
+    # まとめ書き（consult_log.py）でも相談した時刻が残るよう、auto_now_add ではなく既定値にする
+    created_at = models.DateTimeField('相談日時', default=timezone.now, editable=False)
 
     class Meta:
         verbose_name = "AI相談ログ"
         verbose_name_plural = "AI相談ログ"
+        indexes = [
+            # マイページの相談履歴とおすすめ求人（新しい順）
+            models.Index(fields=['user', '-created_at'], name='aiconsultlog_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.created_at.strftime('%Y/%m/%d %H:%M')}の相談"
@@ -123,11 +328,94 @@ class WorkLog(models.Model):
     class Meta:
         verbose_name = "お仕事ログ"
         verbose_name_plural = "お仕事ログ"
+        indexes = [
+            # お仕事ログ画面（就労日の新しい順）
+            models.Index(fields=['user', '-date'], name='worklog_user_date_idx'),
+        ]
 
     def __str__(self):
         company = self.company_name if self.company_name else "不明"
         return f"{self.date} - {company}"
 
+# お仕事ログの日別集計（worklog_rollups.py が更新）
+class WorkLogDailyTotal(models.Model):
+    # ハローワーク申告の目安（1日あたり）
+    LIMIT_EARNINGS = 4000
+    LIMIT_HOURS = 2
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="ユーザー", related_name="work_daily_totals")
+    date = models.DateField('就労日')
+    # 足し引きで誤差がたまらないよう Decimal（worklog_rollups.as_hours で小数第2位にそろえる）
+    hours = models.DecimalField('就労時間の合計', max_digits=8, decimal_places=2, default=0)
+    earnings = models.IntegerField('総支給額の合計', default=0)
+    log_count = models.IntegerField('記録件数', default=0)
+
+    class Meta:
+        verbose_name = "お仕事ログ（日別集計）"
+        verbose_name_plural = "お仕事ログ（日別集計）"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='worklogdailytotal_user_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - ¥{self.earnings} ({self.hours}h)"
+
+    @property
+    def is_over_limit(self):
+        return self.earnings >= self.LIMIT_EARNINGS or self.hours > self.LIMIT_HOURS
+
+# 失業手当の受給に影響しそうな日・週（compliance.py の夜間チェックが書き込む）
+class ComplianceFlag(models.Model):
+    KIND_DAY_LIMIT = 'day_limit'
+    KIND_DAY_REDUCTION = 'day_reduction'
+    KIND_WEEK_HOURS = 'week_hours'
+    KIND_WEEK_DAYS = 'week_days'
+    KIND_CHOICES = [
+        (KIND_DAY_LIMIT, '1日の申告ライン超え'),
+        (KIND_DAY_REDUCTION, '基本手当の減額の目安超え'),
+        (KIND_WEEK_HOURS, '週の就労時間が就職扱いの目安'),
+        (KIND_WEEK_DAYS, '週の就労日数が多い'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="ユーザー", related_name="compliance_flags")
+    kind = models.CharField('種類', max_length=20, choices=KIND_CHOICES)
+    start_date = models.DateField('開始日')
+    end_date = models.DateField('終了日')
+    hours = models.FloatField('就労時間の合計')
+    earnings = models.IntegerField('総支給額の合計')
+    work_days = models.IntegerField('就労日数')
+    scanned_at = models.DateTimeField('チェック日時')
+    is_reviewed = models.BooleanField('確認済み', default=False)
+
+    class Meta:
+        verbose_name = "受給チェックの要確認"
+        verbose_name_plural = "受給チェックの要確認"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'kind', 'start_date'], name='complianceflag_user_kind_start_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', '-start_date'], name='complianceflag_kind_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.get_kind_display()} ({self.start_date})"
+
+# 受給チェックの実行履歴（差分実行は、前回の開始時刻以降にログが変わったユーザーだけを見る）
+class ComplianceScanRun(models.Model):
+    started_at = models.DateTimeField('開始日時')
+    finished_at = models.DateTimeField('終了日時', null=True, blank=True)
+    is_full = models.BooleanField('全件チェック', default=False)
+    users = models.IntegerField('対象ユーザー数', default=0)
+    log_rows = models.IntegerField('読んだログ件数', default=0)
+    flags = models.IntegerField('要確認の件数', default=0)
+
+    class Meta:
+        verbose_name = "受給チェックの実行履歴"
+        verbose_name_plural = "受給チェックの実行履歴"
+
+    def __str__(self):
+        return f"{self.started_at:%Y/%m/%d %H:%M} ({'全件' if self.is_full else '差分'})"
+
 # 7. クーポン（景品）
 class Coupon(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="ユーザー")
@@ -138,17 +426,100 @@ class Coupon(models.Model):
     class Meta:
         verbose_name = "獲得クーポン"
         verbose_name_plural = "獲得クーポン"
+        indexes = [
+            # マイページの未使用クーポン（新しい順）。使用済みは読まないので部分インデックスにする
+            models.Index(fields=['user', '-won_at'], name='coupon_unused_user_won_idx', condition=models.Q(is_used=False)),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.prize_name}"
 
+# ルーレット景品の日別払い出し数（上限のある景品だけ）
+class RouletteDailyStock(models.Model):
+    date = models.DateField('日付')
+    prize_name = models.CharField('景品名', max_length=100)
+    awarded = models.IntegerField('払い出し数', default=0)
+
+    class Meta:
+        verbose_name = "ルーレット景品の払い出し数"
+        verbose_name_plural = "ルーレット景品の払い出し数"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'prize_name'], name='roulettedailystock_date_prize_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.prize_name} ({self.awarded})"
+
 # --- シグナル設定 ---
 @receiver(post_save, sender=User)
-def create_user_member(sender, instance, created, **kwargs):
+def sync_user_member(sender, instance, created, raw=False, **kwargs):
+    """User の作成時に Member を作り、読み込み済みの Member に変更があれば保存する
+
+    ログイン時の last_login の更新などでは Member に触らない（SELECT も UPDATE もしない）。
+    """
+    if raw:
+        return
     if created:
         Member.objects.create(user=instance, email=instance.email)
+    elif User.profile.is_cached(instance):
+        # まだ読んでいない Member をわざわざ読みに行かない。保存は変わった列だけ
+        instance.profile.save()
 
-@receiver(post_save, sender=User)
-def save_user_member(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
\ No newline at end of file
+@receiver(post_save, sender=Job)
+def index_job(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .search import index_jobs
+    index_jobs([instance])
+    from .recommend import engine
+    engine.upsert_jobs([instance])
+
+@receiver(post_delete, sender=Job)
+def drop_job_vector(sender, instance, **kwargs):
+    from .recommend import engine
+    engine.remove_job(instance.pk)
+
+# 回答テンプレートの変更は、コミットしてから手元のプロセスに反映する（ロールバックされたテンプレートで答えないように）
+@receiver(post_save, sender=AIConsultTemplate)
+def refresh_consult_template(sender, instance, using=None, **kwargs):
+    from .consult import matcher
+    transaction.on_commit(lambda: matcher.upsert_template(instance), using=using)
+
+@receiver(post_delete, sender=AIConsultTemplate)
+def drop_consult_template(sender, instance, using=None, **kwargs):
+    from .consult import matcher
+    pk = instance.pk
+    transaction.on_commit(lambda: matcher.remove_template(pk), using=using)
+
+# お仕事ログが変わったユーザーに印を付ける（受給チェックの差分実行で使う）
+# 印の時刻はコミット後に付ける。書き込み中に付けると、コミット前に始まった受給チェックが
+# そのログを読めず、次の差分実行も「前回の開始より前の変更」として読み飛ばしてしまう
+@receiver(post_save, sender=WorkLog)
+@receiver(post_delete, sender=WorkLog)
+def mark_worklog_changed(sender, instance, using=None, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(
+        lambda: Member.objects.filter(user_id=user_id).update(worklog_changed_at=timezone.now()),
+        using=using,
+    )
+
+# マイページのキャッシュを、データが変わったユーザーの分だけ消す
+# コミット前に消すと、その間に別のリクエストが古い行でキャッシュを作り直してしまうので、コミット後に消す
+def invalidate_dashboard(sender, instance, using=None, **kwargs):
+    from .dashboard import invalidate
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate(user_id), using=using)
+
+for _model in (AIConsultLog, Schedule, Application, Coupon, Member):
+    post_save.connect(invalidate_dashboard, sender=_model, dispatch_uid=f'dashboard_save_{_model.__name__}')
+    post_delete.connect(invalidate_dashboard, sender=_model, dispatch_uid=f'dashboard_delete_{_model.__name__}')
+
+# おすすめ求人のキャッシュは、応募・相談が変わったユーザーの分だけ（マイページと同じくコミット後に）消す
+def invalidate_recommendations(sender, instance, using=None, **kwargs):
+    from .recommend import invalidate
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate(user_id), using=using)
+
+for _model in (AIConsultLog, Application):
+    post_save.connect(invalidate_recommendations, sender=_model, dispatch_uid=f'recommend_save_{_model.__name__}')
+    post_delete.connect(invalidate_recommendations, sender=_model, dispatch_uid=f'recommend_delete_{_model.__name__}')
@@ -0,0 +1,162 @@
+"""本番リクエストのサンプリングプロファイラー（settings.PROFILING で有効にする）
+
+特定の会員でだけ work_tracker や mypage が遅い、といった手元で再現しにくい問題を調べるためのものです。
+ProfilingMiddleware が次のリクエストを cProfile で計測し、pstats 形式のファイルに残します。
+・SAMPLE_EVERY 回に1回（0 なら抽選しない）
+・スタッフが発行した署名付きトークンをヘッダー（X-Steppia-Profile）に付けたリクエスト
+　（トークンはスタッフ用のプロファイル一覧画面に出ます。有効期限は TOKEN_MAX_AGE 秒）
+
+ファイルは DIR に「.prof（pstats）＋ .json（ビュー名・応答時間など）」の組で保存し、
+MAX_PROFILES 組を超えたら古いものから消します（ワーカーごとではなくディレクトリ全体で数える）。
+ENABLED が False のときはミドルウェア自体が外れるので、負荷はかかりません。
+抽選に外れたリクエストは、カウンターを1つ進めてヘッダーを見るだけです。
+"""
+import cProfile
+import io
+import itertools
+import json
+import os
+import pstats
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+DEFAULTS = {
+    'ENABLED': False,
+    'SAMPLE_EVERY': 0,
+    'DIR': Path(settings.BASE_DIR) / 'var' / 'profiles',
+    'MAX_PROFILES': 50,
+    'TOKEN_MAX_AGE': 3600,
+}
+HEADER = 'HTTP_X_STEPPIA_PROFILE'
+SIGNING_SALT = 'steppia_app.profiling'
+
+_NAME = re.compile(r'^[\w.-]+$')
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+
+
+def make_token(user):
+    """スタッフが X-Steppia-Profile ヘッダーに付けるトークン"""
+    return signing.dumps({'user': user.pk}, salt=SIGNING_SALT, compress=True)
+
+
+def check_token(token, max_age=None):
+    """正しく署名された、期限内の、スタッフのトークンなら True"""
+    try:
+        data = signing.loads(token, salt=SIGNING_SALT, max_age=max_age or config()['TOKEN_MAX_AGE'])
+    except signing.BadSignature:
+        return False
+    return User.objects.filter(pk=data.get('user'), is_staff=True, is_active=True).exists()
+
+
+def _directory():
+    return Path(config()['DIR'])
+
+
+def save(profile, meta):
+    """プロファイルとその説明を保存し、古いものを消して、名前を返す"""
+    directory = _directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    view = re.sub(r'[^\w.-]', '_', meta['view'] or 'unknown')[:60]
+    name = f"{timezone.now():%Y%m%d-%H%M%S-%f}-{os.getpid()}-{view}"
+    profile.dump_stats(directory / f'{name}.prof')
+    (directory / f'{name}.json').write_text(json.dumps({'name': name, **meta}, ensure_ascii=False), encoding='utf-8')
+    prune()
+    return name
+
+
+def prune():
+    """MAX_PROFILES 組だけ残して、古い順に消す"""
+    metas = sorted(_directory().glob('*.json'))
+    for path in metas[:max(0, len(metas) - config()['MAX_PROFILES'])]:
+        path.with_suffix('.prof').unlink(missing_ok=True)
+        path.unlink(missing_ok=True)
+
+
+def list_profiles(view=None, sort='time'):
+    """保存済みのプロファイルの説明（新しい順、sort='ms' なら遅い順）"""
+    profiles = []
+    for path in _directory().glob('*.json'):
+        try:
+            meta = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            # 他のワーカーが消した・書きかけ
+            continue
+        if view is None or meta['view'] == view:
+            profiles.append(meta)
+    key = (lambda meta: meta['ms']) if sort == 'ms' else (lambda meta: meta['name'])
+    return sorted(profiles, key=key, reverse=True)
+
+
+def profile_path(name):
+    """名前から .prof のパス（ディレクトリの外を指す名前や、ないものは None）"""
+    if not _NAME.match(name):
+        return None
+    path = _directory() / f'{name}.prof'
+    return path if path.exists() else None
+
+
+def summary(name, limit=40):
+    """累積時間の多い順の関数一覧（pstats の表）"""
+    path = profile_path(name)
+    if path is None:
+        return None
+    stream = io.StringIO()
+    pstats.Stats(str(path), stream=stream).strip_dirs().sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        options = config()
+        if not options['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_every = options['SAMPLE_EVERY']
+        self._counter = itertools.count(1)
+
+    def _trigger(self, request):
+        token = request.META.get(HEADER)
+        if token is not None and check_token(token):
+            return 'header'
+        if self.sample_every and next(self._counter) % self.sample_every == 0:
+            return 'sample'
+        return None
+
+    def __call__(self, request):
+        trigger = self._trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        stats = getattr(request, 'sql_stats', None)
+        save(profile, {
+            'view': match.view_name if match else None,
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'ms': round(elapsed * 1000, 1),
+            'queries': stats.queries if stats is not None else None,
+            'user': request.user.pk if getattr(request, 'user', None) and request.user.is_authenticated else None,
+            'trigger': trigger,
+            'created_at': timezone.now().isoformat(),
+        })
+        return response
@@ -0,0 +1,70 @@
+"""冒険マップ用の件数（Member.work_log_count / application_count / map_step）
+
+お仕事ログ・応募を作成・削除するときに、同じトランザクションの中で
+Member の行へ F() で差分だけを足し引きします。これで /progress/ は
+Member を1行読むだけで表示できます。
+管理画面やカスケード削除など、この関数を通らない変更で生じたずれは
+reconcile_progress コマンドで検出・修正します。
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Least
+
+from .models import Application, Member, WorkLog
+
+# 冒険マップのマス数（progress.html と同じ）
+MAP_STEPS = 30
+
+
+def map_step_for(work_log_count):
+    return max(1, min(work_log_count + 1, MAP_STEPS))
+
+
+def add_work_log(user_id, delta=1):
+    Member.objects.filter(user_id=user_id).update(
+        work_log_count=F('work_log_count') + delta,
+        # UPDATE の右辺は更新前の値を読むので、ここでも delta を足す
+        map_step=Least(F('work_log_count') + delta + 1, Value(MAP_STEPS)),
+    )
+
+
+def add_application(user_id, delta=1):
+    Member.objects.filter(user_id=user_id).update(application_count=F('application_count') + delta)
+
+
+def _count(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(user_id=OuterRef('user_id')).order_by()
+            .values('user_id').annotate(n=Count('pk')).values('n')
+        ),
+        0,
+    )
+
+
+def find_drift(user_ids=None):
+    """[(user_id, 保存されている値, 実データから数えた値)] を返す。値は (ログ件数, 応募件数, 現在地)"""
+    members = Member.objects.filter(user__isnull=False)
+    if user_ids is not None:
+        members = members.filter(user_id__in=user_ids)
+    rows = members.annotate(
+        actual_work_logs=_count(WorkLog), actual_applications=_count(Application),
+    ).values_list('user_id', 'work_log_count', 'application_count', 'map_step', 'actual_work_logs', 'actual_applications')
+    drift = []
+    for user_id, work_logs, applications, step, actual_work_logs, actual_applications in rows.iterator(chunk_size=2000):
+        have = (work_logs, applications, step)
+        want = (actual_work_logs, actual_applications, map_step_for(actual_work_logs))
+        if have != want:
+            drift.append((user_id, have, want))
+    return drift
+
+
+@transaction.atomic
+def reconcile(user_ids=None):
+    """ずれている会員の件数を実データに合わせ、直した人数を返す"""
+    drift = find_drift(user_ids)
+    for user_id, _, (work_logs, applications, step) in drift:
+        Member.objects.filter(user_id=user_id).update(
+            work_log_count=work_logs, application_count=applications, map_step=step,
+        )
+    return len(drift)
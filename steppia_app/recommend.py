@@ -0,0 +1,335 @@
+"""おすすめ求人（TF-IDF のベクトル検索）
+
+求人のテキストを search.py と同じバイグラムに分け、TF-IDF で重み付けした
+「求人 × バイグラム」の行列を float32 で1つだけメモリに持ちます。
+ほとんどの成分は0なので、行列は列（バイグラム）ごとに 行番号・値 を並べた
+CSC 形式で持ち、会員のベクトルとの積は「会員が持つ列だけを集めて np.bincount」の
+1回のベクトル演算で全求人のスコアを出します。
+
+・会員のベクトル … 応募した求人のベクトルの和 ＋ AI相談の相談文（CONSULT_WEIGHT 倍）
+・行列はワーカーの起動時（gunicorn.conf.py の post_worker_init）に裏のスレッドで作り始める。
+  できあがるまで（10万件で十数秒）はおすすめなしで返し、リクエストを待たせない。
+・求人の追加・変更・削除 … シグナルで差分（_overlay）に入れ、基の行列の行は無効にする。
+  差分が OVERLAY_LIMIT 件を超えるか REBUILD_INTERVAL 秒たったら裏のスレッドで作り直す
+  （他のプロセスでの変更もこのタイミングで取り込まれます）。
+・結果は会員ごとに CACHE_TIMEOUT 秒キャッシュし、応募・相談が増えたら消して世代（generation）を進めます。
+"""
+import logging
+import math
+import threading
+import time
+from array import array
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .search import job_tokens, tokenize
+
+logger = logging.getLogger(__name__)
+
+RECOMMEND_COUNT = 5
+CACHE_TIMEOUT = 600
+REBUILD_INTERVAL = 3600
+OVERLAY_LIMIT = 1000
+
+# 相談文は応募した求人よりも弱めに効かせる
+CONSULT_WEIGHT = 0.5
+MAX_CONSULT_LOGS = 20
+
+# 会員ベクトルの成分は重い順にこの数だけ使う
+MAX_PROFILE_TERMS = 64
+
+# 求人の MAX_DF_RATIO 以上（かつ MIN_PRUNE_DF 件以上）に出てくるバイグラムは
+# 「スタッフ」「東京」のように区別の役に立たず、積の計算も重くするので使わない
+MAX_DF_RATIO = 0.1
+MIN_PRUNE_DF = 1000
+
+JOB_FIELDS = ('pk', 'title', 'company', 'location', 'description')
+
+
+def cache_key(user_id):
+    return f'recommend:jobs:{user_id}'
+
+
+def _tf(weights):
+    """出現の重みを TF にする（長い説明文が有利になりすぎないよう対数で抑える）"""
+    return {term: 1.0 + math.log(weight) for term, weight in weights.items()}
+
+
+class JobMatrix:
+    """ある時点の全求人の TF-IDF 行列（作ったあとは変更しない）"""
+
+    def __init__(self, jobs):
+        job_ids = array('q')
+        rows, cols, values = array('i'), array('i'), array('f')
+        vocab = {}
+        df = array('i')
+        for row, job in enumerate(jobs):
+            job_ids.append(job.pk)
+            for term, tf in _tf(job_tokens(job)).items():
+                col = vocab.get(term)
+                if col is None:
+                    col = vocab[term] = len(vocab)
+                    df.append(0)
+                df[col] += 1
+                rows.append(row)
+                cols.append(col)
+                values.append(tf)
+
+        self.vocab = vocab
+        self.job_ids = np.frombuffer(job_ids, dtype=np.int64)
+        n = len(self.job_ids)
+        df = np.frombuffer(df, dtype=np.int32)
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        self.idf[df > max(MAX_DF_RATIO * n, MIN_PRUNE_DF)] = 0
+
+        rows = np.frombuffer(rows, dtype=np.int32)
+        cols = np.frombuffer(cols, dtype=np.int32)
+        data = np.frombuffer(values, dtype=np.float32) * self.idf[cols]
+        kept = data > 0
+        rows, cols, data = rows[kept], cols[kept], data[kept]
+        norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=n)).astype(np.float32)
+        data /= np.maximum(norms, 1e-12)[rows]
+
+        # 列ごとに並べ替えて CSC 形式にする
+        order = np.argsort(cols, kind='stable')
+        self.rows = rows[order]
+        self.data = data[order]
+        self.indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=len(vocab)), out=self.indptr[1:])
+
+    def __len__(self):
+        return len(self.job_ids)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.job_ids, self.idf, self.rows, self.data, self.indptr))
+
+    def row_of(self, pk):
+        """求人IDの行番号（行列にない求人は None）"""
+        position = int(np.searchsorted(self.job_ids, pk))
+        if position < len(self) and self.job_ids[position] == pk:
+            return position
+        return None
+
+    def vectorize(self, weights):
+        """{バイグラム: 重み} を (列番号, 値) の正規化済みベクトルにする。語彙にない語は捨てる"""
+        pairs = [(self.vocab[term], tf) for term, tf in _tf(weights).items() if term in self.vocab]
+        if not pairs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        cols = np.array([col for col, _ in pairs], dtype=np.int64)
+        values = np.array([tf for _, tf in pairs], dtype=np.float32) * self.idf[cols]
+        kept = values > 0
+        cols, values = cols[kept], values[kept]
+        if not len(values):
+            return cols, values
+        return cols, values / np.linalg.norm(values)
+
+    def scores(self, cols, values):
+        """全求人との内積（行列 × 会員ベクトル）"""
+        starts, ends = self.indptr[cols], self.indptr[cols + 1]
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if not total:
+            return np.zeros(len(self), dtype=np.float64)
+        # 各列の [start, end) をつなげた添字列をループなしで作る
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        index = np.arange(total, dtype=np.int64) + offsets
+        weights = self.data[index] * np.repeat(values, lengths)
+        return np.bincount(self.rows[index], weights=weights, minlength=len(self))
+
+
+class Recommender:
+    """プロセスごとに1つだけ作るおすすめ求人エンジン"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._alive = None          # 基の行列のうち、まだ有効な行
+        self._overlay = {}          # {求人ID: (列番号, 値)} 作成後に追加・変更された求人
+        self._built_at = 0.0
+        self._rebuilding = threading.Event()
+
+    # --- 行列の作成・差分更新 ---
+    def rebuild(self, jobs=None):
+        """行列を作り直す。jobs（pk の昇順）を渡さなければ DB の全求人から作る"""
+        from .models import Job
+
+        if jobs is None:
+            jobs = Job.objects.order_by('pk').only(*JOB_FIELDS[1:]).iterator(chunk_size=2000)
+        matrix = JobMatrix(jobs)
+        with self._lock:
+            self._matrix = matrix
+            self._alive = np.ones(len(matrix), dtype=bool)
+            self._overlay = {}
+            self._built_at = time.monotonic()
+        return matrix
+
+    def reset(self):
+        with self._lock:
+            self._matrix = self._alive = None
+            self._overlay = {}
+
+    def upsert_jobs(self, jobs):
+        with self._lock:
+            if self._matrix is None:
+                return
+            for job in jobs:
+                row = self._matrix.row_of(job.pk)
+                if row is not None:
+                    self._alive[row] = False
+                self._overlay[job.pk] = self._matrix.vectorize(job_tokens(job))
+
+    def remove_job(self, pk):
+        with self._lock:
+            if self._matrix is None:
+                return
+            row = self._matrix.row_of(pk)
+            if row is not None:
+                self._alive[row] = False
+            self._overlay.pop(pk, None)
+
+    @property
+    def ready(self):
+        return self._matrix is not None
+
+    def warm(self):
+        """行列がまだなければ裏のスレッドで作り始める（settings.RECOMMEND_WARM_IN_BACKGROUND が False なら何もしない）"""
+        if self._matrix is None and getattr(settings, 'RECOMMEND_WARM_IN_BACKGROUND', True):
+            self._rebuild_in_background()
+
+    def _rebuild_in_background(self):
+        def run():
+            try:
+                self.rebuild()
+            except Exception:
+                logger.exception("おすすめ求人の行列を作り直せませんでした")
+            finally:
+                self._rebuilding.clear()
+                connection.close()
+
+        if not self._rebuilding.is_set():
+            self._rebuilding.set()
+            threading.Thread(target=run, name='recommend-rebuild', daemon=True).start()
+
+    def _state(self):
+        """(行列, 有効な行, 差分)。行列がまだなければ作り始めて None を返す"""
+        if self._matrix is None:
+            self.warm()
+            return None
+        if (
+            len(self._overlay) > OVERLAY_LIMIT
+            or time.monotonic() - self._built_at > getattr(settings, 'RECOMMEND_REBUILD_INTERVAL', REBUILD_INTERVAL)
+        ):
+            # 作り直しの間（10万件で十数秒）は今の行列で答える
+            self._rebuild_in_background()
+        with self._lock:
+            if self._matrix is None:
+                return None
+            return self._matrix, self._alive.copy(), dict(self._overlay)
+
+    # --- おすすめを出す ---
+    def profile(self, matrix, applied_jobs=(), questions=()):
+        """会員のベクトル（列番号, 値）を作る"""
+        dense = {}
+        for job in applied_jobs:
+            for col, value in zip(*matrix.vectorize(job_tokens(job))):
+                dense[col] = dense.get(col, 0.0) + float(value)
+        consult = Counter()
+        for question in questions:
+            consult.update(tokenize(question))
+        for col, value in zip(*matrix.vectorize(consult)):
+            dense[col] = dense.get(col, 0.0) + CONSULT_WEIGHT * float(value)
+        top = sorted(dense.items(), key=lambda item: -item[1])[:MAX_PROFILE_TERMS]
+        cols = np.array([col for col, _ in top], dtype=np.int64)
+        values = np.array([value for _, value in top], dtype=np.float32)
+        return cols, values
+
+    def top_k(self, applied_jobs=(), questions=(), k=RECOMMEND_COUNT, exclude=()):
+        """スコアの高い求人IDを k 件返す（スコア0の求人は出さない。行列がまだなければ空）"""
+        state = self._state()
+        if state is None:
+            return []
+        matrix, alive, overlay = state
+        cols, values = self.profile(matrix, applied_jobs, questions)
+        if not len(cols):
+            return []
+        scores = matrix.scores(cols, values)
+        scores[~alive] = 0
+        for pk in exclude:
+            row = matrix.row_of(pk)
+            if row is not None:
+                scores[row] = 0
+
+        candidates = []
+        if len(scores):
+            top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+            candidates = [(float(scores[i]), int(matrix.job_ids[i])) for i in top if scores[i] > 0]
+        # 差分の求人は件数が少ないので1件ずつ内積を取る
+        weights = dict(zip(cols.tolist(), values.tolist()))
+        excluded = set(exclude)
+        for pk, (job_cols, job_values) in overlay.items():
+            if pk in excluded:
+                continue
+            score = sum(weights.get(col, 0.0) * float(value) for col, value in zip(job_cols.tolist(), job_values))
+            if score > 0:
+                candidates.append((score, pk))
+        candidates.sort(key=lambda item: (-item[0], -item[1]))
+        return [pk for _, pk in candidates[:k]]
+
+
+engine = Recommender()
+
+
+def for_user(user, applications=None, logs=None, k=RECOMMEND_COUNT):
+    """会員のおすすめ求人（Job のリスト）。applications / logs を渡せばそれを使う"""
+    from .models import AIConsultLog, Application, Job
+
+    key = cache_key(user.pk)
+    jobs = cache.get(key)
+    if jobs is not None:
+        return jobs
+    if not engine.ready:
+        # 行列ができるまではおすすめなし（SQL も出さず、空の結果はキャッシュしない）
+        engine.warm()
+        return []
+
+    if applications is None:
+        applications = Application.objects.filter(user=user).select_related('job')
+    if logs is None:
+        logs = AIConsultLog.objects.filter(user=user).order_by('-created_at')[:MAX_CONSULT_LOGS]
+    applied = [application.job for application in applications]
+    questions = [log.user_question for log in list(logs)[:MAX_CONSULT_LOGS]]
+
+    ids = engine.top_k(applied, questions, k=k, exclude=[job.pk for job in applied])
+    found = Job.objects.in_bulk(ids) if ids else {}
+    jobs = [found[pk] for pk in ids if pk in found]
+    cache.set(key, jobs, CACHE_TIMEOUT)
+    return jobs
+
+
+def _generation_key(user_id):
+    return f'recommend:generation:{user_id}'
+
+
+def generation(user):
+    """会員のおすすめの「世代」。応募・相談が変わると進む（条件付き GET の ETag 用。おすすめは計算しない）"""
+    # キャッシュから消えても前の値と重ならないよう、初めの値は時刻にする
+    return cache.get_or_set(_generation_key(user.pk), time.time_ns(), None)
+
+
+def invalidate(*user_ids):
+    keys = [cache_key(user_id) for user_id in user_ids if user_id is not None]
+    if keys:
+        cache.delete_many(keys)
+    for user_id in user_ids:
+        if user_id is None:
+            continue
+        try:
+            cache.incr(_generation_key(user_id))
+        except ValueError:
+            # 世代がまだない（次に読んだときに新しい値で始まる）
+            pass
@@ -0,0 +1,84 @@
+"""大きな画像の縮小版（WebP / AVIF）を作る
+
+collectstatic のときに storage.ResponsiveStaticFilesStorage から呼ばれ、
+RESPONSIVE_IMAGES にある画像を幅ごとに縮小して images/responsive/ に保存します。
+できた縮小版はほかの静的ファイルと同じように、マニフェストで内容のハッシュ付きの名前になり、
+テンプレートでは {% picture %} / {% background_image_set %}（templatetags/steppia_images.py）で使います。
+
+AVIF は Pillow が対応しているときだけ作ります（対応していなければ WebP だけ）。
+"""
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image
+
+# 元の画像: 作る幅（px）。表示の大きさ×1〜3倍くらい
+RESPONSIVE_IMAGES = {
+    'images/c_1.png': (160, 320, 640),
+    'images/c_2.png': (160, 320, 640),
+    'images/c_3.png': (160, 320, 640),
+    'images/sakura_bg.png': (800, 1600),
+}
+
+OUTPUT_DIR = 'images/responsive'
+
+# 形式: (MIME タイプ, Pillow の保存オプション)。ブラウザには上から順に候補として出す
+FORMATS = {
+    'avif': ('image/avif', {'quality': 60}),
+    'webp': ('image/webp', {'quality': 80, 'method': 6}),
+}
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS if f'.{fmt}' in Image.registered_extensions()]
+
+
+def variant_name(source, width, fmt):
+    """'images/c_1.png', 320, 'webp' → 'images/responsive/c_1-320w.webp'"""
+    stem = source.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    return f'{OUTPUT_DIR}/{stem}-{width}w.{fmt}'
+
+
+def variants(source):
+    """[(形式, 幅, 名前)]。FORMATS の順、同じ形式の中では幅の小さい順"""
+    return [
+        (fmt, width, variant_name(source, width, fmt))
+        for fmt in available_formats()
+        for width in RESPONSIVE_IMAGES.get(source, ())
+    ]
+
+
+def encode(image, width, fmt):
+    """幅 width に縮小（拡大はしない）して fmt で書き出したバイト列"""
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    if image.mode == 'P':
+        image = image.convert('RGBA')
+    buffer = BytesIO()
+    image.save(buffer, fmt.upper(), **FORMATS[fmt][1])
+    return buffer.getvalue()
+
+
+def generate(storage, paths):
+    """paths（collectstatic の {名前: (元の storage, パス)}）にある対象画像の縮小版を storage に保存する
+
+    元の画像より新しい縮小版がすでにあれば作り直さない。保存した（または既存の）縮小版の名前を返す。
+    """
+    names = []
+    for source, widths in RESPONSIVE_IMAGES.items():
+        if source not in paths:
+            continue
+        source_storage, source_path = paths[source]
+        source_time = source_storage.get_modified_time(source_path)
+        image = None
+        for fmt, width, name in variants(source):
+            names.append(name)
+            if storage.exists(name) and storage.get_modified_time(name) >= source_time:
+                continue
+            if image is None:
+                with source_storage.open(source_path) as f:
+                    image = Image.open(f)
+                    image.load()
+            storage.delete(name)
+            storage.save(name, ContentFile(encode(image, width, fmt)))
+    return names
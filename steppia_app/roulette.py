@@ -0,0 +1,90 @@
+"""ルーレットの抽選エンジン（サーバー側で抽選）
+
+・景品は PRIZES の重み付きで抽選します。daily_cap を決めた景品は
+  RouletteDailyStock で「その日に出た数」を数え、上限に達したら抽選から外します。
+・「1日1回」の判定は Member.last_roulette_date への条件付き UPDATE 1本で行います。
+  同じ会員が同時に回しても、UPDATE できるのは1リクエストだけです。
+・トランザクションは抽選とクーポン作成の間だけで、画面の描画中はロックを持ちません。
+"""
+import random
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Coupon, Member, RouletteDailyStock
+
+
+@dataclass(frozen=True)
+class Prize:
+    name: str
+    weight: int
+    is_win: bool = True
+    daily_cap: int = None   # None なら上限なし
+
+
+PRIZES = (
+    Prize('特賞', weight=1),
+    Prize('コンサル面談30分', weight=1),
+    Prize('A賞', weight=1),
+    Prize('B賞', weight=1),
+    Prize('ハズレ', weight=2, is_win=False),
+)
+
+# ルーレット盤の並び（roulette.html はこの順に描画する）
+SEGMENTS = ("特賞", "コンサル面談30分", "A賞", "ハズレ", "B賞", "ハズレ")
+
+
+@dataclass(frozen=True)
+class SpinResult:
+    prize: Prize
+    segment: int
+    date: object
+
+
+def claim_turn(user, today):
+    """今日の1回分を確保できたら True（条件付き UPDATE なので同時実行でも1回だけ）"""
+    return bool(
+        Member.objects.filter(user=user)
+        .filter(Q(last_roulette_date__isnull=True) | Q(last_roulette_date__lt=today))
+        .update(last_roulette_date=today)
+    )
+
+
+def claim_stock(prize, today):
+    """上限のある景品を1つ確保できたら True"""
+    if prize.daily_cap is None:
+        return True
+    stock = RouletteDailyStock.objects.filter(date=today, prize_name=prize.name, awarded__lt=prize.daily_cap)
+    if stock.update(awarded=F('awarded') + 1):
+        return True
+    # その日の最初の1つなら行を作ってからもう一度
+    RouletteDailyStock.objects.bulk_create(
+        [RouletteDailyStock(date=today, prize_name=prize.name)], ignore_conflicts=True
+    )
+    return bool(stock.update(awarded=F('awarded') + 1))
+
+
+def draw(today, prizes=PRIZES, rng=random):
+    """重み付きで景品を選ぶ。在庫切れの景品は外して引き直す"""
+    candidates = list(prizes)
+    while candidates:
+        prize = rng.choices(candidates, weights=[p.weight for p in candidates])[0]
+        if claim_stock(prize, today):
+            return prize
+        candidates.remove(prize)
+    return Prize('ハズレ', weight=0, is_win=False)
+
+
+def spin(user, prizes=PRIZES, segments=SEGMENTS, rng=random):
+    """ルーレットを1回まわす。今日すでに回していれば None"""
+    today = timezone.localdate()
+    with transaction.atomic():
+        if not claim_turn(user, today):
+            return None
+        prize = draw(today, prizes, rng)
+        if prize.is_win:
+            Coupon.objects.create(user=user, prize_name=prize.name)
+    matching = [i for i, name in enumerate(segments) if name == prize.name]
+    return SpinResult(prize=prize, segment=rng.choice(matching) if matching else 0, date=today)
@@ -0,0 +1,113 @@
+"""給与テキストの数値化
+
+「月給20万〜25万円」「時給1,200円〜」「日給8000円」のような文字列から
+(下限, 上限, 単位) を取り出し、Job.salary_min / salary_max / salary_unit に入れます。
+金額はすべて円。上限のない「〜」は salary_max を None にします。
+"""
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Q
+
+HOURLY = 'hourly'
+DAILY = 'daily'
+MONTHLY = 'monthly'
+YEARLY = 'yearly'
+
+UNIT_CHOICES = [
+    (HOURLY, '時給'),
+    (DAILY, '日給'),
+    (MONTHLY, '月給'),
+    (YEARLY, '年収'),
+]
+
+UNIT_KEYWORDS = [
+    (HOURLY, ('時給',)),
+    (DAILY, ('日給', '日当')),
+    (MONTHLY, ('月給', '月収', '月額')),
+    (YEARLY, ('年収', '年俸')),
+]
+
+_AMOUNT = r'(\d+(?:\.\d+)?)\s*(万)?\s*円?'
+_RANGE_RE = re.compile(_AMOUNT + r'(?:\s*([~〜\-－ー]|から)\s*(?:' + _AMOUNT + r')?)?')
+
+
+def _yen(number, man):
+    value = float(number)
+    return int(round(value * 10000)) if man else int(round(value))
+
+
+def _guess_unit(amount):
+    """単位の書かれていない金額は桁から推測する"""
+    if amount < 5000:
+        return HOURLY
+    if amount < 50000:
+        return DAILY
+    if amount < 1000000:
+        return MONTHLY
+    return YEARLY
+
+
+def parse_salary(text):
+    """給与テキストを (下限, 上限, 単位) にする。読めなければ (None, None, '')"""
+    text = unicodedata.normalize('NFKC', text or '').replace(',', '')
+    unit = ''
+    position = 0
+    for candidate, keywords in UNIT_KEYWORDS:
+        found = [text.find(k) for k in keywords if k in text]
+        if found:
+            unit, position = candidate, min(found)
+            break
+
+    match = _RANGE_RE.search(text, position)
+    if match is None:
+        return None, None, ''
+    low_number, low_man, separator, high_number, high_man = match.groups()
+    # 「20〜25万円」のように、万が後ろにだけ付いている範囲
+    if high_number and high_man and not low_man and float(low_number) < float(high_number):
+        low_man = high_man
+    low = _yen(low_number, low_man)
+    if high_number:
+        high = _yen(high_number, high_man)
+    elif separator or text[match.end():].lstrip().startswith('以上'):
+        high = None
+    else:
+        high = low
+    if high is not None and high < low:
+        low, high = high, low
+    return low, high, unit or _guess_unit(low)
+
+
+def apply(job):
+    """job.salary から数値の列を埋める"""
+    job.salary_min, job.salary_max, job.salary_unit = parse_salary(job.salary)
+    return job
+
+
+def pay_filter(unit=None, min_pay=None, max_pay=None, prefix=''):
+    """「時給1200円〜1500円」のような条件の Q（給与の下限が min_pay 以上・max_pay 以下の求人）"""
+    q = Q()
+    if unit:
+        q &= Q(**{f'{prefix}salary_unit': unit})
+    if min_pay is not None:
+        q &= Q(**{f'{prefix}salary_min__gte': min_pay})
+    if max_pay is not None:
+        q &= Q(**{f'{prefix}salary_min__lte': max_pay})
+    return q
+
+
+def backfill(job_model, batch_size=1000):
+    """既存の求人を ID 順に batch_size 件ずつ解析し直す（バッチごとに別トランザクション）"""
+    updated = 0
+    last_pk = 0
+    while True:
+        jobs = list(job_model.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'salary')[:batch_size])
+        if not jobs:
+            return updated
+        last_pk = jobs[-1].pk
+        for job in jobs:
+            apply(job)
+        with transaction.atomic():
+            job_model.objects.bulk_update(jobs, ['salary_min', 'salary_max', 'salary_unit'])
+        updated += len(jobs)
@@ -0,0 +1,166 @@
+"""求人検索（バイグラム転置インデックス）
+
+日本語は単語分割（形態素解析）なしでも検索できるよう、
+正規化したテキストを2文字ずつに区切った「バイグラム」で索引を作ります。
+索引は通常のテーブル（JobSearchToken）なので SQLite / PostgreSQL の
+どちらでも同じクエリで動きます。
+"""
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .salary import pay_filter
+
+# フィールドごとの重み（タイトルに含まれる語ほど上位に表示）
+FIELD_WEIGHTS = {
+    'title': 4,
+    'company': 3,
+    'location': 2,
+    'description': 1,
+}
+
+# 1回の検索で使うバイグラムの上限（長文検索でSQLのパラメータが膨らまないように）
+MAX_QUERY_TOKENS = 16
+
+PAGE_SIZE = 20
+
+_SPLIT_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize(text):
+    """全角/半角・カタカナ/ひらがな・大文字/小文字の揺れを吸収する"""
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    # カタカナ（ァ〜ヶ）をひらがなに寄せる
+    return ''.join(
+        chr(ord(ch) - 0x60) if 'ァ' <= ch <= 'ヶ' else ch
+        for ch in text
+    )
+
+
+def tokenize(text):
+    """正規化したテキストをバイグラムに分解する（1文字だけの塊はそのまま）"""
+    tokens = []
+    for run in _SPLIT_RE.split(normalize(text)):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def job_tokens(job):
+    """求人1件分の {トークン: 重み} を作る"""
+    weights = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in set(tokenize(getattr(job, field))):
+            weights[token] = weights.get(token, 0) + weight
+    return weights
+
+
+def index_jobs(jobs, token_model=None):
+    """求人の索引をまとめて作り直す（保存・一括取込のどちらからも使う）"""
+    if token_model is None:
+        from .models import JobSearchToken as token_model
+
+    jobs = list(jobs)
+    if not jobs:
+        return 0
+    rows = [
+        token_model(job_id=job.pk, token=token, weight=weight)
+        for job in jobs
+        for token, weight in job_tokens(job).items()
+    ]
+    with transaction.atomic():
+        token_model.objects.filter(job_id__in=[job.pk for job in jobs]).delete()
+        token_model.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def _query_tokens(query):
+    tokens = list(dict.fromkeys(tokenize(query)))
+    # バイグラムが取れるなら1文字の塊は捨てる（索引側と粒度を揃える）
+    if any(len(t) > 1 for t in tokens):
+        tokens = [t for t in tokens if len(t) > 1]
+    return tokens[:MAX_QUERY_TOKENS]
+
+
+def _parse_cursor(cursor, with_score):
+    """「スコア.求人ID」または「求人ID」の形のカーソルを読む。壊れていれば先頭ページ扱い"""
+    try:
+        if with_score:
+            score, pk = cursor.split('.', 1)
+            return int(score), int(pk)
+        return None, int(cursor)
+    except (AttributeError, ValueError):
+        return None
+
+
+def search_jobs(query='', cursor=None, page_size=PAGE_SIZE, unit=None, min_pay=None, max_pay=None, sort=None):
+    """求人を検索して (求人リスト, 次ページのカーソル) を返す
+
+    ・キーワードなし … 新着順（IDの降順）
+    ・キーワードあり … 全バイグラムを含む求人をスコア順
+    どちらも sort='salary' なら給与の下限が高い順（給与の分からない求人は出さない）。
+    unit / min_pay / max_pay を渡すと「時給1200円〜1500円」のように給与で絞り込みます（salary.py）。
+    どれもキーセット方式なので、何ページ目でも同じ速さで返せます。
+    """
+    from .models import Job, JobSearchToken
+
+    query = (query or '').strip()
+    tokens = _query_tokens(query)
+
+    # キーワードなし、または1文字ずつの検索（「東 京」など）はスコアを付けない
+    if not tokens or all(len(t) == 1 for t in tokens):
+        jobs = Job.objects.filter(pay_filter(unit, min_pay, max_pay))
+        if tokens:
+            # 索引のトークンは正規化済みなので、どれか1文字を含むトークンのある求人を探せば
+            # 全角/半角・カタカナ/ひらがなの揺れもバイグラムの検索と同じように吸収できる
+            chars = Q()
+            for token in tokens:
+                chars |= Q(token__contains=token)
+            jobs = jobs.filter(pk__in=JobSearchToken.objects.filter(chars).values('job_id'))
+        parsed = _parse_cursor(cursor, with_score=sort == 'salary') if cursor else None
+        if sort == 'salary':
+            jobs = jobs.filter(salary_min__isnull=False).order_by('-salary_min', '-pk')
+            if parsed:
+                pay, pk = parsed
+                jobs = jobs.filter(Q(salary_min__lt=pay) | Q(salary_min=pay, pk__lt=pk))
+        else:
+            jobs = jobs.order_by('-pk')
+            if parsed:
+                jobs = jobs.filter(pk__lt=parsed[1])
+        page = list(jobs[:page_size + 1])
+        next_cursor = None
+        if len(page) > page_size:
+            last = page[page_size - 1]
+            next_cursor = f"{last.salary_min}.{last.pk}" if sort == 'salary' else str(last.pk)
+        return page[:page_size], next_cursor
+
+    hits = JobSearchToken.objects.filter(token__in=tokens).filter(pay_filter(unit, min_pay, max_pay, prefix='job__'))
+    parsed = _parse_cursor(cursor, with_score=True) if cursor else None
+    # 並べる順（カーソルは「その値.求人ID」）。給与順でもキーワードで絞り込んだ結果を並べ替えるだけ
+    key = 'job__salary_min' if sort == 'salary' else 'score'
+    if sort == 'salary':
+        hits = hits.filter(job__salary_min__isnull=False)
+        if parsed:
+            pay, pk = parsed
+            hits = hits.filter(Q(job__salary_min__lt=pay) | Q(job__salary_min=pay, job_id__lt=pk))
+        hits = hits.values('job_id', 'job__salary_min')
+    else:
+        hits = hits.values('job_id')
+    hits = hits.annotate(score=Sum('weight'), matched=Count('token')).filter(matched=len(tokens))
+    if parsed and sort != 'salary':
+        score, pk = parsed
+        hits = hits.filter(Q(score__lt=score) | Q(score=score, job_id__lt=pk))
+    hits = list(hits.order_by(f'-{key}', '-job_id')[:page_size + 1])
+
+    next_cursor = None
+    if len(hits) > page_size:
+        last = hits[page_size - 1]
+        next_cursor = f"{last[key]}.{last['job_id']}"
+        hits = hits[:page_size]
+
+    jobs = Job.objects.in_bulk([h['job_id'] for h in hits])
+    return [jobs[h['job_id']] for h in hits if h['job_id'] in jobs], next_cursor
@@ -0,0 +1,228 @@
+"""リクエストごとの SQL 計測と、ビューごとの「クエリ予算」
+
+SQLBudgetMiddleware が1リクエストの間に発行された SQL を数えて、
+・Server-Timing ヘッダー（db / tpl / total。ブラウザの開発者ツールで見られる）
+・ログ（steppia_app.requests に JSON で1行）
+に出します。同じ形の SQL が何度も出ていれば（N+1）、その形（fingerprint）と回数も残します。
+
+ビューには @query_budget(本数) で予算を書いておき、超えたら警告ログを出します。
+settings.SQL_BUDGET['STRICT'] が True のときは QueryBudgetExceeded を投げます。
+テストの実行中は STRICT なので、どのテストでも予算超えはそのまま失敗になります。
+
+本数にはセッション・ログインユーザーの読み込みも含みます。
+StreamingHttpResponse の中身を作る SQL は、ミドルウェアを抜けた後に走るので数えません。
+ASGI では非同期のまま動きます。DB 接続はスレッドごとなので、非同期の ORM が SQL を流すスレッド
+（sync_to_async のスレッド）の接続に計測を付けます。
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.exceptions import TemplateDoesNotExist
+
+logger = logging.getLogger('steppia_app.requests')
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    'STRICT': False,
+    # ログに残す「同じ形の SQL」の数
+    'MAX_DUPLICATES': 5,
+}
+
+_current = ContextVar('sql_budget_stats', default=None)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_SPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """STRICT のとき、ビューが予算より多く SQL を発行した"""
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'SQL_BUDGET', {})}
+
+
+def query_budget(limit):
+    """ビューのデコレーター：GET 1回で発行してよい SQL の本数（セッション・ユーザーの読み込みを含む）
+
+    キャッシュが空のときの本数で決める。一覧の行数に比例して増えたら（N+1）予算を超える。
+    いちばん外側（@login_required などより上）に付けること。
+    """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def fingerprint(sql):
+    """値を除いた SQL の形（IN (%s, %s, ...) の長さの違いもまとめる）"""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', _LITERAL.sub('?', sql)).strip()
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.fingerprints = Counter()
+
+    def add_query(self, sql, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self, limit=None):
+        """[(SQL の形, 回数)]（2回以上出たものを多い順に）"""
+        return [(sql, count) for sql, count in self.fingerprints.most_common(limit) if count > 1]
+
+
+def current():
+    """いま計測中のリクエストの RequestStats（計測していなければ None）"""
+    return _current.get()
+
+
+def _record(execute, sql, params, many, context):
+    stats = _current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            stats.add_query(sql, time.perf_counter() - start)
+
+
+def _wrap_connections():
+    """このスレッドの DB 接続に _record を付ける（返した ExitStack を閉じると外れる）"""
+    wrappers = ExitStack()
+    for connection in connections.all():
+        wrappers.enter_context(connection.execute_wrapper(_record))
+    return wrappers
+
+
+class capture:
+    """with capture() as stats: …　の間の SQL とテンプレートの時間を stats に集める"""
+
+    def __enter__(self):
+        self.stats = RequestStats()
+        self._token = _current.set(self.stats)
+        self._wrappers = _wrap_connections()
+        return self.stats
+
+    def __exit__(self, *exc_info):
+        self._wrappers.close()
+        _current.reset(self._token)
+
+
+class acapture(capture):
+    """async with acapture() as stats: …　（接続への付け外しは、非同期の ORM が SQL を流すスレッドで行う）"""
+
+    async def __aenter__(self):
+        self.stats = RequestStats()
+        self._token = _current.set(self.stats)
+        self._wrappers = await sync_to_async(_wrap_connections)()
+        return self.stats
+
+    async def __aexit__(self, *exc_info):
+        await sync_to_async(self._wrappers.close)()
+        _current.reset(self._token)
+
+
+class SQLBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        options = config()
+        if not options['ENABLED']:
+            return self.get_response(request)
+        start = time.perf_counter()
+        with capture() as stats:
+            request.sql_stats = stats
+            response = self.get_response(request)
+        return self._finish(request, response, stats, time.perf_counter() - start, options)
+
+    async def __acall__(self, request):
+        options = config()
+        if not options['ENABLED']:
+            return await self.get_response(request)
+        start = time.perf_counter()
+        async with acapture() as stats:
+            request.sql_stats = stats
+            response = await self.get_response(request)
+        return self._finish(request, response, stats, time.perf_counter() - start, options)
+
+    def _finish(self, request, response, stats, total, options):
+        budget = getattr(request, 'query_budget', None)
+        over = budget is not None and stats.queries > budget
+        if options['SERVER_TIMING']:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+                f'tpl;dur={stats.template_time * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+        record = {
+            'view': getattr(request, 'view_name', None),
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats.queries,
+            'budget': budget,
+            'db_ms': round(stats.db_time * 1000, 1),
+            'tpl_ms': round(stats.template_time * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+            'duplicates': dict(stats.duplicates(options['MAX_DUPLICATES'])),
+        }
+        logger.log(logging.WARNING if over else logging.INFO, json.dumps(record, ensure_ascii=False))
+        if over and options['STRICT']:
+            raise QueryBudgetExceeded(
+                f"{record['view']} が SQL を {stats.queries} 本発行しました（予算 {budget} 本）："
+                f"{record['duplicates'] or 'くり返しなし'}"
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.view_name = request.resolver_match.view_name if request.resolver_match else view_func.__name__
+        if request.method in ('GET', 'HEAD'):
+            request.query_budget = getattr(view_func, 'query_budget', None)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats = _current.get()
+            if stats is not None:
+                stats.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """描画時間を RequestStats に足す DjangoTemplates（テンプレートの中で走る SQL の時間も含む）"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,14 @@
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from . import responsive_images
+
+
+class ResponsiveStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """本番用の静的ファイル置き場：大きな画像の縮小版（responsive_images.py）も作ってからハッシュ・圧縮する"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = dict(paths)
+            for name in responsive_images.generate(self, paths):
+                paths[name] = (self, name)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
@@ -0,0 +1,36 @@
+from django import template
+
+from steppia_app import cache_policy
+
+register = template.Library()
+
+
+class UserFragmentNode(template.Node):
+    def __init__(self, name, nodelist):
+        self.name = name
+        self.nodelist = nodelist
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        user = context.get('user')
+        if user is None or not user.is_authenticated:
+            return self.nodelist.render(context)
+        content = cache_policy.get_fragment(name, user.pk)
+        if content is None:
+            content = self.nodelist.render(context)
+            cache_policy.set_fragment(name, user.pk, content)
+        return content
+
+
+@register.tag
+def user_fragment(parser, token):
+    """{% user_fragment "mypage.logs" %} 〜 {% enduser_fragment %}：ユーザーごとの部分キャッシュ
+
+    秒数は cache_policy.FRAGMENT_POLICY で決める。
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' にはキャッシュの名前を1つ指定してください")
+    nodelist = parser.parse(('enduser_fragment',))
+    parser.delete_first_token()
+    return UserFragmentNode(parser.compile_filter(bits[1]), nodelist)
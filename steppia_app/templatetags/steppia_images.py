@@ -0,0 +1,60 @@
+import mimetypes
+
+from django import template
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from steppia_app import responsive_images
+
+register = template.Library()
+
+
+def _built_variants(source):
+    """collectstatic で作られた縮小版 [(形式, 幅, URL)]。開発中（マニフェストなし）や未作成なら空"""
+    if not isinstance(staticfiles_storage, ManifestFilesMixin):
+        return []
+    found = []
+    for fmt, width, name in responsive_images.variants(source):
+        try:
+            found.append((fmt, width, static(name)))
+        except ValueError:
+            # マニフェストにない（縮小版を作らずに collectstatic した）
+            continue
+    return found
+
+
+@register.simple_tag
+def picture(source, alt='', sizes='100vw', **attrs):
+    """{% picture 'images/c_1.png' alt="…" sizes="100px" class="…" %}
+
+    縮小版があれば <picture> に AVIF / WebP の srcset を並べ、なければ元の画像の <img> だけを出す。
+    """
+    img = format_html(
+        '<img src="{}" alt="{}"{} loading="lazy" decoding="async">',
+        static(source), alt, format_html_join('', ' {}="{}"', attrs.items()),
+    )
+    built = _built_variants(source)
+    if not built:
+        return img
+    sources = format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', (
+        (responsive_images.FORMATS[fmt][0], ', '.join(f'{url} {width}w' for f, width, url in built if f == fmt), sizes)
+        for fmt in dict.fromkeys(fmt for fmt, _, _ in built)
+    ))
+    return format_html('<picture>{}{}</picture>', sources, img)
+
+
+@register.simple_tag
+def background_image_set(source):
+    """CSS の background-image 用：いちばん大きい縮小版を形式ごとに並べた image-set(...)
+
+    image-set に対応していないブラウザ向けに、手前に url(元の画像) の指定も書いておく。
+    """
+    largest = {}
+    for fmt, width, url in _built_variants(source):
+        largest[fmt] = url
+    candidates = [(url, responsive_images.FORMATS[fmt][0]) for fmt, url in largest.items()]
+    if not candidates:
+        return format_html('url("{}")', static(source))
+    candidates.append((static(source), mimetypes.guess_type(source)[0]))
+    return format_html('image-set({})', format_html_join(', ', 'url("{}") type("{}")', candidates))
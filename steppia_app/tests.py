@@ -1,3 +1,1688 @@
-from django.test import TestCase
+import csv
+import datetime
+import importlib
+import json
+import os
+import re
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from types import ModuleType
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from prometheus_client import REGISTRY
+from PIL import Image
+from django.conf import settings
+from django.apps import apps
+from django.contrib import admin
+from django.contrib.auth.models import User, update_last_login
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, OperationalError, connection, transaction
+from django.template import Context, Template
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from . import (
+    async_views, benchmark, booking, cache_policy, compliance, consult, dashboard, explain, job_import, member_directory,
+    metrics, progress_counters, recommend, profiling, roulette, salary, search, sql_budget, urls, views, worklog_rollups,
+)
+from .cache_backends import RedisCache
+from .consult_log import BufferedLogWriter
+from .models import (
+    AIConsultLog, AIConsultTemplate, Application, ComplianceFlag, Consultant, ConsultSlot, Coupon, Job, JobSearchToken, Schedule,
+    Member, RouletteDailyStock, WorkLog, WorkLogDailyTotal,
+)
+from .search import normalize, search_jobs, tokenize
+
+
+# --- 求人検索 ---
+class JobSearchTests(TestCase):
+    def make_job(self, **kwargs):
+        data = {'title': '一般事務', 'company': 'ステッピア商事', 'location': '東京都', 'salary': '月給20万円', 'description': 'データ入力'}
+        data.update(kwargs)
+        return Job.objects.create(**data)
+
+    def test_normalize_kana_and_width(self):
+        self.assertEqual(normalize('ＰＹＴＨＯＮ'), 'python')
+        self.assertEqual(normalize('パート'), normalize('ﾊﾟｰﾄ'))
+        self.assertEqual(normalize('パート'), 'ぱーと')
+        self.assertEqual(tokenize('東京 事務'), ['東京', '事務'])
+
+    def test_index_follows_save_and_delete(self):
+        job = self.make_job()
+        self.assertTrue(JobSearchToken.objects.filter(job=job, token='事務').exists())
+        job.title = '倉庫スタッフ'
+        job.save()
+        self.assertFalse(JobSearchToken.objects.filter(job=job, token='事務').exists())
+        job.delete()
+        self.assertFalse(JobSearchToken.objects.exists())
+
+    def test_ranked_search_with_kana_variants(self):
+        in_desc = self.make_job(title='倉庫スタッフ', description='事務所での軽作業')
+        in_title = self.make_job(title='経理事務')
+        self.make_job(title='介護スタッフ', description='施設でのお仕事')
+        jobs, _ = search_jobs('事務')
+        self.assertEqual(jobs, [in_title, in_desc])
+        jobs, _ = search_jobs('すたっふ')
+        self.assertEqual(len(jobs), 2)
+
+    def test_single_character_terms(self):
+        tokyo = self.make_job(title='経理', location='東京都')
+        kyoto = self.make_job(title='受付', location='京都府')
+        staff = self.make_job(title='倉庫スタッフ', location='大阪府')
+        self.assertEqual(search_jobs('東 京')[0], [kyoto, tokyo])
+        # 1文字でも正規化してから探す（ﾌ・フ → ふ）
+        self.assertEqual(search_jobs('ﾌ')[0], [staff])
+        self.assertEqual(search_jobs('ふ')[0], [staff])
+
+    def test_keyset_pagination(self):
+        created = [self.make_job(title=f'事務スタッフ{i}') for i in range(5)]
+        seen, cursor = [], None
+        while True:
+            page, cursor = search_jobs('事務', cursor, page_size=2)
+            seen.extend(page)
+            if not cursor:
+                break
+        self.assertEqual(sorted(j.pk for j in seen), sorted(j.pk for j in created))
+
+        page, cursor = search_jobs('', None, page_size=3)
+        self.assertEqual(page, created[::-1][:3])
+        page, cursor = search_jobs('', cursor, page_size=3)
+        self.assertEqual(page, created[::-1][3:])
+        self.assertIsNone(cursor)
+
+    def test_job_list_view(self):
+        self.make_job(title='経理スタッフ')
+        response = self.client.get(reverse('job_list'), {'q': 'ｽﾀｯﾌ'})
+        self.assertContains(response, '経理スタッフ')
+        response = self.client.get(reverse('job_list'), {'q': '介護'})
+        self.assertNotContains(response, '経理スタッフ')
+
+    def test_migration_builds_index_without_live_helpers(self):
+        migration = importlib.import_module('steppia_app.migrations.0015_jobsearchtoken')
+        job = self.make_job(title='経理スタッフ')
+        expected = set(JobSearchToken.objects.filter(job=job).values_list('token', 'weight'))
+        JobSearchToken.objects.all().delete()
+
+        with mock.patch.object(search, 'index_jobs', side_effect=AssertionError):
+            migration.build_index(apps, None)
+
+        self.assertEqual(set(JobSearchToken.objects.filter(job=job).values_list('token', 'weight')), expected)
+
+
+# --- 給与の数値化と絞り込み ---
+class SalaryTests(TestCase):
+    def make_job(self, salary, **kwargs):
+        data = {'title': '一般事務', 'company': 'ステッピア商事', 'location': '東京都', 'salary': salary}
+        data.update(kwargs)
+        return Job.objects.create(**data)
+
+    def test_parse_salary(self):
+        self.assertEqual(salary.parse_salary('月給20万〜25万円'), (200000, 250000, 'monthly'))
+        self.assertEqual(salary.parse_salary('月給20〜25万円'), (200000, 250000, 'monthly'))
+        self.assertEqual(salary.parse_salary('時給１，２００円〜'), (1200, None, 'hourly'))
+        self.assertEqual(salary.parse_salary('日給8000円以上'), (8000, None, 'daily'))
+        self.assertEqual(salary.parse_salary('年収350万円'), (3500000, 3500000, 'yearly'))
+        self.assertEqual(salary.parse_salary('1100円'), (1100, 1100, 'hourly'))
+        self.assertEqual(salary.parse_salary('要相談'), (None, None, ''))
+
+    def test_columns_follow_save(self):
+        job = self.make_job('時給1000円')
+        job.salary = '時給1300円〜1500円'
+        job.save(update_fields=['salary'])
+        job.refresh_from_db()
+        self.assertEqual((job.salary_min, job.salary_max, job.salary_unit), (1300, 1500, 'hourly'))
+
+    def test_filter_and_sort(self):
+        low = self.make_job('時給1000円')
+        high = self.make_job('時給1500円')
+        mid = self.make_job('時給1200円〜')
+        self.make_job('月給25万円')
+        self.make_job('時給1300円', location='大阪府')
+
+        jobs, _ = search_jobs('東京', unit='hourly', min_pay=1200)
+        self.assertEqual(set(jobs), {high, mid})
+        jobs, _ = search_jobs('', unit='hourly', min_pay=1000, sort='salary')
+        self.assertEqual(jobs[0], high)
+        self.assertEqual(jobs[-1], low)
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = search_jobs('', cursor, page_size=2, unit='hourly', sort='salary')
+            seen.extend(page)
+            if not cursor:
+                break
+        self.assertEqual([j.salary_min for j in seen], [1500, 1300, 1200, 1000])
+
+        # キーワードがあっても給与順にする
+        seen, cursor = [], None
+        while True:
+            page, cursor = search_jobs('東京', cursor, page_size=1, unit='hourly', sort='salary')
+            seen.extend(page)
+            if not cursor:
+                break
+        self.assertEqual([j.salary_min for j in seen], [1500, 1200, 1000])
+
+        jobs, _ = search_jobs('', unit='hourly', min_pay=1100, max_pay=1300)
+        self.assertEqual({j.salary_min for j in jobs}, {1200, 1300})
+        jobs, _ = search_jobs('東京', unit='hourly', max_pay=1200)
+        self.assertEqual(set(jobs), {low, mid})
+
+    def test_job_list_view(self):
+        self.make_job('時給1500円', title='受付スタッフ')
+        self.make_job('時給1000円', title='倉庫スタッフ')
+        response = self.client.get(reverse('job_list'), {'unit': 'hourly', 'min_pay': '1,200'})
+        self.assertContains(response, '受付スタッフ')
+        self.assertNotContains(response, '倉庫スタッフ')
+        response = self.client.get(reverse('job_list'), {'unit': 'hourly', 'max_pay': '1,200'})
+        self.assertContains(response, '倉庫スタッフ')
+        self.assertNotContains(response, '受付スタッフ')
+
+    def test_import_parses_salary(self):
+        job_import.import_jobs([{'external_id': 'A-1', 'title': '事務', 'salary': '日給9000円'}])
+        self.assertEqual(Job.objects.get(external_id='A-1').salary_unit, 'daily')
+
+
+# --- AI相談の回答エンジン ---
+class ConsultMatcherTests(TestCase):
+    def setUp(self):
+        consult.matcher.load()
+
+    def test_automaton_matches_faq_order(self):
+        automaton = consult.KeywordAutomaton(consult.FAQ_DATA)
+        keys = list(consult.FAQ_DATA)
+        for text in ['マップのログが見たい', 'オンライン面接が不安', '40代未経験です', 'こんにちは']:
+            expected = next((i for i, key in enumerate(keys) if key in text), None)
+            self.assertEqual(automaton.first_match(text), expected)
+
+    def test_template_takes_priority_and_follows_signals(self):
+        self.assertEqual(consult.matcher.answer('面接'), consult.FAQ_DATA['面接'])
+        with self.captureOnCommitCallbacks(execute=True):
+            template = AIConsultTemplate.objects.create(question='面接の服装は？', answer='スーツが無難です。')
+            AIConsultTemplate.objects.create(question='面接の持ち物', answer='履歴書を持参しましょう。')
+        self.assertEqual(consult.matcher.answer('面接'), 'スーツが無難です。')
+        with self.captureOnCommitCallbacks(execute=True):
+            template.delete()
+        self.assertEqual(consult.matcher.answer('面接'), '履歴書を持参しましょう。')
+        self.assertEqual(consult.matcher.answer('天気'), consult.FALLBACK_ANSWER)
+
+    def test_rolled_back_template_is_not_used(self):
+        consult.matcher.load()
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            AIConsultTemplate.objects.create(question='面接の服装は？', answer='スーツが無難です。')
+            transaction.set_rollback(True)
+        self.assertEqual(consult.matcher.answer('面接'), consult.FAQ_DATA['面接'])
+
+    def test_ai_consult_view_logs_answer(self):
+        response = self.client.post(reverse('ai_consult'), {'user_input': 'ブランクが長いです'})
+        self.assertContains(response, consult.FAQ_DATA['ブランク'])
+        self.assertEqual(AIConsultLog.objects.get().ai_response, consult.FAQ_DATA['ブランク'])
+
+
+# --- AI相談ログのまとめ書き ---
+class BufferedLogWriterTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.spill_path = Path(tmp.name) / 'spill.jsonl'
+        self.writer = BufferedLogWriter(batch_size=2, spill_path=self.spill_path, autostart=False)
+
+    def test_flush_writes_in_batches(self):
+        for i in range(5):
+            self.writer.enqueue(None, f'質問{i}', f'回答{i}')
+        self.assertEqual(self.writer.stats()['queue_depth'], 5)
+        with self.assertNumQueries(3):
+            self.assertEqual(self.writer.flush(), 5)
+        self.assertEqual(AIConsultLog.objects.count(), 5)
+        self.assertEqual(self.writer.stats()['flushes'], 3)
+
+    def test_spills_when_db_down_and_replays_later(self):
+        self.writer.enqueue(None, '質問', '回答')
+        with mock.patch.object(AIConsultLog.objects, 'bulk_create', side_effect=DatabaseError), \
+                self.assertLogs('steppia_app.consult_log', 'ERROR'):
+            self.writer.flush()
+        self.assertEqual(self.writer.stats()['spilled'], 1)
+        self.assertTrue(self.spill_path.exists())
+        self.assertFalse(AIConsultLog.objects.exists())
+
+        self.writer.enqueue(None, '次の質問', '次の回答')
+        self.writer.flush()
+        self.assertEqual(AIConsultLog.objects.count(), 2)
+        self.assertEqual(self.writer.stats()['replayed'], 1)
+        self.assertFalse(self.spill_path.exists())
+
+    def test_keeps_consultation_time_through_spill(self):
+        asked_at = timezone.now() - datetime.timedelta(hours=1)
+        self.writer.enqueue(None, '質問', '回答', created_at=asked_at)
+        with mock.patch.object(AIConsultLog.objects, 'bulk_create', side_effect=DatabaseError), \
+                self.assertLogs('steppia_app.consult_log', 'ERROR'):
+            self.writer.flush()
+        self.writer.enqueue(None, '次の質問', '次の回答')
+        self.writer.flush()
+        self.assertEqual(AIConsultLog.objects.get(user_question='質問').created_at, asked_at)
+
+
+    def test_replay_moves_corrupt_lines_aside(self):
+        self.spill_path.write_text(
+            '{"user_id": null, "user_question": "質問", "ai_response": "回答"}\n{"user_id": nu\n', encoding='utf-8',
+        )
+        self.writer.enqueue(None, '次の質問', '次の回答')
+        with self.assertLogs('steppia_app.consult_log', 'ERROR'):
+            self.writer.flush()
+        self.assertEqual(AIConsultLog.objects.count(), 2)
+        self.assertEqual(self.writer.stats()['quarantined'], 1)
+        self.assertEqual(self.spill_path.with_name('spill.jsonl.bad').read_text(encoding='utf-8'), '{"user_id": nu\n')
+        self.assertEqual(list(self.spill_path.parent.glob('*.replay')), [])
+
+    def test_counters_are_exported_as_metrics(self):
+        def sample(name, **labels):
+            return REGISTRY.get_sample_value(name, labels) or 0
+
+        written = sample('steppia_consult_log_entries_total', result='written')
+        flushes = sample('steppia_consult_log_flush_duration_seconds_count')
+        for i in range(3):
+            self.writer.enqueue(None, f'質問{i}', f'回答{i}')
+        self.assertEqual(sample('steppia_consult_log_queue_depth'), 3)
+        self.writer.flush()
+        self.assertEqual(sample('steppia_consult_log_queue_depth'), 0)
+        self.assertEqual(sample('steppia_consult_log_entries_total', result='written'), written + 3)
+        self.assertEqual(sample('steppia_consult_log_flush_duration_seconds_count'), flushes + 2)
+
+
+class BufferedLogWriterIntegrityTests(TransactionTestCase):
+    def test_drops_rows_that_violate_constraints_instead_of_spilling(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        spill_path = Path(tmp.name) / 'spill.jsonl'
+        writer = BufferedLogWriter(batch_size=10, spill_path=spill_path, autostart=False)
+        user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        writer.enqueue(user.pk, '質問', '回答')
+        writer.enqueue(user.pk + 1000, '退会した人の質問', '回答')
+
+        with self.assertLogs('steppia_app.consult_log', 'ERROR'):
+            self.assertEqual(writer.flush(), 1)
+
+        self.assertEqual(list(AIConsultLog.objects.values_list('user_question', flat=True)), ['質問'])
+        self.assertEqual((writer.stats()['rejected'], writer.stats()['spilled']), (1, 0))
+        self.assertFalse(spill_path.exists())
+
+
+# --- マイページのキャッシュ ---
+class MypageDashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        for i in range(3):
+            job = Job.objects.create(title=f'事務{i}', company=f'会社{i}', location='東京', salary='', description='')
+            Application.objects.create(user=self.user, job=job)
+        Coupon.objects.create(user=self.user, prize_name='コンサル面談30分')
+        Schedule.objects.create(user=self.user, date='2026-01-05', time='10:00', detail='山田 コンサル予約', kind=Schedule.KIND_CONSULT)
+        AIConsultLog.objects.create(user=self.user, user_question='面接', ai_response='笑顔で')
+        # おすすめ求人の行列は先に作っておく（応募済みの求人しかないので、おすすめは0件）
+        recommend.engine.rebuild()
+        self.addCleanup(recommend.engine.reset)
+
+    def get_mypage(self):
+        request = RequestFactory().get(reverse('mypage'))
+        request.user = self.user
+        return views.mypage(request)
+
+    def test_query_count_cold_and_warm(self):
+        # 冷えた状態：ログ・予約・応募（求人をJOIN）・クーポン・担当者名の5クエリ（応募件数に依存しない）
+        with self.assertNumQueries(5):
+            response = self.get_mypage()
+        self.assertContains(response, '事務2')
+        # 温まった状態：DBに行かない
+        with self.assertNumQueries(0):
+            response = self.get_mypage()
+        self.assertContains(response, '事務2')
+
+    def test_signals_invalidate_only_that_user(self):
+        other = User.objects.create_user('taro', 'taro@example.com', 'pass')
+        self.get_mypage()
+        cache.set(f'mypage:dashboard:{other.pk}', {'sentinel': True})
+        with self.captureOnCommitCallbacks(execute=True):
+            Coupon.objects.create(user=self.user, prize_name='ギフト券')
+            # コミットまでは消さない（古い行でキャッシュを作り直されないように）
+            self.assertIsNotNone(cache.get(dashboard.cache_key(self.user.pk)))
+        with self.assertNumQueries(5):
+            response = self.get_mypage()
+        self.assertContains(response, 'ギフト券')
+        self.assertEqual(cache.get(f'mypage:dashboard:{other.pk}'), {'sentinel': True})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.profile.assigned_consultant = '佐藤'
+            self.user.profile.save()
+        self.assertContains(self.get_mypage(), '佐藤')
+
+
+
+# --- キャッシュの方針とバックエンド ---
+class _RespHandler(socketserver.StreamRequestHandler):
+    """テスト用の小さな Redis 代役（RedisCache が使うコマンドだけ。EVAL は incr のスクリプトの代わり）"""
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if value is None:
+            self.wfile.write(b'$-1\r\n')
+        elif isinstance(value, int):
+            self.wfile.write(b':%d\r\n' % value)
+        elif isinstance(value, str):
+            self.wfile.write(f'+{value}\r\n'.encode())
+        elif isinstance(value, list):
+            self.wfile.write(b'*%d\r\n' % len(value))
+            for item in value:
+                self.reply(item)
+        else:
+            self.wfile.write(b'$%d\r\n%s\r\n' % (len(value), value))
+
+    def handle(self):
+        data = self.server.data
+        while (args := self.read_command()) is not None:
+            command, keys = args[0].upper(), args[1:]
+            if command == b'GET':
+                self.reply(data.get(keys[0]))
+            elif command == b'SET':
+                options = [arg.upper() for arg in keys[2:]]
+                if b'NX' in options and keys[0] in data:
+                    self.reply(None)
+                else:
+                    data[keys[0]] = keys[1]
+                    self.reply('OK')
+            elif command == b'DEL':
+                self.reply(sum(data.pop(key, None) is not None for key in keys))
+            elif command == b'MGET':
+                self.reply([data.get(key) for key in keys])
+            elif command == b'EXISTS':
+                self.reply(int(keys[0] in data))
+            elif command == b'EVAL':
+                key, delta = keys[2], int(keys[3])
+                if key in data:
+                    data[key] = str(int(data[key]) + delta).encode()
+                self.reply(int(data[key]) if key in data else None)
+            elif command in (b'EXPIRE', b'PERSIST'):
+                self.reply(int(keys[0] in data))
+            elif command == b'FLUSHDB':
+                data.clear()
+                self.reply('OK')
+            else:
+                self.wfile.write(b'-ERR unknown command\r\n')
+
+
+class CacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cache_policy.reset_stats()
+        self.job = Job.objects.create(title='一般事務', company='A社', location='東京都', salary='', description='')
+
+    def test_resp_cache_round_trip(self):
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _RespHandler)
+        server.daemon_threads = True
+        server.data = {}
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        backend = RedisCache(f'redis://127.0.0.1:{server.server_address[1]}/0', {'KEY_PREFIX': 'test', 'OPTIONS': {'protocol': 2}})
+        backend.set('dict', {'a': [1, 2]})
+        self.assertEqual(backend.get('dict'), {'a': [1, 2]})
+        self.assertIsNone(backend.get('missing'))
+        self.assertFalse(backend.add('dict', 'other'))
+        self.assertTrue(backend.add('new', 'value'))
+        backend.set('n', 1)
+        self.assertEqual(backend.incr('n', 4), 5)
+        self.assertEqual(backend.get('n'), 5)
+        with self.assertRaises(ValueError):
+            backend.incr('missing')
+        self.assertEqual(backend.get_many(['dict', 'new', 'missing']), {'dict': {'a': [1, 2]}, 'new': 'value'})
+        self.assertTrue(backend.delete('new'))
+        self.assertFalse(backend.has_key('new'))
+        self.assertEqual(backend.stats()['misses'], 2)
+        backend.clear()
+        self.assertEqual(server.data, {})
+
+    def test_anonymous_page_is_cached_and_logged_in_bypasses(self):
+        url = reverse('job_detail', args=[self.job.pk])
+        self.assertContains(self.client.get(url), '一般事務')
+        Job.objects.filter(pk=self.job.pk).update(title='倉庫スタッフ')
+        # 未ログインは PAGE_POLICY の秒数だけ同じページ
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(url), '一般事務')
+        self.assertEqual(cache_policy.stats()['pages']['job_detail'], {'misses': 1, 'hits': 1})
+
+        # ログイン中はキャッシュを使わない
+        self.client.force_login(User.objects.create_user('hanako', 'hanako@example.com', 'pass'))
+        self.assertContains(self.client.get(url), '倉庫スタッフ')
+
+    def test_mypage_fragment_follows_data_changes(self):
+        user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        other = User.objects.create_user('taro', 'taro@example.com', 'pass')
+        self.client.force_login(user)
+        self.client.get(reverse('mypage'))
+        cache_policy.set_fragment('mypage.logs', other.pk, 'sentinel')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Application.objects.create(user=user, job=self.job)
+        self.assertContains(self.client.get(reverse('mypage')), '一般事務')
+        self.assertEqual(cache_policy.get_fragment('mypage.logs', other.pk), 'sentinel')
+        # 変化がなければ部分キャッシュが当たる
+        self.client.get(reverse('mypage'))
+        self.assertEqual(cache_policy.stats()['fragments']['mypage.applications']['hits'], 1)
+
+    def test_fragment_is_not_reused_after_generation_is_evicted(self):
+        cache_policy.set_fragment('mypage.logs', 1, 'old')
+        cache_policy.invalidate_fragments(1)
+        cache_policy.set_fragment('mypage.logs', 1, 'new')
+        # 世代のキーだけが追い出されても、前の世代の部分には戻らない
+        cache.delete(cache_policy._generation_key(1))
+        self.assertIsNone(cache_policy.get_fragment('mypage.logs', 1))
+
+    def test_production_default_is_shared_across_workers(self):
+        def backend(**env):
+            code = "from django.conf import settings; print(settings.CACHES['default']['BACKEND'])"
+            env = {key: value for key, value in os.environ.items() if key != 'CACHE_BACKEND'} | env
+            return subprocess.run(
+                [sys.executable, '-c', code], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                env={**env, 'DJANGO_SETTINGS_MODULE': 'config.settings'},
+            )
+
+        self.assertEqual(backend(RENDER='1').stdout.strip(), 'steppia_app.cache_backends.FileBasedCache')
+        refused = backend(RENDER='1', CACHE_BACKEND='locmem')
+        self.assertNotEqual(refused.returncode, 0)
+        self.assertIn('ImproperlyConfigured', refused.stderr)
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get(reverse('cache_stats')).status_code, 302)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        response = self.client.get(reverse('cache_stats'))
+        self.assertEqual(response.json()['backend']['backend'], 'LocMemCache')
+
+
+# --- おすすめ求人 ---
+class RecommendTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        recommend.engine.reset()
+        self.addCleanup(recommend.engine.reset)
+        self.user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        self.applied = self.make_job('経理事務スタッフ', '請求書の作成と経費精算')
+        self.similar = self.make_job('経理アシスタント', '経費精算と請求書のチェック')
+        self.other = self.make_job('倉庫内ピッキング', 'フォークリフトでの荷物の運搬')
+        Application.objects.create(user=self.user, job=self.applied)
+        recommend.engine.rebuild()
+
+    def make_job(self, title, description, location='東京都'):
+        return Job.objects.create(title=title, company='ステッピア商事', location=location, salary='', description=description)
+
+    def test_cold_engine_does_not_block_requests(self):
+        recommend.engine.reset()
+        with mock.patch.object(recommend.engine, '_rebuild_in_background') as warm, \
+                self.settings(RECOMMEND_WARM_IN_BACKGROUND=True):
+            with self.assertNumQueries(0):
+                self.assertEqual(recommend.for_user(self.user), [])
+            warm.assert_called_once()
+        # 空の結果はキャッシュしないので、行列ができたら出てくる
+        self.assertIsNone(cache.get(recommend.cache_key(self.user.pk)))
+        recommend.engine.rebuild()
+        self.assertEqual(recommend.for_user(self.user)[0], self.similar)
+
+    def test_matrix_scores_like_dense_product(self):
+        matrix = recommend.engine.rebuild()
+        cols, values = matrix.vectorize(search.job_tokens(self.similar))
+        dense = np.zeros((len(matrix), len(matrix.vocab)), dtype=np.float32)
+        for col in range(len(matrix.vocab)):
+            start, end = matrix.indptr[col], matrix.indptr[col + 1]
+            dense[matrix.rows[start:end], col] = matrix.data[start:end]
+        query = np.zeros(len(matrix.vocab), dtype=np.float32)
+        query[cols] = values
+        np.testing.assert_allclose(matrix.scores(cols, values), dense @ query, rtol=1e-5)
+        self.assertAlmostEqual(float(np.linalg.norm(dense[matrix.row_of(self.similar.pk)])), 1.0, places=5)
+
+    def test_recommends_similar_jobs_except_applied(self):
+        jobs = recommend.for_user(self.user)
+        self.assertEqual(jobs[0], self.similar)
+        self.assertNotIn(self.applied, jobs)
+
+    def test_consult_questions_shift_ranking(self):
+        user = User.objects.create_user('taro', 'taro@example.com', 'pass')
+        AIConsultLog.objects.create(user=user, user_question='フォークリフトの資格を活かしたい', ai_response='')
+        self.assertEqual(recommend.for_user(user)[0], self.other)
+
+    def test_job_changes_update_incrementally(self):
+        recommend.for_user(self.user)
+        matrix = recommend.engine._matrix
+        new = self.make_job('経理の月次決算', '請求書と経費精算の締め作業')
+        self.similar.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            Application.objects.create(user=self.user, job=self.other)  # キャッシュを消す
+        jobs = recommend.for_user(self.user)
+        self.assertIs(recommend.engine._matrix, matrix)
+        self.assertEqual(jobs[0], new)
+        self.assertNotIn(self.similar.pk, [job.pk for job in jobs])
+
+    def test_cached_per_member(self):
+        recommend.for_user(self.user)
+        with self.assertNumQueries(0):
+            recommend.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            AIConsultLog.objects.create(user=self.user, user_question='面接', ai_response='')
+        self.assertIsNone(cache.get(recommend.cache_key(self.user.pk)))
+
+    def test_shown_on_mypage_and_job_list(self):
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('mypage')), '経理アシスタント')
+        response = self.client.get(reverse('job_list'))
+        self.assertEqual(response.context['recommended_jobs'][0], self.similar)
+        response = self.client.get(reverse('job_list'), {'q': '倉庫'})
+        self.assertEqual(response.context['recommended_jobs'], [])
+
+
+# --- お仕事ログの日別集計 ---
+class WorkLogRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        self.client.force_login(self.user)
+
+    def post_log(self, date, hours, amount):
+        return self.client.post(reverse('work_tracker'), {'date': date, 'hours': hours, 'amount': amount, 'company': 'A社'})
+
+    def test_add_edit_delete_keep_rollups_in_sync(self):
+        response = self.post_log('2026-04-01', '1', '3000')
+        self.assertFalse(response.context['show_warning'])
+        response = self.post_log('2026-04-01', '0.5', '1000')
+        self.assertTrue(response.context['show_warning'])
+        self.assertEqual(response.context['total_earnings'], 4000)
+        day = worklog_rollups.daily_total(self.user, '2026-04-01')
+        self.assertEqual((day.hours, day.earnings, day.log_count), (1.5, 4000, 2))
+
+        # 日付を移動すると、元の日からは引かれ新しい日に足される
+        log = WorkLog.objects.filter(user=self.user, earnings=1000).get()
+        self.client.post(reverse('edit_work_log', args=[log.pk]), {'date': '2026-04-02', 'hours': '0.5', 'amount': '1000', 'company': 'B社'})
+        self.assertFalse(worklog_rollups.daily_total(self.user, '2026-04-01').is_over_limit)
+        self.assertEqual(worklog_rollups.daily_total(self.user, '2026-04-02').earnings, 1000)
+
+        self.client.get(reverse('delete_work_log', args=[log.pk]))
+        self.assertIsNone(worklog_rollups.daily_total(self.user, '2026-04-02'))
+        self.assertEqual(worklog_rollups.find_drift(), [])
+
+    def test_edits_do_not_accumulate_rounding_error(self):
+        self.post_log('2026-04-01', '0.4', '500')
+        self.post_log('2026-04-01', '1.8', '1000')
+        log = WorkLog.objects.get(user=self.user, hours=0.4)
+        self.client.post(reverse('edit_work_log', args=[log.pk]), {'date': '2026-04-01', 'hours': '0.2', 'amount': '500', 'company': 'A社'})
+        day = worklog_rollups.daily_total(self.user, '2026-04-01')
+        self.assertEqual(day.hours, Decimal('2.00'))
+        self.assertFalse(day.is_over_limit)
+        self.assertEqual(worklog_rollups.find_drift(), [])
+
+    def test_incremental_and_rebuild_round_the_same_way(self):
+        for _ in range(3):
+            self.post_log('2026-04-01', '0.667', '100')
+        self.assertEqual(worklog_rollups.daily_total(self.user, '2026-04-01').hours, Decimal('2.01'))
+        self.assertEqual(worklog_rollups.find_drift(), [])
+        worklog_rollups.rebuild()
+        day = worklog_rollups.daily_total(self.user, '2026-04-01')
+        self.assertEqual(day.hours, Decimal('2.01'))
+        self.assertTrue(day.is_over_limit)
+        # 夜間チェックも同じ合計で判定する
+        flags = compliance.scan_rows(list(WorkLog.objects.values_list('user_id', 'date', 'hours', 'earnings')), {})
+        self.assertEqual([flag.hours for flag in flags if flag.kind == ComplianceFlag.KIND_DAY_LIMIT], [2.01])
+
+    def test_rebuild_command_fixes_drift(self):
+        WorkLog.objects.create(user=self.user, date=datetime.date(2026, 4, 1), hours=3, earnings=500)
+        self.assertEqual(len(worklog_rollups.find_drift()), 1)
+        call_command('rebuild_worklog_rollups', stdout=StringIO())
+        self.assertEqual(worklog_rollups.find_drift(), [])
+        self.assertTrue(WorkLogDailyTotal.objects.get(user=self.user).is_over_limit)
+
+
+
+
+
+# --- User → Member の保存 ---
+class MemberSaveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_login_does_not_touch_member(self):
+        user = self.fresh_user()
+        with CaptureQueriesContext(connection) as queries:
+            update_last_login(None, user)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('steppia_app_member', queries[0]['sql'])
+        # 実際のログインでも Member は読まない
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.client.login(username='hanako', password='pass'))
+        self.assertFalse([q for q in queries if 'steppia_app_member' in q['sql']])
+
+    def test_bulk_user_saves_skip_member(self):
+        users = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pass') for i in range(5)]
+        users = list(User.objects.filter(pk__in=[u.pk for u in users]))
+        with self.assertNumQueries(5):
+            for user in users:
+                user.first_name = '花子'
+                user.save()
+
+    def test_only_changed_columns_are_written(self):
+        user = self.fresh_user()
+        member = user.profile
+        with self.assertNumQueries(0):
+            member.save()
+        member.daily_wage = 8000
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        sql = [q['sql'] for q in queries if 'steppia_app_member' in q['sql']]
+        self.assertEqual(len(sql), 1)
+        self.assertIn('"daily_wage"', sql[0])
+        self.assertNotIn('"email"', sql[0])
+        with self.assertNumQueries(0):
+            member.save()
+
+    def test_stale_instance_keeps_counters(self):
+        member = self.fresh_user().profile
+        progress_counters.add_work_log(self.user.pk, 3)
+        member.first_name = '花子'
+        member.save()
+        member.refresh_from_db()
+        self.assertEqual((member.first_name, member.work_log_count), ('花子', 3))
+        with self.assertNumQueries(0):
+            member.save()
+
+
+
+# --- 会員名簿 ---
+class MemberDirectoryTests(TestCase):
+    def make_member(self, username, last_kana, first_kana, consultant=None):
+        user = User.objects.create_user(username, f'{username}@example.com', 'pass')
+        member = user.profile
+        member.last_name_kana, member.first_name_kana = last_kana, first_kana
+        member.assigned_consultant = consultant
+        member.save()
+        return member
+
+    def test_kana_prefix_search_ignores_script_and_width(self):
+        hanako = self.make_member('hanako', 'ヤマダ', 'ハナコ', '小林 香織')
+        taro = self.make_member('taro', 'やまもと', 'たろう')
+        self.make_member('jiro', 'すずき', 'じろう')
+        self.assertEqual((hanako.last_kana_key, hanako.first_kana_key), ('やまだ', 'はなこ'))
+
+        def search(query, **kwargs):
+            return member_directory.search_members(query, **kwargs)[0]
+
+        self.assertEqual(search('ﾔﾏ'), [hanako, taro])
+        self.assertEqual(search('はな'), [hanako])
+        self.assertEqual(search('ヤマ タ'), [taro])
+        self.assertEqual(search('hanako@example.com'), [hanako])
+        self.assertEqual(search('', consultant='小林 香織'), [hanako])
+
+    def test_keyset_pagination_in_kana_order(self):
+        names = ['あいだ', 'いとう', 'うえだ', 'えんどう', 'おおた', 'かとう', 'きむら']
+        for i, name in enumerate(reversed(names)):
+            self.make_member(f'user{i}', name, 'はなこ')
+        seen, cursor = [], None
+        while True:
+            page, cursor = member_directory.search_members(cursor=cursor, page_size=3)
+            seen.extend(member.last_kana_key for member in page)
+            if not cursor:
+                break
+        self.assertEqual(seen, names)
+        self.assertIsNone(member_directory.decode_cursor('壊れたカーソル'))
+
+    def test_views_are_staff_only_and_share_search(self):
+        self.make_member('hanako', 'やまだ', 'はなこ')
+        self.make_member('jiro', 'すずき', 'じろう')
+        self.client.force_login(User.objects.get(username='hanako'))
+        self.assertEqual(self.client.get(reverse('member_list')).status_code, 302)
+
+        User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.login(username='admin', password='pass')
+        response = self.client.get(reverse('member_list'), {'q': 'ヤマダ'})
+        self.assertEqual([m.last_kana_key for m in response.context['members']], ['やまだ'])
+        response = self.client.get(reverse('admin:steppia_app_member_changelist'), {'q': 'すず'})
+        self.assertEqual([m.last_kana_key for m in response.context['cl'].result_list], ['すずき'])
+
+
+# --- 冒険マップ用の件数 ---
+class ProgressCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        self.client.force_login(self.user)
+        self.job = Job.objects.create(title='一般事務', company='ステッピア商事', location='東京都', salary='', description='')
+
+    def member(self):
+        return Member.objects.get(user=self.user)
+
+    def test_counters_follow_views(self):
+        for day in ('2026-04-01', '2026-04-02'):
+            self.client.post(reverse('work_tracker'), {'date': day, 'hours': '1', 'amount': '1000', 'company': 'A社'})
+        self.client.post(reverse('apply_to_job', args=[self.job.pk]))
+        self.client.post(reverse('apply_to_job', args=[self.job.pk]))   # 2回目は応募済み
+        member = self.member()
+        self.assertEqual((member.work_log_count, member.application_count, member.map_step), (2, 1, 3))
+
+        self.client.post(reverse('delete_work_log', args=[WorkLog.objects.filter(user=self.user).first().pk]))
+        member = self.member()
+        self.assertEqual((member.work_log_count, member.map_step), (1, 2))
+
+    def test_map_step_stops_at_goal(self):
+        progress_counters.add_work_log(self.user.pk, 40)
+        self.assertEqual(self.member().map_step, progress_counters.MAP_STEPS)
+
+    def test_progress_is_one_query(self):
+        progress_counters.add_application(self.user.pk)
+        request = RequestFactory().get(reverse('progress'))
+        request.user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            response = views.progress(request)
+        self.assertEqual(response.status_code, 200)
+
+    def test_reconcile_fixes_drift(self):
+        WorkLog.objects.create(user=self.user, date='2026-04-01', hours=1, earnings=1000)
+        Application.objects.create(user=self.user, job=self.job)
+        self.assertEqual(progress_counters.find_drift(), [(self.user.pk, (0, 0, 1), (1, 1, 2))])
+
+        out = StringIO()
+        call_command('reconcile_progress', '--verify', stdout=out)
+        self.assertIn('1 人分のずれがあります', out.getvalue())
+        call_command('reconcile_progress', stdout=StringIO())
+        self.assertEqual(progress_counters.find_drift(), [])
+        self.assertEqual(self.member().map_step, 2)
+
+
+# --- 失業手当の受給チェック ---
+class ComplianceScanTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        self.other = User.objects.create_user('taro', 'taro@example.com', 'pass')
+        Member.objects.filter(user=self.user).update(daily_wage=8000)
+
+    def log(self, user, day, hours, earnings):
+        return WorkLog.objects.create(user=user, date=day, hours=hours, earnings=earnings, company_name='A社')
+
+    def kinds(self, user):
+        return sorted(ComplianceFlag.objects.filter(user=user).values_list('kind', 'start_date'))
+
+    def test_scan_rows_groups_days_and_weeks(self):
+        d = datetime.date
+        rows = [
+            (1, d(2026, 1, 5), 1.5, 3000), (1, d(2026, 1, 5), 1.0, 1500),   # 同じ日に2件 → 2.5時間
+            (1, d(2026, 1, 6), 1.0, 2000),
+            (2, d(2026, 1, 5), 1.0, 3500),
+        ] + [(2, d(2026, 1, 7) + datetime.timedelta(days=i), 5.0, 1000) for i in range(4)]
+        flags = compliance.scan_rows(rows, {1: 8000, 2: 0})
+        found = sorted((f.user_id, f.kind, f.start_date, f.work_days) for f in flags)
+        self.assertEqual(found, [
+            (1, 'day_limit', d(2026, 1, 5), 1),
+            (1, 'day_reduction', d(2026, 1, 5), 1),
+            (2, 'day_limit', d(2026, 1, 7), 1),
+            (2, 'day_limit', d(2026, 1, 8), 1),
+            (2, 'day_limit', d(2026, 1, 9), 1),
+            (2, 'day_limit', d(2026, 1, 10), 1),
+            (2, 'week_days', d(2026, 1, 5), 5),     # 1/5(月)〜1/11(日)の週に5日・21時間
+            (2, 'week_hours', d(2026, 1, 5), 5),
+        ])
+        week = next(f for f in flags if f.kind == 'week_hours')
+        self.assertEqual((week.end_date, week.hours, week.earnings), (d(2026, 1, 11), 21.0, 7500))
+
+    def test_incremental_run_only_rescans_changed_users(self):
+        over = self.log(self.user, '2026-02-02', 1, 5000)
+        self.log(self.other, '2026-02-02', 3, 1000)
+        run = compliance.run_scan()
+        self.assertTrue(run.is_full)
+        self.assertEqual((run.users, run.log_rows), (2, 2))
+        self.assertEqual(self.kinds(self.user), [('day_limit', datetime.date(2026, 2, 2)), ('day_reduction', datetime.date(2026, 2, 2))])
+        ComplianceFlag.objects.filter(user=self.other).update(is_reviewed=True)
+
+        # 何も変わっていなければ誰も読み直さない
+        run = compliance.run_scan()
+        self.assertFalse(run.is_full)
+        self.assertEqual((run.users, run.log_rows), (0, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            over.earnings = 2000
+            over.save()
+        run = compliance.run_scan()
+        self.assertEqual((run.users, run.log_rows), (1, 1))
+        self.assertEqual(self.kinds(self.user), [])
+        self.assertTrue(ComplianceFlag.objects.get(user=self.other).is_reviewed)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            over.delete()
+            self.log(self.other, '2026-02-03', 25, 30000)
+        run = compliance.run_scan()
+        self.assertEqual(run.users, 2)
+        self.assertEqual([kind for kind, _ in self.kinds(self.other)], ['day_limit', 'day_limit', 'week_hours'])
+        self.assertTrue(ComplianceFlag.objects.get(user=self.other, start_date='2026-02-02', kind='day_limit').is_reviewed)
+
+    def test_write_committed_after_scan_started_is_picked_up_next_time(self):
+        compliance.run_scan()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.log(self.user, '2026-02-02', 1, 5000)
+            # 書き込みのトランザクションがコミットされる前に差分実行が始まった（別の接続ならこのログは見えない）
+            started_at = compliance.run_scan().started_at
+        # 印はコミット後の時刻なので、次の差分実行で読み直される
+        self.assertGreaterEqual(Member.objects.get(user=self.user).worklog_changed_at, started_at)
+        run = compliance.run_scan()
+        self.assertEqual(run.users, 1)
+        self.assertEqual([kind for kind, _ in self.kinds(self.user)], ['day_limit', 'day_reduction'])
+
+    def test_stream_batches_never_split_a_user(self):
+        for i in range(3):
+            self.log(self.user, f'2026-03-0{i + 1}', 1, 100)
+        self.log(self.other, '2026-03-01', 1, 100)
+        batches = list(compliance.stream_batches(WorkLog.objects.all(), chunk_size=2))
+        self.assertEqual([len(b) for b in batches], [3, 1])
+
+
+# --- ルーレット ---
+class RouletteTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        self.client.force_login(self.user)
+
+    def test_spin_once_per_day_and_result_comes_from_server(self):
+        response = self.client.post(reverse('roulette_spin'))
+        item = response.json()['item']
+        self.assertIn(item, roulette.SEGMENTS)
+        self.assertEqual(roulette.SEGMENTS[response.json()['segment']], item)
+        self.assertEqual(self.client.post(reverse('roulette_spin')).status_code, 409)
+
+        # URL の景品名は無視される
+        response = self.client.get(reverse('roulette_result') + '特賞/')
+        self.assertEqual(response.context['item'], item)
+        self.assertEqual(Coupon.objects.filter(user=self.user).count(), int(response.context['is_win']))
+
+    def test_daily_cap_falls_back_to_other_prizes(self):
+        prizes = (roulette.Prize('特賞', weight=100, daily_cap=1), roulette.Prize('ハズレ', weight=1, is_win=False))
+        today = datetime.date(2026, 4, 1)
+        self.assertEqual(roulette.draw(today, prizes).name, '特賞')
+        self.assertEqual(roulette.draw(today, prizes).name, 'ハズレ')
+        self.assertEqual(RouletteDailyStock.objects.get(date=today, prize_name='特賞').awarded, 1)
+
+
+class RouletteConcurrencyTests(TransactionTestCase):
+    MEMBERS = 5
+    THREADS_PER_MEMBER = 8
+
+    def test_parallel_spins_create_one_coupon_per_member(self):
+        users = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pass') for i in range(self.MEMBERS)]
+        prizes = (roulette.Prize('A賞', weight=1), roulette.Prize('特賞', weight=1, daily_cap=self.MEMBERS))
+        barrier = threading.Barrier(self.MEMBERS * self.THREADS_PER_MEMBER)
+        wins = []
+
+        def worker(user):
+            barrier.wait()
+            try:
+                # SQLite は同時書き込みをエラーで返すことがあるので、利用者の再試行と同じく回し直す
+                for _ in range(50):
+                    try:
+                        if roulette.spin(user, prizes=prizes):
+                            wins.append(user.pk)
+                        return
+                    except OperationalError:
+                        continue
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(user,))
+            for user in users for _ in range(self.THREADS_PER_MEMBER)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(wins), sorted(user.pk for user in users))
+        for user in users:
+            self.assertEqual(Coupon.objects.filter(user=user).count(), 1)
+
+
+# --- コンサル予約 ---
+class BookingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        self.other = User.objects.create_user('taro', 'taro@example.com', 'pass')
+        self.consultant = Consultant.objects.get(name='小林 香織')
+        self.monday = booking.week_start(datetime.date.today()) + datetime.timedelta(days=7)
+        booking.generate_slots(self.consultant, self.monday, 7)
+
+    def test_slots_follow_working_hours(self):
+        slots = booking.free_slots(self.consultant, self.monday, self.monday + datetime.timedelta(days=7))
+        # 平日 10:00〜17:00 を30分刻み → 14枠 × 5日
+        self.assertEqual(len(slots), 70)
+        self.assertEqual(slots[0].start_time, datetime.time(10, 0))
+        self.assertEqual(booking.generate_slots(self.consultant, self.monday, 7), 70)
+        self.assertEqual(ConsultSlot.objects.count(), 70)
+
+    def test_book_consumes_coupon_and_rejects_double_booking(self):
+        slot = ConsultSlot.objects.filter(consultant=self.consultant).order_by('date', 'start_time').first()
+        coupon = Coupon.objects.create(user=self.user, prize_name='コンサル面談30分')
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('consult_reservation_done'), {'slot_id': slot.pk, 'coupon_id': coupon.pk})
+        self.assertEqual(response.status_code, 200)
+        coupon.refresh_from_db()
+        self.assertTrue(coupon.is_used)
+        self.assertEqual(Schedule.objects.get(user=self.user).detail, '小林 香織 コンサル予約')
+
+        with self.assertRaises(booking.SlotUnavailable):
+            booking.book(self.other, slot.pk)
+        self.assertFalse(Schedule.objects.filter(user=self.other).exists())
+        self.assertNotIn(slot, booking.free_slots(self.consultant, self.monday, self.monday + datetime.timedelta(days=7)))
+
+    def test_bad_input_is_rejected_not_reported_as_booked(self):
+        slot = ConsultSlot.objects.filter(consultant=self.consultant).first()
+        self.client.force_login(self.user)
+        for data in (
+            {'consultant': '小林 香織', 'date': '', 'time': '10:00'},
+            {'consultant': '小林 香織', 'date': '2026-13-45', 'time': '10:00'},
+            {'slot_id': 'abc'},
+            {'slot_id': slot.pk, 'coupon_id': 'abc'},
+        ):
+            with self.subTest(data=data):
+                response = self.client.post(reverse('consult_reservation_done'), data)
+                self.assertContains(response, '指定が正しくありません', status_code=400)
+        self.assertFalse(Schedule.objects.exists())
+
+    def test_past_slot_cannot_be_booked(self):
+        slot = ConsultSlot.objects.filter(consultant=self.consultant).order_by('date', 'start_time').first()
+        with self.assertRaises(booking.SlotInPast):
+            booking.book(self.user, slot.pk, now=timezone.make_aware(datetime.datetime.combine(slot.date, slot.start_time)))
+        self.assertFalse(Schedule.objects.exists())
+        self.assertIsNone(ConsultSlot.objects.get(pk=slot.pk).schedule)
+
+    def test_reservation_page_lists_free_slots_without_writing(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('consult_reservation'), {'consultant': '小林 香織', 'week': self.monday.isoformat()})
+        self.assertEqual(len(response.context['slots']), 70)
+        # 枠のない先の週を開いても枠は作らない（作るのは generate_consult_slots）
+        later = self.monday + datetime.timedelta(days=70)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('consult_reservation'), {'consultant': '小林 香織', 'week': later.isoformat()})
+        self.assertEqual(response.context['slots'], [])
+        self.assertEqual(ConsultSlot.objects.count(), 70)
+        self.assertFalse([q['sql'] for q in queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))])
+
+
+class BookingConcurrencyTests(TransactionTestCase):
+    def test_parallel_bookings_on_one_slot(self):
+        consultant = Consultant.objects.create(name='テスト 花子')
+        consultant.working_hours.create(weekday=0, start_time=datetime.time(10), end_time=datetime.time(10, 30))
+        monday = booking.week_start(datetime.date.today()) + datetime.timedelta(days=7)
+        booking.generate_slots(consultant, monday, 1)
+        slot = ConsultSlot.objects.get(consultant=consultant)
+        users = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pass') for i in range(8)]
+        barrier = threading.Barrier(len(users))
+        booked = []
+
+        def worker(user):
+            barrier.wait()
+            try:
+                for _ in range(50):
+                    try:
+                        booked.append(booking.book(user, slot.pk))
+                        return
+                    except booking.SlotUnavailable:
+                        return
+                    except OperationalError:
+                        continue
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(booked), 1)
+        self.assertEqual(Schedule.objects.count(), 1)
+        slot.refresh_from_db()
+        self.assertEqual(slot.schedule, booked[0])
+
+
+# --- スケジュールの種類 ---
+class ScheduleKindTests(TestCase):
+    def test_backfill_parses_detail_in_batches(self):
+        migration = importlib.import_module('steppia_app.migrations.0020_backfill_schedule_kind')
+        user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        booked = Schedule.objects.create(user=user, date='2026-01-05', time='10:00', detail='和田 雄一 コンサル予約')
+        unknown = Schedule.objects.create(user=user, date='2026-01-06', time='10:00', detail='担当コンサルタント コンサル予約')
+        personal = Schedule.objects.create(user=user, date='2026-01-07', time='10:00', detail='面接')
+
+        with mock.patch.object(migration, 'BATCH_SIZE', 2):
+            migration.backfill(apps, None)
+
+        booked.refresh_from_db()
+        unknown.refresh_from_db()
+        personal.refresh_from_db()
+        self.assertEqual((booked.kind, booked.consultant.name), (Schedule.KIND_CONSULT, '和田 雄一'))
+        self.assertEqual((unknown.kind, unknown.consultant), (Schedule.KIND_CONSULT, None))
+        self.assertEqual(personal.kind, Schedule.KIND_PERSONAL)
+
+
+# --- ダウンロード ---
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        self.other = User.objects.create_user('taro', 'taro@example.com', 'pass')
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'pass', is_staff=True)
+        WorkLog.objects.create(user=self.user, company_name='A社', date=datetime.date(2026, 4, 1), hours=1.5, earnings=2000)
+        WorkLog.objects.create(user=self.user, company_name='B社', date=datetime.date(2026, 5, 1), hours=1, earnings=1000)
+        WorkLog.objects.create(user=self.other, company_name='C社', date=datetime.date(2026, 4, 2), hours=2, earnings=3000)
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_member_export_contains_only_own_rows(self):
+        self.client.force_login(self.user)
+        body = self.read(self.client.get(reverse('export_my_data', args=['worklogs', 'csv'])))
+        lines = body.lstrip('\ufeff').splitlines()
+        self.assertEqual(lines[0], '就労日,会社名,就労時間,総支給額')
+        self.assertEqual(lines[1:], ['2026-04-01,A社,1.5,2000', '2026-05-01,B社,1.0,1000'])
+        self.assertEqual(self.client.get('/export/secrets.csv').status_code, 404)
+
+    def test_staff_export_filters_by_date_range(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('export_admin_data', args=['worklogs', 'jsonl'])).status_code, 302)
+        self.client.force_login(self.staff)
+        body = self.read(self.client.get(
+            reverse('export_admin_data', args=['worklogs', 'jsonl']), {'start': '2026-04-01', 'end': '2026-04-30'}
+        ))
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['company_name'] for row in rows], ['A社', 'C社'])
+        self.assertEqual(rows[1]['user__username'], 'taro')
+
+    def test_csv_neutralises_formulas(self):
+        WorkLog.objects.create(user=self.user, company_name='=HYPERLINK("http://example.com")', date=datetime.date(2026, 6, 1), hours=1, earnings=500)
+        WorkLog.objects.create(user=self.user, company_name='@SUM(A1)', date=datetime.date(2026, 6, 2), hours=1, earnings=500)
+        self.client.force_login(self.user)
+        body = self.read(self.client.get(reverse('export_my_data', args=['worklogs', 'csv'])))
+        self.assertIn('"\'=HYPERLINK(""http://example.com"")"', body)
+        self.assertIn("'@SUM(A1)", body)
+        # JSON Lines はそのまま
+        body = self.read(self.client.get(reverse('export_my_data', args=['worklogs', 'jsonl'])))
+        self.assertIn('"@SUM(A1)"', body)
+
+    def test_staff_export_rejects_bad_user(self):
+        self.client.force_login(self.staff)
+        url = reverse('export_admin_data', args=['worklogs', 'csv'])
+        self.assertEqual(self.client.get(url, {'user': 'abc'}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'user': '999999'}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'user': self.other.pk}).status_code, 200)
+
+    def test_export_command(self):
+        AIConsultLog.objects.create(user=self.user, user_question='面接', ai_response='笑顔で')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'logs.jsonl'
+            call_command('export_logs', 'consult-logs', '--format', 'jsonl', '--output', str(path))
+            row = json.loads(path.read_text(encoding='utf-8'))
+        self.assertEqual((row['user__username'], row['ai_response']), ('hanako', '笑顔で'))
+
+
+# --- 求人の一括取込 ---
+class JobImportTests(TestCase):
+    FEED = (
+        'external_id,title,company,location,salary,description\n'
+        'J1,一般事務,A社,東京都,月給20万円,データ入力\n'
+        'J2,倉庫スタッフ,B社,大阪府,時給1200円,軽作業\n'
+        'J2,倉庫スタッフ（夜勤）,B社,大阪府,時給1500円,軽作業\n'
+        ',タイトルだけ,C社,,,\n'
+    )
+
+    def run_import(self, feed, fmt='csv', **kwargs):
+        return job_import.import_jobs(job_import.read_feed(StringIO(feed), fmt), **kwargs)
+
+    def test_upsert_and_diff_counts(self):
+        result = self.run_import(self.FEED)
+        self.assertEqual((result.inserted, result.updated, result.unchanged, result.skipped), (2, 0, 0, 1))
+        self.assertEqual(Job.objects.get(external_id='J2').title, '倉庫スタッフ（夜勤）')
+
+        feed = '\n'.join([
+            json.dumps({'external_id': 'J1', 'title': '一般事務', 'company': 'A社', 'location': '東京都', 'salary': '月給20万円', 'description': 'データ入力'}, ensure_ascii=False),
+            json.dumps({'external_id': 'J2', 'title': '介護スタッフ', 'company': 'B社', 'location': '大阪府', 'salary': '時給1500円', 'description': '施設'}, ensure_ascii=False),
+        ])
+        result = self.run_import(feed, 'jsonl')
+        self.assertEqual((result.inserted, result.updated, result.unchanged), (0, 1, 1))
+        self.assertEqual(Job.objects.count(), 2)
+        # 検索インデックスもまとめて更新されている
+        self.assertEqual([job.external_id for job in search_jobs('介護')[0]], ['J2'])
+        self.assertEqual(search_jobs('倉庫')[0], [])
+
+    def test_queries_per_batch_are_bounded(self):
+        feed = 'external_id,title,company,location,salary,description\n' + ''.join(
+            f'K{i},事務スタッフ{i},会社{i},東京都,,\n' for i in range(50)
+        )
+        # 1バッチあたり：既存行の読み出し・upsert・取り直し・索引の削除・索引の挿入（＋セーブポイント）
+        with self.assertNumQueries(5 * 2 + 4 * 2):
+            result = self.run_import(feed, batch_size=25)
+        self.assertEqual((result.inserted, result.batches), (50, 2))
+
+    def test_admin_upload(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(admin_user)
+        upload = SimpleUploadedFile('feed.csv', self.FEED.encode('utf-8-sig'), content_type='text/csv')
+        response = self.client.post(reverse('admin:steppia_app_job_import'), {'feed': upload}, follow=True)
+        self.assertContains(response, '新規 2 件')
+
+    def test_admin_upload_reports_malformed_csv(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(admin_user)
+        # csv モジュールの上限を超える項目は csv.Error になる
+        feed = 'external_id,title\nJ1,"' + 'あ' * (csv.field_size_limit() + 1) + '"\n'
+        upload = SimpleUploadedFile('feed.csv', feed.encode('utf-8'), content_type='text/csv')
+        response = self.client.post(reverse('admin:steppia_app_job_import'), {'feed': upload}, follow=True)
+        self.assertContains(response, '取込に失敗しました')
+        self.assertFalse(Job.objects.exists())
+
+
+# --- 画像の縮小版 ---
+class ResponsiveImageTests(TestCase):
+    def render(self, text):
+        return Template('{% load steppia_images %}' + text).render(Context())
+
+    def test_without_variants_falls_back_to_img(self):
+        html = self.render("{% picture 'images/c_1.png' alt='小林 香織' class='consultant-img' %}")
+        self.assertNotIn('<picture>', html)
+        self.assertIn('src="/static/images/c_1.png" alt="小林 香織" class="consultant-img"', html)
+        self.assertEqual(self.render("{% background_image_set 'images/sakura_bg.png' %}"), 'url("/static/images/sakura_bg.png")')
+
+    def test_collectstatic_builds_hashed_variants(self):
+        source_tmp, root_tmp = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(source_tmp.cleanup)
+        self.addCleanup(root_tmp.cleanup)
+        source_dir, static_root = Path(source_tmp.name), Path(root_tmp.name)
+        (source_dir / 'images').mkdir()
+        Image.new('RGB', (800, 1200), 'pink').save(source_dir / 'images' / 'c_1.png')
+        settings = {
+            'STATICFILES_DIRS': [source_dir], 'STATIC_ROOT': static_root,
+            'STORAGES': {
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'steppia_app.storage.ResponsiveStaticFilesStorage'},
+            },
+        }
+        with override_settings(**settings):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            html = self.render("{% picture 'images/c_1.png' alt='小林 香織' sizes='100px' %}")
+
+        self.assertIn('<picture><source type="image/', html)
+        webp = sorted((static_root / 'images' / 'responsive').glob('c_1-320w.*.webp'))
+        self.assertEqual(len(webp), 1)
+        self.assertIn(f'/static/images/responsive/{webp[0].name} 320w', html)
+        with Image.open(webp[0]) as image:
+            self.assertEqual(image.size, (320, 480))
+        # 元の画像は <img> のまま残る（縮小版に対応していないブラウザ向け）
+        self.assertRegex(html, r'<img src="/static/images/c_1\.[0-9a-f]{12}\.png" alt="小林 香織"')
+
+
+# --- 条件付き GET（ETag / Last-Modified） ---
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        self.job = Job.objects.create(title='一般事務', company='A社', location='東京都', salary='', description='')
+
+    def get(self, view, *args, **headers):
+        request = RequestFactory().get('/', **headers)
+        request.user = self.user
+        return view(request, *args)
+
+    def test_304_skips_rendering_with_one_query(self):
+        for view, args in ((views.job_detail, (self.job.pk,)), (views.job_list, ()), (views.schedule, ())):
+            with self.subTest(view=view.__name__):
+                etag = self.get(view, *args)['ETag']
+                with mock.patch.object(views, 'render') as render, self.assertNumQueries(1):
+                    response = self.get(view, *args, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                render.assert_not_called()
+                self.assertIn('private', response['Cache-Control'])
+
+    def test_job_list_etag_never_computes_recommendations(self):
+        Application.objects.create(user=self.user, job=Job.objects.create(
+            title='経理事務', company='B社', location='東京都', salary='', description='',
+        ))
+        recommend.engine.rebuild()
+        self.addCleanup(recommend.engine.reset)
+        etag = self.get(views.job_list)['ETag']
+
+        # おすすめのキャッシュが冷えていても、304 のためにおすすめを計算しない（集計1本だけ）
+        cache.delete(recommend.cache_key(self.user.pk))
+        with mock.patch.object(recommend.engine, 'top_k') as top_k, self.assertNumQueries(1):
+            response = self.get(views.job_list, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        top_k.assert_not_called()
+
+        # 応募・相談が変わるとおすすめの世代が進み、描き直したページが返る
+        recommend.invalidate(self.user.pk)
+        self.assertEqual(self.get(views.job_list, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_changes_update_etag_and_last_modified(self):
+        first = self.get(views.job_detail, self.job.pk)
+        self.job.title = '倉庫スタッフ'
+        self.job.save(update_fields=['title'])
+        response = self.get(views.job_detail, self.job.pk, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertContains(response, '倉庫スタッフ')
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+        schedule = Schedule.objects.create(user=self.user, date='2026-01-05', time='10:00', detail='面接')
+        etag = self.get(views.schedule)['ETag']
+        schedule.delete()
+        self.assertEqual(self.get(views.schedule, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_anonymous_revalidates_against_page_cache(self):
+        url = reverse('job_list')
+        response = self.client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=60', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        # 304 はキャッシュに入らない
+        self.assertContains(self.client.get(url), '一般事務')
+
+
+# --- 負荷計測 ---
+class BenchmarkTests(TestCase):
+    def test_seed_scale_keeps_derived_data_consistent(self):
+        call_command('seed_scale', members=5, work_logs=40, consult_logs=10, jobs=6, applications=8, stdout=StringIO())
+        self.assertEqual(Member.objects.filter(user__username__startswith='seed-').count(), 5)
+        self.assertEqual((WorkLog.objects.count(), AIConsultLog.objects.count(), Application.objects.count()), (40, 10, 8))
+        self.assertEqual(Job.objects.exclude(salary_unit='').count(), 6)
+        self.assertTrue(JobSearchToken.objects.exists())
+        self.assertEqual(progress_counters.find_drift(), [])
+        self.assertEqual(worklog_rollups.find_drift(), [])
+        self.assertEqual(Member.objects.filter(last_kana_key='').count(), 0)
+        with self.assertRaises(CommandError):
+            call_command('seed_scale', members=1, work_logs=0, consult_logs=0, jobs=0, applications=0, stdout=StringIO())
+
+    def test_run_measures_endpoints_and_compares(self):
+        call_command('seed_scale', members=3, work_logs=20, consult_logs=5, jobs=4, applications=3, stdout=StringIO())
+        results = benchmark.run(only={'mypage', 'job_detail', 'apply_to_job', 'member_list'}, iterations=3, warmup=0)
+        self.assertEqual(set(results['endpoints']), {'mypage', 'job_detail'})
+        self.assertEqual(set(results['skipped']), {'apply_to_job', 'member_list'})
+        mypage = results['endpoints']['mypage']
+        self.assertEqual(mypage['status'], 200)
+        self.assertLessEqual(mypage['p50_ms'], mypage['p99_ms'])
+        self.assertGreater(mypage['cold_queries'], mypage['queries'])
+        self.assertEqual(results['meta']['rows']['work_logs'], 20)
+        # JSON に書けて、前回と比べられる
+        before = json.loads(json.dumps(results))
+        self.assertEqual([row[0] for row in benchmark.compare(before, results)], ['job_detail', 'mypage'])
+
+    def test_measured_urls_do_not_write(self):
+        # GET で書き込む URL は SKIP に入れる（計測のたびにデータが増えたり変わったりしないように）
+        call_command('seed_scale', members=2, work_logs=10, consult_logs=3, jobs=3, applications=2, stdout=StringIO())
+        staff = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        member = benchmark.default_member()
+        clients = {}
+        for key, path, user, reason in benchmark.endpoints(member, staff):
+            if reason is not None:
+                continue
+            client = clients.get(user)
+            if client is None:
+                client = clients[user] = Client(raise_request_exception=False)
+                client.force_login(user)
+            with self.subTest(view=key), CaptureQueriesContext(connection) as queries:
+                response = client.get(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                writes = [q['sql'] for q in queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+                self.assertEqual([sql for sql in writes if 'django_session' not in sql], [])
+
+    def test_refuses_to_clear_a_shared_cache(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+            'BACKEND': 'steppia_app.cache_backends.FileBasedCache', 'LOCATION': directory,
+        }}):
+            with self.assertRaises(ImproperlyConfigured):
+                benchmark.measure(Client(), '/', iterations=1, warmup=0)
+            with self.assertRaises(CommandError):
+                call_command('bench_endpoints', only=['top'], stdout=StringIO())
+
+
+# --- SQL の計測とクエリ予算 ---
+class SQLBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        self.staff = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        for i in range(5):
+            job = Job.objects.create(title=f'事務{i}', company=f'会社{i}', location='東京都', salary='時給1200円', description='')
+            Application.objects.create(user=self.user, job=job)
+            WorkLog.objects.create(user=self.user, job=job, company_name=f'会社{i}', date=f'2026-01-0{i + 1}', hours=4, earnings=4800)
+            AIConsultLog.objects.create(user=self.user, user_question='面接', ai_response='笑顔で')
+            Schedule.objects.create(user=self.user, date=f'2026-02-0{i + 1}', time='10:00', detail='面接')
+
+    def test_fingerprint_ignores_values(self):
+        self.assertEqual(
+            sql_budget.fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = \'a\' LIMIT 21'),
+            sql_budget.fingerprint('SELECT *  FROM t WHERE id IN (%s) AND name = \'b\' LIMIT 1'),
+        )
+
+    def test_server_timing_and_log_line(self):
+        self.client.force_login(self.user)
+        with self.assertLogs('steppia_app.requests', 'INFO') as logs:
+            response = self.client.get(reverse('progress'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((record['view'], record['status'], record['budget']), ('progress', 200, 3))
+        self.assertEqual(record['queries'], response.wsgi_request.sql_stats.queries)
+        self.assertGreater(record['tpl_ms'], 0)
+
+    def test_strict_for_whole_test_run(self):
+        # どのテストクラスでも予算超えが失敗になり、リクエストのログはテストの出力に出ない
+        self.assertTrue(sql_budget.config()['STRICT'])
+        self.assertFalse(sql_budget.logger.handlers)
+
+    def test_over_budget_fails_when_strict(self):
+        self.client.force_login(self.user)
+        with mock.patch.object(views.progress, 'query_budget', 1), self.assertLogs('steppia_app.requests', 'WARNING'):
+            with self.assertRaises(sql_budget.QueryBudgetExceeded):
+                self.client.get(reverse('progress'))
+
+    def test_admin_application_list_has_no_repeated_queries(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('admin:steppia_app_application_changelist'))
+        self.assertContains(response, '会社4')
+        self.assertEqual(
+            [sql for sql, count in response.wsgi_request.sql_stats.duplicates() if 'steppia_app_job' in sql or 'auth_user' in sql],
+            [],
+        )
+
+    def test_budgeted_views_stay_within_budget(self):
+        checked = []
+        for key, path, user, reason in benchmark.endpoints(self.user, self.staff):
+            view = next(pattern.callback for pattern in urls.urlpatterns if (pattern.name or str(pattern.pattern)) == key)
+            if reason is not None or not hasattr(view, 'query_budget'):
+                continue
+            with self.subTest(view=key):
+                cache.clear()
+                self.client.force_login(user)
+                # 予算を超えると STRICT なので QueryBudgetExceeded で失敗する
+                self.assertLess(self.client.get(path).status_code, 500)
+                checked.append(key)
+        self.assertIn('mypage', checked)
+        self.assertIn('member_list', checked)
+
+
+# --- サンプリングプロファイラー ---
+class ProfilingTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name)
+        self.staff = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+
+    def settings(self, **options):
+        return override_settings(PROFILING={'ENABLED': True, 'DIR': self.directory, **options})
+
+    def test_header_token_from_staff_triggers_profile(self):
+        with self.settings():
+            self.client.force_login(self.user)
+            self.client.get(reverse('progress'))
+            self.client.get(reverse('progress'), HTTP_X_STEPPIA_PROFILE=profiling.make_token(self.user))
+            self.client.get(reverse('progress'), HTTP_X_STEPPIA_PROFILE='forged')
+            self.assertEqual(profiling.list_profiles(), [])
+
+            self.client.get(reverse('progress'), HTTP_X_STEPPIA_PROFILE=profiling.make_token(self.staff))
+            [profile] = profiling.list_profiles()
+        self.assertEqual((profile['view'], profile['trigger'], profile['user'], profile['status']), ('progress', 'header', self.user.pk, 200))
+        self.assertTrue((self.directory / f"{profile['name']}.prof").exists())
+
+    def test_sampling_keeps_a_bounded_ring(self):
+        with self.settings(SAMPLE_EVERY=2, MAX_PROFILES=3):
+            for _ in range(10):
+                self.client.get(reverse('roulette_lost'))
+            profiles = profiling.list_profiles()
+        self.assertEqual(len(profiles), 3)
+        self.assertEqual(len(list(self.directory.glob('*.prof'))), 3)
+        self.assertEqual({profile['trigger'] for profile in profiles}, {'sample'})
+
+    def test_disabled_middleware_is_removed(self):
+        with override_settings(PROFILING={'ENABLED': False, 'DIR': self.directory}):
+            with self.assertRaises(MiddlewareNotUsed):
+                profiling.ProfilingMiddleware(lambda request: None)
+
+    def test_staff_pages(self):
+        with self.settings(SAMPLE_EVERY=1):
+            self.client.force_login(self.user)
+            self.client.get(reverse('progress'))
+            self.assertEqual(self.client.get(reverse('profile_list')).status_code, 302)
+
+            self.client.force_login(self.staff)
+            response = self.client.get(reverse('profile_list'), {'view': 'progress', 'sort': 'ms'})
+            self.assertContains(response, 'X-Steppia-Profile:')
+            name = response.context['profiles'][0]['name']
+            self.assertContains(self.client.get(reverse('profile_detail', args=[name])), 'cumulative')
+            download = self.client.get(reverse('profile_detail', args=[name]), {'download': 1})
+            self.assertEqual(download['Content-Disposition'], f'attachment; filename="{name}.prof"')
+            self.assertEqual(self.client.get(reverse('profile_detail', args=['..'])).status_code, 404)
+
+
+# --- Prometheus のメトリクス ---
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        self.staff = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+
+    def sample(self, metric, **labels):
+        return REGISTRY.get_sample_value(metric, labels) or 0
+
+    def test_endpoint_requires_token_or_staff(self):
+        self.assertEqual(self.client.get(reverse('prometheus_metrics')).status_code, 401)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get(reverse('prometheus_metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+            response = self.client.get(reverse('prometheus_metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('steppia_request_duration_seconds_bucket', response.content.decode())
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('prometheus_metrics')).status_code, 401)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('prometheus_metrics')).status_code, 200)
+
+    def test_latency_and_db_time_per_view(self):
+        count = self.sample('steppia_request_duration_seconds_count', view='job_list', method='GET')
+        queries = self.sample('steppia_db_queries_total', view='job_list')
+        self.client.get(reverse('job_list'))
+        self.client.get('/no-such-page/')
+        self.assertEqual(self.sample('steppia_request_duration_seconds_count', view='job_list', method='GET'), count + 1)
+        self.assertGreater(self.sample('steppia_db_queries_total', view='job_list'), queries)
+        self.assertGreater(self.sample('steppia_request_duration_seconds_count', view='unmatched', method='GET'), 0)
+
+    def test_cache_and_business_counters(self):
+        misses = self.sample('steppia_cache_requests_total', kind='page', name='job_list', result='miss')
+        hits = self.sample('steppia_cache_requests_total', kind='page', name='job_list', result='hit')
+        self.client.get(reverse('job_list'))
+        self.client.get(reverse('job_list'))
+        self.assertEqual(self.sample('steppia_cache_requests_total', kind='page', name='job_list', result='miss'), misses + 1)
+        self.assertEqual(self.sample('steppia_cache_requests_total', kind='page', name='job_list', result='hit'), hits + 1)
+
+        consult.matcher.load()
+        self.client.force_login(self.user)
+        before = {source: self.sample('steppia_consultations_total', source=source) for source in ('faq', 'fallback')}
+        self.client.post(reverse('ai_consult'), {'user_input': 'ブランクが長いです'})
+        self.client.post(reverse('ai_consult'), {'user_input': '天気'})
+        self.assertEqual(self.sample('steppia_consultations_total', source='faq'), before['faq'] + 1)
+        self.assertEqual(self.sample('steppia_consultations_total', source='fallback'), before['fallback'] + 1)
+
+        spins = self.sample('steppia_roulette_spins_total', result='win') + self.sample('steppia_roulette_spins_total', result='lose')
+        self.client.post(reverse('roulette_spin'))
+        self.client.post(reverse('roulette_spin'))   # 2回目は断られるので数えない
+        self.assertEqual(
+            self.sample('steppia_roulette_spins_total', result='win') + self.sample('steppia_roulette_spins_total', result='lose'),
+            spins + 1,
+        )
+
+        job = Job.objects.create(title='一般事務', company='ステッピア商事', location='東京都', salary='', description='')
+        applications = self.sample('steppia_applications_created_total')
+        self.client.post(reverse('apply_to_job', args=[job.pk]))
+        self.client.post(reverse('apply_to_job', args=[job.pk]))   # 応募済み
+        self.assertEqual(self.sample('steppia_applications_created_total'), applications + 1)
+
+        created = self.sample('steppia_work_logs_written_total', action='create')
+        deleted = self.sample('steppia_work_logs_written_total', action='delete')
+        self.client.post(reverse('work_tracker'), {'date': '2026-04-01', 'hours': '1', 'amount': '1000', 'company': 'A社'})
+        self.client.post(reverse('delete_work_log', args=[WorkLog.objects.get(user=self.user).pk]))
+        self.assertEqual(self.sample('steppia_work_logs_written_total', action='create'), created + 1)
+        self.assertEqual(self.sample('steppia_work_logs_written_total', action='delete'), deleted + 1)
+
+    def test_multiprocess_mode_sums_workers(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        worker = "from steppia_app import metrics; metrics.APPLICATIONS.inc(); metrics.CONSULTATIONS.labels('faq').inc(2)"
+        for _ in range(2):
+            subprocess.run(
+                [sys.executable, '-c', worker], cwd=settings.BASE_DIR, check=True,
+                env={**os.environ, 'PROMETHEUS_MULTIPROC_DIR': tmp.name},
+            )
+        with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': tmp.name}):
+            text = metrics.exposition().decode()
+        self.assertIn('steppia_applications_created_total 2.0', text)
+        self.assertIn('steppia_consultations_total{source="faq"} 4.0', text)
+
+
+# --- インデックスと実行計画 ---
+class ExplainTests(TestCase):
+    def test_per_user_lists_use_composite_indexes(self):
+        user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        other = User.objects.create_user('taro', 'taro@example.com', 'pass')
+        for owner in (user, other):
+            for day in range(1, 4):
+                WorkLog.objects.create(user=owner, date=f'2026-04-0{day}', hours=1, earnings=1000)
+            AIConsultLog.objects.create(user=owner, user_question='面接', ai_response='がんばりましょう')
+            Coupon.objects.create(user=owner, prize_name='A賞')
+
+        results = explain.run(member=user, only={'work_tracker', 'mypage'})
+        plans = {
+            table: report for reports in results.values() for report in reports
+            for table in ('worklog', 'aiconsultlog', 'coupon') if f'FROM "steppia_app_{table}"' in report['sql']
+        }
+        for table, index in [
+            ('worklog', 'worklog_user_date_idx'),
+            ('aiconsultlog', 'aiconsultlog_user_created_idx'),
+            ('coupon', 'coupon_unused_user_won_idx'),
+        ]:
+            with self.subTest(table=table):
+                self.assertIn(index, '\n'.join(plans[table]['plan']))
+                self.assertFalse(plans[table]['sort'])
+                self.assertEqual(plans[table]['full_scans'], [])
+
+    def test_analyse_postgresql_plan(self):
+        plan = [
+            'Sort  (cost=10.1..10.2 rows=3 width=40)',
+            '  Sort Key: won_at DESC',
+            '  ->  Seq Scan on steppia_app_coupon  (cost=0.00..10.00 rows=3 width=40)',
+        ]
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            self.assertEqual(explain.analyse(plan), {'index': False, 'full_scans': ['steppia_app_coupon'], 'sort': True})
+            self.assertEqual(
+                explain.analyse(['Index Scan using coupon_unused_user_won_idx on steppia_app_coupon  (cost=0.15..8.17 rows=1 width=40)']),
+                {'index': True, 'full_scans': [], 'sort': False},
+            )
+
+    def test_command_reports_each_view(self):
+        out = StringIO()
+        call_command('explain_queries', '--only', 'job_list', stdout=out)
+        self.assertIn('job_list', out.getvalue())
+
+
+# --- 非同期（ASGI）版の画面 ---
+# ASYNC_VIEWS=1 のときの URLconf（urls.py と同じく async_views.swap で差し替える）
+ASYNC_URLCONF = ModuleType('async_urls')
+ASYNC_URLCONF.urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('', include(async_views.swap(urls.urlpatterns))),
+]
+
+
+@override_settings(SQL_BUDGET={'STRICT': True})
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cache_policy.reset_stats()
+        self.user = User.objects.create_user('hanako', 'hanako@example.com', 'pass')
+        self.job = Job.objects.create(title='一般事務', company='ステッピア商事', location='東京都', salary='時給1200円', description='')
+        Application.objects.create(user=self.user, job=self.job)
+        AIConsultLog.objects.create(user=self.user, user_question='面接', ai_response='がんばりましょう')
+        Schedule.objects.create(user=self.user, date='2026-05-01', time='10:00', detail='面接', kind=Schedule.KIND_CONSULT)
+        Coupon.objects.create(user=self.user, prize_name='A賞')
+        self.paths = [
+            reverse('mypage'), reverse('progress'), reverse('job_list'), reverse('job_detail', args=[self.job.pk]),
+            reverse('schedule'),
+        ]
+
+    def get_async(self, path, **extra):
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            return async_to_sync(self.async_client.get)(path, **extra)
+
+    def strip_csrf(self, content):
+        return re.sub(rb'name="csrfmiddlewaretoken" value="[^"]+"', b'', content)
+
+    def test_urls_swap_only_read_views(self):
+        swapped = {p.name: p.callback for p in async_views.swap(urls.urlpatterns) if getattr(p, 'name', None)}
+        for name in async_views.VIEWS:
+            self.assertTrue(iscoroutinefunction(swapped[name]), name)
+        self.assertIs(swapped['work_tracker'], views.work_tracker)
+
+    def test_pages_match_sync_versions_within_budget(self):
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+        for path in self.paths:
+            with self.subTest(path=path):
+                cache.clear()
+                expected = self.client.get(path)
+                cache.clear()
+                response = self.get_async(path)
+                self.assertEqual(response.status_code, 200)
+                with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+                    self.assertTrue(iscoroutinefunction(response.resolver_match.func))
+                self.assertEqual(self.strip_csrf(response.content), self.strip_csrf(expected.content))
+                self.assertEqual(response.get('Cache-Control'), expected.get('Cache-Control'))
+                # 非同期の ORM が別スレッドで発行した SQL も数えられている
+                self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+    def test_anonymous_cache_and_conditional_get(self):
+        first = self.get_async(reverse('job_list'))
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.get_async(reverse('job_list'), headers={'If-None-Match': first['ETag']}).status_code, 304)
+        self.assertEqual(cache_policy.stats()['pages']['job_list']['hits'], 1)
+        self.assertEqual(self.get_async(reverse('mypage')).status_code, 302)
+
+    def test_schedule_post(self):
+        self.async_client.force_login(self.user)
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            response = async_to_sync(self.async_client.post)(
+                reverse('schedule'), {'date': '2026-06-01', 'time': '13:00', 'detail': '説明会'},
+            )
+        self.assertContains(response, '説明会')
+        self.assertTrue(Schedule.objects.filter(user=self.user, detail='説明会').exists())
+
+    def test_async_snapshot_matches_sync(self):
+        self.assertEqual(async_to_sync(dashboard.abuild_snapshot)(self.user), dashboard.build_snapshot(self.user))
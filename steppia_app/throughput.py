@@ -0,0 +1,164 @@
+"""WSGI と ASGI のスループット比較（bench_throughput コマンド）
+
+seed_scale で作ったデータベースを見る gunicorn を2通りに起動し、非同期版のある画面（async_views.VIEWS）を
+同時接続 N 本で叩いて、1秒あたりの応答数と応答時間の p50 / p95 を比べます。
+
+・wsgi … gunicorn config.wsgi（gunicorn.conf.py。同期ワーカー、同期版の画面）
+・asgi … gunicorn config.asgi -c gunicorn_asgi.conf.py（uvicorn のワーカー、ASYNC_VIEWS=1 で非同期版の画面）
+
+ワーカー数はどちらも同じにします。SQLite では SQL の待ち時間がほとんどないので差は出にくく、
+ネットワーク越しの PostgreSQL（DATABASE_URL）で測ると、SQL を待つ間に他のリクエストを処理できる分の差が出ます。
+負荷をかける側もこのプロセスのスレッドなので、1台で測るときは concurrency を上げすぎないでください。
+"""
+import http.client
+import itertools
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+
+from . import async_views, benchmark
+
+MODES = {
+    'wsgi': ['config.wsgi', '-c', 'gunicorn.conf.py'],
+    'asgi': ['config.asgi', '-c', 'gunicorn_asgi.conf.py'],
+}
+HOST = '127.0.0.1'
+
+
+def session_cookie(user):
+    """user でログインしたセッションの Cookie ヘッダー（セッションは DB にあるので gunicorn からも読める）"""
+    client = Client()
+    client.force_login(user)
+    return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+def _wait(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn が終了しました（終了コード {process.returncode}）")
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{timeout} 秒たっても gunicorn がポート {port} で待ち受けません")
+
+
+@contextmanager
+def server(mode, port, workers):
+    """gunicorn を mode（'wsgi' / 'asgi'）で起動し、終わったら止める"""
+    with tempfile.TemporaryDirectory() as metrics_dir:
+        env = {key: value for key, value in os.environ.items() if key != 'ASYNC_VIEWS'}
+        # 本番のメトリクスのディレクトリを消さないように、計測用のものを使う
+        env['PROMETHEUS_MULTIPROC_DIR'] = metrics_dir
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *MODES[mode], '--workers', str(workers),
+             '--bind', f'{HOST}:{port}', '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        try:
+            _wait(port, process)
+            yield
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+def load(port, path, cookie=None, concurrency=16, requests=400, host=HOST):
+    """同時 concurrency 本で path を合計 requests 回 GET して、1秒あたりの応答数と p50 / p95 を返す（200 以外は失敗）"""
+    counter = itertools.count()
+    timings, errors = [], []
+    headers = {'Cookie': cookie} if cookie else {}
+
+    def worker():
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        while next(counter) < requests:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+                status = type(exc).__name__
+            if status == 200:
+                timings.append(time.perf_counter() - start)
+            else:
+                errors.append(status)
+        conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    cuts = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else (timings or [0.0]) * 99
+    return {
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(cuts[49] * 1000, 2),
+        'p95_ms': round(cuts[94] * 1000, 2),
+        'errors': len(errors),
+        'error_statuses': sorted({str(status) for status in errors}),
+    }
+
+
+def run(member=None, workers=2, concurrency=16, requests=400, warmup=10, only=None, port=8765, progress=None):
+    """wsgi と asgi のそれぞれで各画面を計測して、JSON にそのまま書ける辞書を返す"""
+    if member is None:
+        member = benchmark.default_member()
+    cookie = session_cookie(member)
+    paths = {
+        key: path for key, path, user, reason in benchmark.endpoints(member, None)
+        if key in async_views.VIEWS and reason is None and (not only or key in only)
+    }
+    results = {}
+    for mode in MODES:
+        results[mode] = {}
+        with server(mode, port, workers):
+            for key, path in paths.items():
+                load(port, path, cookie, concurrency=1, requests=warmup)
+                results[mode][key] = load(port, path, cookie, concurrency=concurrency, requests=requests)
+                if progress is not None:
+                    progress(mode, key, results[mode][key])
+    return {
+        'meta': {
+            'commit': benchmark.current_commit(),
+            'started_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'member': member.username,
+            'workers': workers,
+            'concurrency': concurrency,
+            'requests': requests,
+        },
+        'paths': paths,
+        'results': results,
+    }
+
+
+def compare(results):
+    """[(キー, wsgi の req/s, asgi の req/s, 変化率%, wsgi の p95, asgi の p95)]"""
+    rows = []
+    for key, wsgi in results['wsgi'].items():
+        asgi = results['asgi'].get(key)
+        if asgi is None:
+            continue
+        change = (asgi['rps'] - wsgi['rps']) / wsgi['rps'] * 100 if wsgi['rps'] else 0.0
+        rows.append((key, wsgi['rps'], asgi['rps'], round(change, 1), wsgi['p95_ms'], asgi['p95_ms']))
+    return rows
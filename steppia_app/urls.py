@@ -1,8 +1,9 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth.views import LoginView, LogoutView
 from django.contrib.auth.models import User
 from django.http import HttpResponse
-from . import views
+from . import async_views, views
 
 # 🆕 緊急用：ユーザーを強制作成する関数（そのまま維持）
 def make_user(request):
@@ -62,6 +63,26 @@ urlpatterns = [
 
     # --- 8. ルーレット ---
     path('roulette/', views.roulette, name='roulette'),
-    path('roulette/result/<str:item>/', views.roulette_result, name='roulette_result'),
+    path('roulette/spin/', views.roulette_spin, name='roulette_spin'),
+    path('roulette/result/', views.roulette_result, name='roulette_result'),
+    path('roulette/result/<str:item>/', views.roulette_result),
     path('roulette-lost/', views.roulette_lost, name='roulette_lost'),
-]
\ No newline at end of file
+
+    # --- 9. データのダウンロード ---
+    path('export/<str:dataset>.<str:fmt>', views.export_my_data, name='export_my_data'),
+    path('staff/export/<str:dataset>.<str:fmt>', views.export_admin_data, name='export_admin_data'),
+
+    # --- 10. キャッシュの状況（スタッフ用） ---
+    path('staff/cache-stats/', views.cache_stats, name='cache_stats'),
+
+    # --- 11. プロファイル（スタッフ用） ---
+    path('staff/profiles/', views.profile_list, name='profile_list'),
+    path('staff/profiles/<str:name>/', views.profile_detail, name='profile_detail'),
+
+    # --- 12. メトリクス（Prometheus 用） ---
+    path('metrics/', views.prometheus_metrics, name='prometheus_metrics'),
+]
+
+# 🆕 ASGI で動かすとき（settings.ASYNC_VIEWS）は、読み出しの多い画面を非同期版にする
+if settings.ASYNC_VIEWS:
+    urlpatterns = async_views.swap(urlpatterns)
@@ -1,20 +1,37 @@
+import datetime
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.conf import settings
 from django.utils import timezone
-from django.http import JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth import login
 from django.contrib.auth.forms import UserCreationForm
-from django.db.models import Sum
+from django.db import transaction
+from django.core.exceptions import ValidationError
 from django.views.decorators.cache import never_cache
-import pytz
+from django.views.decorators.http import require_POST
 
 # すべてのモデルをインポート
 from .models import (
     Schedule, Member, Job, AIConsultTemplate, 
-    AIConsultLog, Application, WorkLog, Coupon
+    AIConsultLog, Application, WorkLog, WorkLogDailyTotal, Coupon
 )
+from . import booking, cache_policy, exports, metrics, profiling, member_directory, progress_counters, recommend, roulette as roulette_engine, salary as salary_parser, worklog_rollups
+from .conditional import conditional_page, job_detail_state, job_list_state, schedule_state
+from .search import search_jobs
+from .sql_budget import query_budget
+from .consult import matcher as consult_matcher
+from .consult_log import log_consultation
+from .dashboard import get_snapshot, invalidate as invalidate_dashboard
 
 # --- 1. 基本・メニュー ---
+@query_budget(2)
+@cache_policy.anonymous_page('top')
 def top(request):
     """トップ画面"""
     return render(request, 'steppia_app/top.html')
@@ -65,16 +82,65 @@ def signup_done(request):
         member.save()
     return render(request, 'steppia_app/signup_done.html')
 
-@login_required
+@query_budget(4)
+@staff_member_required
 def member_list(request):
-    members = Member.objects.all()
-    return render(request, 'steppia_app/member_list.html', {'members': members})
+    """会員名簿：?q= でふりがな検索、?consultant= で担当者の絞り込み、?cursor= で次のページへ"""
+    query = request.GET.get('q', '').strip()
+    consultant = request.GET.get('consultant', '')
+    members, next_cursor = member_directory.search_members(query, consultant, request.GET.get('cursor'))
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    return render(request, 'steppia_app/member_list.html', {
+        'members': members, 'query': query, 'consultant': consultant, 'next_cursor': next_cursor,
+        'consultants': member_directory.consultant_names(), 'filter_query': params.urlencode(),
+    })
 
 # --- 3. 求人・応募機能 ---
+@query_budget(8)
+@cache_policy.anonymous_page('job_list')
+@conditional_page(job_list_state)
 def job_list(request):
-    jobs = Job.objects.all()
-    return render(request, 'steppia_app/job_list.html', {'jobs': jobs})
+    """求人一覧：?q= でキーワード検索、?unit=&min_pay=&max_pay= で給与の絞り込み、?sort=salary で給与順、?cursor= で次のページへ"""
+    search, context, show_recommended = job_list_filters(request)
+    jobs, next_cursor = search_jobs(**search)
+    recommended = recommend.for_user(request.user) if show_recommended else []
+    return render(request, 'steppia_app/job_list.html', dict(
+        context, jobs=jobs, next_cursor=next_cursor, recommended_jobs=recommended,
+    ))
+
+def _parse_pay(value):
+    try:
+        return int((value or '').replace(',', ''))
+    except ValueError:
+        return None
+
+def job_list_filters(request):
+    """求人一覧の条件を読んで (search_jobs の引数, テンプレートの値, おすすめ求人を出すか) を返す（async_views と共用）"""
+    query = request.GET.get('q', '').strip()
+    unit = request.GET.get('unit', '')
+    if unit not in dict(salary_parser.UNIT_CHOICES):
+        unit = ''
+    min_pay, max_pay = (_parse_pay(request.GET.get(name)) for name in ('min_pay', 'max_pay'))
+    sort = 'salary' if request.GET.get('sort') == 'salary' and unit else ''
+    search = {
+        'query': query, 'cursor': request.GET.get('cursor'), 'unit': unit or None,
+        'min_pay': min_pay, 'max_pay': max_pay, 'sort': sort,
+    }
 
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    context = {
+        'query': query, 'unit': unit, 'min_pay': min_pay, 'max_pay': max_pay, 'sort': sort,
+        'unit_choices': salary_parser.UNIT_CHOICES,
+        'filter_query': params.urlencode(),
+    }
+    # おすすめ求人は、ログイン中に条件なしで一覧を開いたときだけ出す
+    return search, context, request.user.is_authenticated and not params
+
+@query_budget(4)
+@cache_policy.anonymous_page('job_detail')
+@conditional_page(job_detail_state)
 def job_detail(request, pk):
     job = get_object_or_404(Job, pk=pk)
     return render(request, 'steppia_app/job_detail.html', {'job': job})
@@ -82,9 +148,15 @@ def job_detail(request, pk):
 @login_required
 def apply_to_job(request, pk):
     job = get_object_or_404(Job, pk=pk)
-    Application.objects.get_or_create(user=request.user, job=job)
+    with transaction.atomic():
+        _, created = Application.objects.get_or_create(user=request.user, job=job)
+        if created:
+            progress_counters.add_application(request.user.pk)
+    if created:
+        metrics.APPLICATIONS.inc()
     return redirect('apply_done')
 
+@query_budget(3)
 def apply_done(request):
     """応募完了画面：保存された担当者名を優先表示"""
     member = request.user.profile if request.user.is_authenticated else None
@@ -92,6 +164,7 @@ def apply_done(request):
     return render(request, 'steppia_app/apply_done.html', {'consultant_name': consultant_name})
 
 # --- 4. お仕事ログ ---
+@query_budget(4)
 @login_required
 def work_tracker(request):
     show_warning = False
@@ -101,24 +174,30 @@ def work_tracker(request):
         amount = request.POST.get('amount')
         company = request.POST.get('company')
         if date_str and amount:
-            WorkLog.objects.create(
-                user=request.user,
-                company_name=company if company else "（未入力）",
-                date=date_str,
-                hours=float(hours) if hours else 0,
-                earnings=int(amount)
-            )
-            stats = WorkLog.objects.filter(user=request.user, date=date_str).aggregate(
-                total_pay=Sum('earnings'), total_hrs=Sum('hours')
-            )
-            if (stats['total_pay'] or 0) >= 4000 or (stats['total_hrs'] or 0) > 2:
-                show_warning = True
-
-    logs = WorkLog.objects.filter(user=request.user).order_by('-date')
+            with transaction.atomic():
+                log = WorkLog.objects.create(
+                    user=request.user,
+                    company_name=company if company else "（未入力）",
+                    date=date_str,
+                    hours=float(hours) if hours else 0,
+                    earnings=int(amount)
+                )
+                worklog_rollups.add_log(log)
+                progress_counters.add_work_log(request.user.pk)
+            metrics.WORK_LOGS.labels('create').inc()
+            # 🆕 その日の合計は日別集計の1行を読むだけで分かる
+            daily = worklog_rollups.daily_total(request.user, date_str)
+            show_warning = daily is not None and daily.is_over_limit
+
+    logs = list(WorkLog.objects.filter(user=request.user).order_by('-date'))
+    daily_totals = {d.date: d for d in WorkLogDailyTotal.objects.filter(user=request.user)}
+    for log in logs:
+        daily = daily_totals.get(log.date)
+        log.is_over_limit = daily is not None and daily.is_over_limit
     context = {
         'logs': logs, 'show_warning': show_warning,
-        'total_hours': sum(log.hours for log in logs), 
-        'total_earnings': sum(log.earnings for log in logs),
+        'total_hours': sum(d.hours for d in daily_totals.values()),
+        'total_earnings': sum(d.earnings for d in daily_totals.values()),
         'today': timezone.now().date()
     }
     return render(request, 'steppia_app/work_tracker.html', context)
@@ -127,144 +206,102 @@ def work_tracker(request):
 def edit_work_log(request, pk):
     log = get_object_or_404(WorkLog, pk=pk, user=request.user)
     if request.method == 'POST':
-        log.company_name = request.POST.get('company')
-        log.date = request.POST.get('date')
-        log.hours = float(request.POST.get('hours') or 0)
-        log.earnings = int(request.POST.get('amount') or 0)
-        log.save()
+        with transaction.atomic():
+            # 修正前の値を集計から引き、修正後の値を足す（日付の移動にも対応）
+            worklog_rollups.remove_log(log)
+            log.company_name = request.POST.get('company')
+            log.date = request.POST.get('date')
+            log.hours = float(request.POST.get('hours') or 0)
+            log.earnings = int(request.POST.get('amount') or 0)
+            log.save()
+            worklog_rollups.add_log(log)
+        metrics.WORK_LOGS.labels('update').inc()
         return redirect('work_tracker')
     return render(request, 'steppia_app/edit_work_log.html', {'log': log})
 
 @login_required
 def delete_work_log(request, pk):
-    get_object_or_404(WorkLog, pk=pk, user=request.user).delete()
+    log = get_object_or_404(WorkLog, pk=pk, user=request.user)
+    with transaction.atomic():
+        log.delete()
+        worklog_rollups.remove_log(log)
+        progress_counters.add_work_log(request.user.pk, -1)
+    metrics.WORK_LOGS.labels('delete').inc()
     return redirect('work_tracker')
 
 # --- 5. AI相談室（全50項目搭載版） ---
 def ai_consult(request):
     ai_answer = ""
     user_q = ""
-    FAQ_DATA = {
-        "40代": "40代は人生経験が強みです。即戦力としての落ち着きをアピールしましょう。",
-        "未経験": "「未経験」を「伸びしろ」と捉え、新しいことを吸収する意欲を伝えましょう。",
-        "自信がない": "小さな成功体験を積み重ねることが大切です。まずは今日一歩踏み出した自分を褒めましょう。",
-        "ブランク": "家事や育児で培った「段取り力」や「忍耐力」も立派なキャリアです。",
-        "年齢制限": "法律で年齢制限は禁止されています。スキルと意欲があればチャンスは必ずあります。",
-        "リスキリング": "デジタルスキルを身につけると事務職やIT職など選択肢が大きく広がります。",
-        "Python": "初心者でも学びやすい言語です。自動化スキルは事務職でも重宝されます。",
-        "Excel": "VLOOKUPやピボットテーブルができると、採用率がグッと上がります。",
-        "AI": "AIを使いこなせる人材は今、非常に求められています。まずは触れてみることから！",
-        "デザイン": "CanvaやPenpotなど、初心者向けのツールから始めると楽しく学べます。",
-        "履歴書": "手書きよりパソコン作成が一般的です。清潔感のある写真を用意しましょう。",
-        "職務経歴書": "「何をしてきたか」だけでなく「何ができるか」を具体的に書きましょう。",
-        "自己PR": "自分の強みが会社にどう貢献できるか、具体例を交えて伝えましょう。",
-        "志望動機": "「なぜこの会社なのか」を自分の言葉で語ることが内定への道です。",
-        "面接": "面接は対話です。笑顔と元気な挨拶があれば、第一印象はバッチリです。",
-        "オンライン面接": "背景や照明に気をつけ、カメラを見て話すと意欲が伝わります。",
-        "逆質問": "「入社までに準備しておくことは？」など、前向きな質問を用意しましょう。",
-        "シングルマザー": "理解のある企業は増えています。自治体の助成金なども活用しましょう。",
-        "両立": "最初から100%を目指さず、周りの協力や便利なサービスを頼るのも戦略です。",
-        "時短勤務": "ライフスタイルに合わせた働き方を相談できる企業を一緒に探しましょう。",
-        "在宅ワーク": "通勤がない分、家庭の時間が持てます。ITスキルがあると採用されやすいです。",
-        "副業": "まずは月1〜3万円を目指して、得意なことから始めてみるのがおすすめです。",
-        "ワークライフバランス": "仕事も家庭も大切にするために、優先順位を決めておきましょう。",
-        "給料": "相場を知ることは大切です。スキルを上げて昇給を目指す道もあります。",
-        "福利厚生": "育休や介護休暇の取得実績があるかチェックしておくと安心です。",
-        "正社員": "安定を求めるなら正社員ですが、まずは派遣やパートから進む道もあります。",
-        "派遣": "短期間でスキルを身につけたい時や、色々な職場を経験したい時に有効です。",
-        "パート": "時間の融通が利きやすいのが魅力。ブランク明けの復帰に最適です。",
-        "失業保険": "ハローワークで手続きが必要です。受給しながらの活動も可能です。",
-        "社会保険": "106万円や130万円の壁を意識しつつ、保障の手厚い加入を目指すのも手です。",
-        "有給休暇": "パートやアルバイトでも条件を満たせば取得できます。大切な権利です。",
-        "最低賃金": "最低賃金は年々上がっています。基準を下回っていないか確認しましょう。",
-        "資格": "実務に直結する資格から取るのが効率的です。コンサルタントに相談してください。",
-        "マネジメント": "後輩の指導経験などもマネジメント経験として評価されます。",
-        "転職回数": "多いことを気にするより、その経験をどう活かすかを前向きに伝えましょう。",
-        "キャリアチェンジ": "今のスキルをベースに、隣接する職種へスライドするのがスムーズです。",
-        "緊張": "「緊張するのは頑張りたい証拠」と受け入れて、深呼吸をしましょう。",
-        "不採用": "あなたの価値を否定されたわけではありません。縁がなかっただけと切り替えましょう。",
-        "焦り": "周りと比べず、自分のペースで進むことが一番の近道です。",
-        "人間関係": "新しい職場では「聞き上手」から始めると、馴染みやすくなります。",
-        "コンサルタント": "迷ったらすぐに相談してください。私たちはあなたの味方です。",
-        "冒険マップ": "ログをつけると進みます。毎日の積み重ねがゴールへの道です。",
-        "ルーレット": "毎日の楽しみとして活用してください。お得なクーポンも当たります。",
-        "お仕事ログ": "日々の頑張りを記録しましょう。自分の成長が目に見えてわかります。",
-        "求人": "Steppiaには未経験や40代歓迎の求人を厳選して掲載しています。",
-        "ログ": "記録をつける習慣が、あなたの「継続力」の証明になります。",
-        "マップ": "STEP 30を目指して進みましょう。ゴールには素敵な演出が待っています！",
-        "相談": "どんな小さなことでもOK。AI相談室やコンサルタントを頼ってください。",
-        "未来": "一歩踏み出した今、あなたの未来はすでに変わり始めています。",
-        "気分転換": "時には休むことも大切です。お気に入りの飲み物を飲んでリフレッシュしましょう。"
-    }
     if request.method == 'POST':
         user_q = (request.POST.get('user_input') or request.POST.get('user_text', '')).strip()
         if user_q:
-            template_match = AIConsultTemplate.objects.filter(question__icontains=user_q).first()
-            if template_match:
-                ai_answer = template_match.answer
-            else:
-                ai_answer = next((val for key, val in FAQ_DATA.items() if key in user_q), "その悩み、一緒に考えましょう。担当コンサルタントに相談してくださいね。")
-            AIConsultLog.objects.create(
-                user=request.user if request.user.is_authenticated else None,
-                user_question=user_q, 
-                ai_response=ai_answer
-            )
+            ai_answer, source = consult_matcher.answer_with_source(user_q)
+            metrics.CONSULTATIONS.labels(source).inc()
+            log_consultation(request.user, user_q, ai_answer)
     return render(request, 'steppia_app/ai_consult.html', {'ai_answer': ai_answer, 'user_q': user_q})
 
+@query_budget(2)
 @login_required
 def ai_history(request):
     return redirect('mypage')
 
 # --- 6. マイページ ---
+@query_budget(8)
 @login_required
 def mypage(request):
-    """ユーザー情報統合表示（担当コンサルタント名を取得）"""
-    logs = AIConsultLog.objects.filter(user=request.user).order_by('-created_at')
-    mypage_schedules = Schedule.objects.filter(user=request.user, detail__contains='コンサル予約').order_by('-date', '-time')
-    user_applications = Application.objects.filter(user=request.user).order_by('-applied_at')
-    coupons = Coupon.objects.filter(user=request.user, is_used=False).order_by('-won_at')
-    
-    # 🆕 データベース（Member）から担当者名を取得
-    consultant_name = request.user.profile.assigned_consultant
-    
-    return render(request, 'steppia_app/mypage.html', {
-        'logs': logs, 
-        'mypage_schedules': mypage_schedules, 
-        'applications': user_applications, 
-        'coupons': coupons,
-        'consultant_name': consultant_name # 🆕 HTMLへ渡す
-    })
+    """ユーザー情報統合表示（担当コンサルタント名を取得）
+
+    表示内容はユーザーごとにキャッシュし、関係するデータが変わったときだけ作り直す
+    """
+    snapshot = get_snapshot(request.user)
+    recommended = recommend.for_user(request.user, applications=snapshot['applications'], logs=snapshot['logs'])
+    return render(request, 'steppia_app/mypage.html', dict(snapshot, recommended_jobs=recommended))
 
 # --- 7. 進捗管理（冒険マップ） ---
+@query_budget(3)
 @login_required
 def progress(request):
-    work_log_count = WorkLog.objects.filter(user=request.user).count()
+    """🆕 件数は Member に持っているので、会員の行を1回読むだけ"""
+    member = request.user.profile
     return render(request, 'steppia_app/progress.html', {
-        'current_pos': work_log_count + 1,
-        'has_applied': Application.objects.filter(user=request.user).exists(),
-        'work_log_count': work_log_count
+        'current_pos': member.map_step,
+        'has_applied': member.application_count > 0,
+        'work_log_count': member.work_log_count,
     })
 
 # --- 8. ルーレット ---
+@query_budget(3)
 @login_required
 @never_cache
 def roulette(request):
     member = request.user.profile
-    return render(request, 'steppia_app/roulette.html', {'can_spin': member.can_spin_roulette()})
+    return render(request, 'steppia_app/roulette.html', {
+        'can_spin': member.can_spin_roulette(), 'segments': list(roulette_engine.SEGMENTS),
+    })
 
 @login_required
 @never_cache
-def roulette_result(request, item):
-    member = request.user.profile
-    if not member.can_spin_roulette():
+@require_POST
+def roulette_spin(request):
+    """🆕 抽選はサーバーで行い、止める位置（盤の何番目か）を返す"""
+    result = roulette_engine.spin(request.user)
+    if result is None:
+        return JsonResponse({'error': '今日はもう回しました'}, status=409)
+    metrics.ROULETTE_SPINS.labels('win' if result.prize.is_win else 'lose').inc()
+    request.session['roulette_result'] = {
+        'date': result.date.isoformat(), 'item': result.prize.name, 'is_win': result.prize.is_win,
+    }
+    return JsonResponse({'item': result.prize.name, 'segment': result.segment, 'is_win': result.prize.is_win})
+
+@login_required
+@never_cache
+def roulette_result(request, item=None):
+    """結果表示：URL の景品名は使わず、サーバーで抽選した今日の結果を表示する"""
+    result = request.session.get('roulette_result')
+    if not result or result['date'] != timezone.localdate().isoformat():
         return redirect('roulette')
-    jst = pytz.timezone('Asia/Tokyo')
-    member.last_roulette_date = timezone.now().astimezone(jst).date()
-    member.save()
-    is_win = any(k in item for k in ["賞", "面談", "券", "ギフト"])
-    if is_win:
-        Coupon.objects.create(user=request.user, prize_name=item)
-    return render(request, 'steppia_app/roulette_result.html', {'item': item, 'is_win': is_win})
+    return render(request, 'steppia_app/roulette_result.html', {'item': result['item'], 'is_win': result['is_win']})
 
 @login_required
 def congrats(request):
@@ -280,9 +317,9 @@ def roulette_lost(request):
     return render(request, 'steppia_app/roulette_lost.html')
 
 # --- 9. 予約・スケジュール・設定 ---
+@cache_policy.anonymous_page('consult_top')
 def consult_top(request): return render(request, 'steppia_app/consult_top.html')
 def consult_setting(request): return render(request, 'steppia_app/consult_setting.html')
-def consult_reservation(request): return render(request, 'steppia_app/consult_reservation.html')
 
 def consult_confirm(request):
     return render(request, 'steppia_app/consult_confirm.html', {
@@ -302,23 +339,149 @@ def consult_setting_done(request):
             
     return render(request, 'steppia_app/consult_setting_done.html')
 
+def _reservation_context(request):
+    """予約画面用：選んだコンサルタントの1週間分の空き枠"""
+    consultants = booking.active_consultants()
+    member = request.user.profile if request.user.is_authenticated else None
+    wanted = (
+        request.GET.get('consultant') or request.POST.get('consultant')
+        or (member.assigned_consultant if member else None)
+        or request.session.get('selected_consultant')
+    )
+    consultant = next((c for c in consultants if c.name == wanted), consultants[0] if consultants else None)
+
+    now = timezone.localtime()
+    try:
+        week = booking.week_start(datetime.date.fromisoformat(request.GET.get('week', '')))
+    except ValueError:
+        week = booking.week_start(now.date())
+    week = max(week, booking.week_start(now.date()))
+
+    slots = []
+    if consultant is not None:
+        # 枠は generate_consult_slots で作っておく（表示のたびには書き込まない）
+        slots = booking.free_slots(consultant, week, week + datetime.timedelta(days=7), now=now)
+    return {
+        'consultants': consultants, 'consultant': consultant, 'slots': slots,
+        'week': week, 'prev_week': week - datetime.timedelta(days=7), 'next_week': week + datetime.timedelta(days=7),
+        'coupon_id': request.GET.get('coupon_id') or request.POST.get('coupon_id', ''),
+    }
+
+@query_budget(11)
+def consult_reservation(request):
+    return render(request, 'steppia_app/consult_reservation.html', _reservation_context(request))
+
+def _reservation_error(request, message, status):
+    context = _reservation_context(request)
+    context['error'] = message
+    return render(request, 'steppia_app/consult_reservation.html', context, status=status)
+
 @login_required
 def consult_reservation_done(request):
     if request.method == 'POST':
-        Schedule.objects.create(
-            user=request.user,
-            date=request.POST.get('date'), 
-            time=request.POST.get('time'), 
-            detail=f"{request.POST.get('consultant')} コンサル予約"
-        )
-        coupon_id = request.POST.get('coupon_id')
-        if coupon_id:
-            Coupon.objects.filter(id=coupon_id, user=request.user).update(is_used=True)
+        slot_id, coupon_id = request.POST.get('slot_id'), request.POST.get('coupon_id') or None
+        try:
+            if coupon_id is not None:
+                coupon_id = int(coupon_id)
+            if slot_id:
+                slot_id = int(slot_id)
+            else:
+                # 日付・時刻を直接送ってくる旧フォームにも対応（空や壊れた日付・時刻は ValidationError）
+                slot_id = booking.find_slot_id(request.POST.get('consultant'), request.POST.get('date'), request.POST.get('time'))
+        except (ValidationError, ValueError):
+            return _reservation_error(request, '予約の日時またはクーポンの指定が正しくありません。もう一度選び直してください。', 400)
+        try:
+            booking.book(request.user, slot_id, coupon_id)
+        except booking.SlotInPast:
+            return _reservation_error(request, 'その時間はもう過ぎています。これからの時間を選んでください。', 400)
+        except booking.SlotUnavailable:
+            return _reservation_error(request, 'その時間はすでに埋まっています。別の時間を選んでください。', 409)
+        # クーポンは update() で消費するのでシグナルが出ない
+        invalidate_dashboard(request.user.pk)
     return render(request, 'steppia_app/consult_reservation_done.html')
 
+@query_budget(4)
 @login_required
+@conditional_page(schedule_state)
 def schedule(request):
     if request.method == 'POST':
         Schedule.objects.create(user=request.user, date=request.POST.get('date'), time=request.POST.get('time'), detail=request.POST.get('detail'))
     schedules = Schedule.objects.filter(user=request.user).order_by('-date', '-time')
-    return render(request, 'steppia_app/schedule.html', {'schedules': schedules})
\ No newline at end of file
+    return render(request, 'steppia_app/schedule.html', {'schedules': schedules})
+
+# --- 10. データのダウンロード ---
+def _parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+def _export_response(dataset, fmt, **filters):
+    if dataset not in exports.DATASETS or fmt not in exports.FORMATS:
+        raise Http404
+    response = StreamingHttpResponse(exports.iter_export(dataset, fmt, **filters), content_type=exports.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{exports.filename(dataset, fmt)}"'
+    return response
+
+@login_required
+def export_my_data(request, dataset, fmt):
+    """会員本人のお仕事ログ・AI相談履歴"""
+    return _export_response(dataset, fmt, user=request.user)
+
+@staff_member_required
+def export_admin_data(request, dataset, fmt):
+    """スタッフ用：全会員分を期間（?start=&end=）とユーザー（?user=）で絞って出力"""
+    user = None
+    if request.GET.get('user'):
+        try:
+            user = get_object_or_404(User, pk=int(request.GET['user']))
+        except ValueError:
+            raise Http404
+    return _export_response(
+        dataset, fmt, staff=True, user=user,
+        start=_parse_date(request.GET.get('start')),
+        end=_parse_date(request.GET.get('end')),
+    )
+
+@staff_member_required
+def cache_stats(request):
+    """スタッフ用：キャッシュの当たり・外れ（応答したワーカーの分）"""
+    return JsonResponse(cache_policy.stats())
+
+@staff_member_required
+def profile_list(request):
+    """スタッフ用：サンプリングプロファイラーが残したプロファイルの一覧（?view= で絞り込み、?sort=ms で遅い順）"""
+    view = request.GET.get('view') or None
+    sort = 'ms' if request.GET.get('sort') == 'ms' else 'time'
+    return render(request, 'steppia_app/profile_list.html', {
+        **admin.site.each_context(request), 'title': 'プロファイル',
+        'profiles': profiling.list_profiles(view=view, sort=sort), 'view': view, 'sort': sort,
+        'options': profiling.config(), 'token': profiling.make_token(request.user),
+    })
+
+@staff_member_required
+def profile_detail(request, name):
+    """スタッフ用：1件のプロファイル（累積時間順の表。?download=1 で pstats ファイル）"""
+    if request.GET.get('download'):
+        path = profiling.profile_path(name)
+        if path is None:
+            raise Http404
+        return FileResponse(path.open('rb'), as_attachment=True, filename=path.name)
+    table = profiling.summary(name)
+    if table is None:
+        raise Http404
+    return render(request, 'steppia_app/profile_detail.html', {
+        **admin.site.each_context(request), 'title': name, 'name': name, 'table': table,
+    })
+
+@never_cache
+def prometheus_metrics(request):
+    """Prometheus 用のメトリクス（Bearer トークン settings.METRICS_TOKEN か、スタッフのログインで見られる）"""
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    authorized = bool(token) and constant_time_compare(header, f'Bearer {token}')
+    if not (authorized or request.user.is_staff):
+        response = HttpResponse("認証が必要です", status=401, content_type='text/plain; charset=utf-8')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(metrics.exposition(), content_type=metrics.CONTENT_TYPE_LATEST)
@@ -0,0 +1,119 @@
+"""お仕事ログの日別集計（WorkLogDailyTotal）
+
+WorkLog を追加・修正・削除するときに、同じトランザクションの中で
+(ユーザー, 日付) の集計行へ差分だけを足し引きします。
+これで「その日の合計が申告ラインを超えたか」は1行を読むだけで分かります。
+
+時間は小数第2位までの Decimal で足し引きします（float だと 0.4 + 1.8 − 0.4 + 0.2 が
+2.0000000000000004 になり、申告ラインの「2時間超え」を誤って判定してしまうため）。
+丸めるのは1件ずつで、合計は丸めた値の和です。作り直し（compute_from_logs）も
+夜間チェック（compliance.py）も同じ決まりにして、どの経路でも同じ合計になるようにしています。
+"""
+import datetime
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import WorkLog, WorkLogDailyTotal
+
+
+HOURS_QUANTUM = Decimal('0.01')
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+def as_hours(value):
+    """就労時間（WorkLog.hours の float など）を小数第2位の Decimal にする"""
+    return Decimal(str(value or 0)).quantize(HOURS_QUANTUM)
+
+
+def apply_delta(user_id, day, hours=0, earnings=0, count=0):
+    """(ユーザー, 日付) の集計行に差分を足す。行がなければ作り、0件になれば消す"""
+    day = _as_date(day)
+    hours = as_hours(hours)
+    rows = WorkLogDailyTotal.objects.filter(user_id=user_id, date=day)
+    delta = {
+        'hours': F('hours') + hours,
+        'earnings': F('earnings') + earnings,
+        'log_count': F('log_count') + count,
+    }
+    if not rows.update(**delta):
+        try:
+            with transaction.atomic():
+                WorkLogDailyTotal.objects.create(
+                    user_id=user_id, date=day, hours=hours, earnings=earnings, log_count=count
+                )
+        except IntegrityError:
+            # 同じ日の行を別のリクエストが先に作った
+            rows.update(**delta)
+    rows.filter(log_count__lte=0).delete()
+
+
+def add_log(log):
+    apply_delta(log.user_id, log.date, log.hours, log.earnings, 1)
+
+
+def remove_log(log):
+    apply_delta(log.user_id, log.date, -log.hours, -log.earnings, -1)
+
+
+def daily_total(user, day):
+    """その日の集計行（記録がなければ None）"""
+    return WorkLogDailyTotal.objects.filter(user=user, date=_as_date(day)).first()
+
+
+def compute_from_logs(user_ids=None):
+    """WorkLog の生データから {(user_id, date): (hours, earnings, log_count)} を作る"""
+    logs = WorkLog.objects.all()
+    if user_ids is not None:
+        logs = logs.filter(user_id__in=user_ids)
+    # SQL の Sum では丸める前の float を足してしまい、add_log で1件ずつ丸めて足した値とずれる
+    # （0.667 が3件なら、1件ずつなら 2.01、まとめてなら 2.00）ので、1件ずつ丸めてから足す
+    totals = {}
+    for user_id, day, hours, earnings in logs.values_list('user_id', 'date', 'hours', 'earnings').order_by().iterator():
+        total_hours, total_earnings, count = totals.get((user_id, day), (Decimal(0), 0, 0))
+        totals[(user_id, day)] = (total_hours + as_hours(hours), total_earnings + (earnings or 0), count + 1)
+    return totals
+
+
+def find_drift(user_ids=None):
+    """集計行と生データの食い違いを [(user_id, date, 集計行の値, 生データの値)] で返す"""
+    expected = compute_from_logs(user_ids)
+    stored_rows = WorkLogDailyTotal.objects.all()
+    if user_ids is not None:
+        stored_rows = stored_rows.filter(user_id__in=user_ids)
+    stored = {
+        (user_id, day): (hours, earnings, count)
+        for user_id, day, hours, earnings, count in stored_rows.values_list(
+            'user_id', 'date', 'hours', 'earnings', 'log_count'
+        )
+    }
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        have, want = stored.get(key), expected.get(key)
+        if have != want:
+            drift.append((key[0], key[1], have, want))
+    return drift
+
+
+@transaction.atomic
+def rebuild(user_ids=None, batch_size=1000):
+    """集計行を生データから作り直し、作成した行数を返す"""
+    expected = compute_from_logs(user_ids)
+    stale = WorkLogDailyTotal.objects.all()
+    if user_ids is not None:
+        stale = stale.filter(user_id__in=user_ids)
+    stale.delete()
+    WorkLogDailyTotal.objects.bulk_create(
+        [
+            WorkLogDailyTotal(user_id=user_id, date=day, hours=hours, earnings=earnings, log_count=count)
+            for (user_id, day), (hours, earnings, count) in expected.items()
+        ],
+        batch_size=batch_size,
+    )
+    return len(expected)